@@ -0,0 +1,210 @@
+"""
+Simulated Arduino + FPM10A for EVM
+An in-process stand-in for serial.Serial that speaks the same line protocol as
+embedded.ino (FINGERPRINT_READY, CHECK, ENROLL:<id>, DELETE_ALL, PING, LIST,
+INDEX, DUMP:<id>, LOAD:<id>:<crc>, SLEEP), so the
+Pi-side code can be exercised and benchmarked without hardware.
+
+    sim = SimulatedArduino(enrolled={1, 2, 5})
+    sim.place_finger(5)      # next CHECK answers MATCH:5
+    session = SerialSession(ser=sim)
+"""
+
+import binascii  # Import binascii for template checksums
+import os  # Import os for the readiness pipe
+import random  # Import random for synthetic templates
+import threading  # Import threading for delayed replies
+import time  # Import time for timeouts
+
+class SimulatedArduino:
+    """Minimal pyserial-compatible object (write/readline/in_waiting/timeout)."""
+
+    def __init__(self, enrolled=(), scan_time=0.05, enroll_time=0.2, ready_delay=0.0, timeout=2, capacity=162):
+        self.timeout = timeout  # Same meaning as serial.Serial.timeout
+        self.scan_time = scan_time  # Time a CHECK takes on the sensor
+        self.enroll_time = enroll_time  # Time between enrollment progress lines
+        self.enrolled = set(enrolled)  # Template slots in use
+        self.capacity = capacity  # Library size (FPM10A: 162)
+        self.templates = {}  # Slot -> 512-byte template (synthetic unless loaded)
+        self._loading = None  # (slot, crc) while waiting for the hex line of a LOAD
+        self.is_open = True
+        self.unplugged = False  # USB cable pulled: reads and writes fail like pyserial's
+        self.sleeping = False  # After SLEEP, until a finger or a command
+        self._rx = bytearray()  # Bytes waiting for the Pi
+        self._cond = threading.Condition()
+        self._fingers = []  # Queued fingers for the next CHECKs (None = no finger)
+        self._timers = []
+        self._wake = None  # (read fd, write fd) once fileno() is used by an event loop
+        self.commands = []  # Every command received, for assertions and traces
+        self._booted = time.monotonic() + (ready_delay or 0)  # Commands sent while booting are lost
+        if ready_delay is not None:  # None: no boot message (session_trace.py replays the recorded one)
+            self._later(ready_delay, ["FINGERPRINT_READY"])  # Boot message, like setup()
+
+    # -----------------------------
+    # Test controls
+    # -----------------------------
+    def place_finger(self, fid):  # Queue a finger for the next CHECK
+        with self._cond:
+            self._fingers.append(fid)
+        if self.sleeping:  # Touch output wakes the board
+            self.sleeping = False
+            self.emit("WAKE")
+
+    def unplug(self):  # Pull the USB cable
+        with self._cond:
+            self.unplugged = True
+            self._cond.notify_all()
+
+    def emit(self, line):  # Inject a raw line (e.g. to simulate noise)
+        with self._cond:
+            self._rx += (line + "\r\n").encode()
+            self._cond.notify_all()
+            if self._wake is not None:  # Make fileno() readable for select/asyncio
+                os.write(self._wake[1], b"x")
+
+    def _later(self, delay, lines):  # Send lines after a delay, like slow firmware work
+        if delay <= 0:
+            for line in lines:
+                self.emit(line)
+            return
+        timer = threading.Timer(delay, lambda: [self.emit(line) for line in lines])
+        timer.daemon = True
+        timer.start()
+        self._timers = [t for t in self._timers if t.is_alive()] + [timer]  # Keep only pending timers
+
+    # -----------------------------
+    # Firmware behaviour
+    # -----------------------------
+    def template(self, fid):  # Stored template of a slot
+        if fid not in self.templates:
+            self.templates[fid] = random.Random(fid).randbytes(512)  # Stable per slot
+        return self.templates[fid]
+
+    def _handle(self, command):
+        if self._loading is not None:  # Hex line that follows LOAD
+            fid, crc = self._loading
+            self._loading = None
+            data = bytes.fromhex(command) if len(command) == 1024 else b""
+            if binascii.crc_hqx(data, 0xFFFF) != crc or not data:
+                self._later(0, [f"LOAD_FAILED:{fid}:checksum"])
+            else:
+                self.templates[fid] = data
+                self.enrolled.add(fid)
+                self._later(self.scan_time, [f"LOADED:{fid}"])
+            return
+        self.commands.append(command)
+        self.sleeping = False
+        if command == "SLEEP":
+            self.sleeping = True
+            self._later(0, ["SLEEPING"])
+        elif command == "LIST":
+            self._later(self.scan_time, ["SLOTS:" + ",".join(str(fid) for fid in sorted(self.enrolled))])
+        elif command == "INDEX":
+            bits = bytearray((self.capacity + 7) // 8)
+            for fid in self.enrolled:
+                bits[fid // 8] |= 1 << fid % 8
+            self._later(self.scan_time, [f"INDEX:{self.capacity}:{bits.hex().upper()}"])
+        elif command.startswith("DUMP:"):
+            fid = int(command[5:]) if command[5:].isdigit() else 0
+            if fid in self.enrolled:
+                data = self.template(fid)
+                self._later(self.scan_time, [f"TEMPLATE:{fid}:{binascii.crc_hqx(data, 0xFFFF):04X}:{data.hex().upper()}"])
+            else:
+                self._later(0, [f"DUMP_FAILED:{fid}"])
+        elif command.startswith("LOAD:"):
+            fid, _, crc = command[5:].partition(":")
+            self._loading = (int(fid), int(crc, 16))
+            self._later(0, ["READY_LOAD"])
+        elif command == "CHECK":
+            with self._cond:
+                fid = self._fingers.pop(0) if self._fingers else None
+            reply = f"MATCH:{fid}" if fid in self.enrolled else "NO_MATCH"
+            self._later(self.scan_time, [reply])
+        elif command == "PING":
+            self._later(0, ["FINGERPRINT_READY"])
+        elif command == "DELETE_ALL":
+            self.enrolled.clear()
+            self.templates.clear()
+            self._later(self.scan_time, ["ALL_DELETED"])
+        elif command.startswith("ENROLL:"):
+            fid = int(command[7:]) if command[7:].isdigit() else 0
+            if fid <= 0 or fid >= self.capacity:
+                self._later(0, ["ERROR: Invalid ID"])
+                return
+            self.enrolled.add(fid)
+            step = self.enroll_time
+            self._later(0, [f"Place finger for enrollment ID {fid}"])
+            self._later(step, ["Image taken", "Remove finger"])
+            self._later(2 * step, ["Second image taken", f"Enrollment successful! Stored at ID {fid}"])
+
+    # -----------------------------
+    # pyserial interface
+    # -----------------------------
+    def write(self, data):
+        if self.unplugged:
+            raise OSError("write failed: device disconnected")
+        if time.monotonic() < self._booted:
+            return len(data)
+        for line in data.decode().splitlines():
+            if line.strip():
+                self._handle(line.strip())
+        return len(data)
+
+    @property
+    def in_waiting(self):
+        with self._cond:
+            return len(self._rx)
+
+    def readline(self):  # Blocks until a full line or timeout, like pyserial
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while b"\n" not in self._rx:
+                if self.unplugged:
+                    raise OSError("device reports readiness to read but returned no data (device disconnected?)")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    data, self._rx = bytes(self._rx), bytearray()  # Partial line on timeout
+                    return data
+                self._cond.wait(remaining)
+            end = self._rx.index(b"\n") + 1
+            data, self._rx = bytes(self._rx[:end]), self._rx[end:]
+            return data
+
+    def read(self, size=1):  # Non-blocking read of what is buffered (event loop use)
+        with self._cond:
+            data, self._rx = bytes(self._rx[:size]), self._rx[size:]
+            if not self._rx and self._wake is not None:
+                self._drain()
+            return data
+
+    def fileno(self):  # Readable while bytes are waiting, like a tty
+        with self._cond:
+            if self._wake is None:
+                self._wake = os.pipe()
+                os.set_blocking(self._wake[0], False)
+                if self._rx:
+                    os.write(self._wake[1], b"x")
+            return self._wake[0]
+
+    def _drain(self):  # Empty the readiness pipe (called with _cond held)
+        try:
+            while os.read(self._wake[0], 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def reset_input_buffer(self):
+        with self._cond:
+            self._rx.clear()
+            if self._wake is not None:
+                self._drain()
+
+    def close(self):
+        self.is_open = False
+        for timer in self._timers:
+            timer.cancel()
+        with self._cond:
+            if self._wake is not None:
+                for fd in self._wake:
+                    os.close(fd)
+                self._wake = None
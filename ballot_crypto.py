@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Ballot Encryption for EVM
+Optional exponential ElGamal encryption of the ballot choice at the booth.
+A ballot is one ciphertext per candidate (1 for the chosen one, 0 otherwise),
+so ballots can be multiplied together and only the per-candidate totals are
+ever decrypted (homomorphic tally).
+
+Each ciphertext needs g^r and h^r. These two modular exponentiations are the
+expensive part, so the booth precomputes (g^r, h^r) pairs into a pool while it
+waits for the next voter; encrypting a vote then costs one multiplication.
+
+Group: RFC 3526 2048-bit MODP group, generator 2, 256-bit random exponents.
+
+Ballot order: ballots.jsonl never says who cast which ballot. A ballot is first
+staged alone in ballots.jsonl.pending and, once the vote is committed, moved to
+a uniformly random line of ballots.jsonl (the file is rewritten and atomically
+replaced). The line order is therefore a random permutation, independent of the
+order in which voters were recognized, and cannot be matched against
+votes.csv, the vote log or Firebase. It does not hide a ballot from someone who
+copies the file before and after one voter.
+
+Run with:
+  python3 ballot_crypto.py keygen Alice Bob Charlie      (offline, keep ballot_key.json secret)
+  python3 ballot_crypto.py tally ballots.jsonl [more.jsonl ...]
+  python3 ballot_crypto.py bench
+"""
+
+import argparse  # Import argparse for the command line
+import json  # Import json for key and ballot files
+import os  # Import os for atomic file replace
+import secrets  # Import secrets for cryptographic randomness
+import time  # Import time for latency measurements
+from collections import deque  # Import deque for the randomness pool
+
+# RFC 3526 group 14 (2048-bit safe prime), g = 2 generates the order-q subgroup
+P = int(
+    "FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD"
+    "EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED"
+    "EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F"
+    "83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B"
+    "E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA0510"
+    "15728E5A8AACAA68FFFFFFFFFFFFFFFF", 16)
+G = 2  # Generator
+Q = (P - 1) // 2  # Subgroup order
+EXPONENT_BITS = 256  # Random exponent size (short exponents keep booth-side cost low)
+
+PUBLIC_KEY_FILE = "ballot_key.pub.json"  # Copied to every booth
+PRIVATE_KEY_FILE = "ballot_key.json"  # Stays with the election officer
+BALLOT_FILE = "ballots.jsonl"  # Encrypted ballots, without voter IDs, in random order
+
+# -----------------------------
+# Keys
+# -----------------------------
+def generate_keys(candidates):  # Create an election key pair
+    """Return (public, private) key dicts bound to the ordered candidate list."""
+    x = secrets.randbelow(Q - 1) + 1  # Private exponent
+    public = {"p": hex(P), "g": G, "h": hex(pow(G, x, P)), "candidates": list(candidates)}
+    return public, dict(public, x=hex(x))
+
+def key_from_dict(key):  # Hex strings -> integers
+    key = dict(key, h=int(key["h"], 16))
+    if "x" in key:
+        key["x"] = int(key["x"], 16)
+    return key
+
+def load_key(path):  # Read a key file
+    with open(path) as f:
+        return key_from_dict(json.load(f))
+
+# -----------------------------
+# Randomness pool
+# -----------------------------
+class RandomnessPool:
+    """Precomputed (g^r, h^r) pairs, refilled in small time slices while the booth is idle."""
+
+    def __init__(self, public_key, capacity):
+        self.h = public_key["h"]
+        self.capacity = capacity  # Pairs to keep ready
+        self.pairs = deque()
+        self.misses = 0  # Pairs computed at vote time because the pool ran dry
+        self.refill_pairs = 0  # Pairs computed during idle time
+        self.refill_seconds = 0.0  # Time spent computing them
+
+    def _make_pair(self):  # The expensive part: two modular exponentiations
+        r = secrets.randbits(EXPONENT_BITS) | 1
+        return pow(G, r, P), pow(self.h, r, P)
+
+    def refill(self, budget=0.02):  # Called from the idle loop
+        """Add pairs until the pool is full or the time budget (seconds) is used up."""
+        start = time.perf_counter()
+        added = 0
+        while len(self.pairs) < self.capacity and time.perf_counter() - start < budget:
+            self.pairs.append(self._make_pair())
+            added += 1
+        if added:
+            self.refill_pairs += added
+            self.refill_seconds += time.perf_counter() - start
+        return added
+
+    def take(self):  # Pop one unused pair (never reused)
+        if self.pairs:
+            return self.pairs.popleft()
+        self.misses += 1
+        return self._make_pair()
+
+    def refill_rate(self):  # Pairs per second during idle refill
+        return self.refill_pairs / self.refill_seconds if self.refill_seconds else 0.0
+
+# -----------------------------
+# Encryption and tally
+# -----------------------------
+def encrypt_choice(pool, choice, count):  # Encrypt a one-hot ballot
+    """Return the ballot for candidate index choice as a list of (a, b) ciphertexts."""
+    ballot = []
+    for i in range(count):
+        a, hr = pool.take()
+        ballot.append((a, hr * G % P if i == choice else hr))  # g^1 for the chosen candidate, g^0 otherwise
+    return ballot
+
+def ballot_to_json(ballot):  # Compact hex encoding for files and Firebase
+    return [[format(a, "x"), format(b, "x")] for a, b in ballot]
+
+def ballot_from_json(data):
+    return [(int(a, 16), int(b, 16)) for a, b in data]
+
+def add_ballots(total, ballot):  # Homomorphic addition of two ballots
+    if total is None:
+        return list(ballot)
+    return [(ta * a % P, tb * b % P) for (ta, tb), (a, b) in zip(total, ballot)]
+
+def decrypt_count(private_key, ciphertext, max_count):  # Decrypt one total
+    """Recover m from (g^r, h^r * g^m) for 0 <= m <= max_count."""
+    a, b = ciphertext
+    gm = b * pow(a, Q - private_key["x"], P) % P  # b / a^x, using a^q = 1 in the subgroup
+    value = 1
+    for m in range(max_count + 1):  # Totals are small: a linear search is enough
+        if value == gm:
+            return m
+        value = value * G % P
+    raise ValueError("total out of range (wrong key or corrupted ballots)")
+
+def tally_files(private_key, paths):  # Offline tally
+    """Multiply all ballots in the files and decrypt only the per-candidate totals."""
+    total, ballots = None, 0
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    total = add_ballots(total, ballot_from_json(json.loads(line)["ballot"]))
+                    ballots += 1
+    if total is None:
+        return {}, 0
+    return {name: decrypt_count(private_key, c, ballots) for name, c in zip(private_key["candidates"], total)}, ballots
+
+# -----------------------------
+# Ballot file
+# -----------------------------
+def write_lines(path, lines):  # Write, fsync and atomically replace
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def stage_ballot(line, path=BALLOT_FILE):  # Before the vote commits: the ballot alone, no position yet
+    write_lines(path + ".pending", [line])
+
+def commit_ballot(path=BALLOT_FILE):  # After the vote commits: insert the staged ballot at a random line
+    """Move the staged ballot into the ballot file; safe to repeat after a reboot. Returns True if one was staged."""
+    pending = path + ".pending"
+    if not os.path.exists(pending):
+        return False
+    with open(pending) as f:
+        line = f.read()
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = [l for l in f if l.strip()]
+    if line.strip() and line not in lines:  # Already moved before a reboot: do not count it twice
+        lines.insert(secrets.randbelow(len(lines) + 1), line)  # Uniform position, independent of voting order
+        write_lines(path, lines)
+    os.remove(pending)
+    return True
+
+def discard_ballot(path=BALLOT_FILE):  # Vote not committed: drop the staged ballot
+    if os.path.exists(path + ".pending"):
+        os.remove(path + ".pending")
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Ballot encryption keys, tally and benchmark.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_keygen = sub.add_parser("keygen", help="create an election key pair")
+    p_keygen.add_argument("candidates", nargs="+", help="candidate names in ballot order")
+    p_tally = sub.add_parser("tally", help="decrypt the totals of ballot files")
+    p_tally.add_argument("files", nargs="*", default=[BALLOT_FILE])
+    p_tally.add_argument("--key", default=PRIVATE_KEY_FILE)
+    p_bench = sub.add_parser("bench", help="measure pool refill rate and per-vote latency")
+    p_bench.add_argument("--votes", type=int, default=50)
+    p_bench.add_argument("--candidates", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.cmd == "keygen":
+        public, private = generate_keys(args.candidates)
+        for path, key in ((PUBLIC_KEY_FILE, public), (PRIVATE_KEY_FILE, private)):
+            with open(path, "w") as f:
+                json.dump(key, f, indent=2)
+        print(f"✅ Wrote {PUBLIC_KEY_FILE} (copy to booths) and {PRIVATE_KEY_FILE} (keep offline)")
+    elif args.cmd == "tally":
+        totals, ballots = tally_files(load_key(args.key), args.files)
+        print(f"Tally of {ballots} encrypted ballots:")
+        for name, count in totals.items():
+            print(f"  {name}: {count}")
+    else:
+        public, _ = generate_keys([f"C{i}" for i in range(args.candidates)])
+        pool = RandomnessPool(key_from_dict(public), args.votes * args.candidates)
+        while pool.refill(budget=1.0):
+            pass
+        latencies = []
+        for i in range(args.votes):
+            start = time.perf_counter()
+            encrypt_choice(pool, i % args.candidates, args.candidates)
+            latencies.append((time.perf_counter() - start) * 1000)
+        cold = time.perf_counter()
+        encrypt_choice(pool, 0, args.candidates)  # Pool is empty now: vote-time exponentiations
+        cold = (time.perf_counter() - cold) * 1000
+        latencies.sort()
+        print(f"Idle refill rate: {pool.refill_rate():.1f} pairs/s "
+              f"({pool.refill_rate() / args.candidates:.1f} votes/s)")
+        print(f"Encrypt with pool: median {latencies[len(latencies) // 2]:.3f} ms, max {latencies[-1]:.3f} ms")
+        print(f"Encrypt without pool: {cold:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Ballot UI for EVM
+Data-driven candidate screen for ballots with any number of candidates.
+Candidates come from candidates.json; they are shown in pages of a fixed grid.
+The grid cards are created once and only re-labelled when the page changes,
+so drawing a page costs the same for 3 or 300 candidates. Thumbnails are
+decoded and resized in a background thread; only the visible page is loaded
+first and the next page is prefetched while the voter looks at this one.
+
+candidates.json:
+    [{"name": "Alice", "image": "candidate_alice.jpg", "gpio": 17}, ...]
+"gpio" (or "key": [row, col] on a keypad.json matrix, see button_matrix.py) is
+optional; candidates without a button are chosen by touch.
+
+Run with: python3 ballot_ui.py bench [--counts 3 30 300]   (needs a display)
+"""
+
+import json  # Import json for the candidate file
+import threading  # Import threading for the thumbnail loader
+import time  # Import time for render timing
+from collections import OrderedDict  # Import OrderedDict for the LRU cache
+from concurrent.futures import ThreadPoolExecutor  # Import executor for background decoding
+from tkinter import *  # Import Tkinter for GUI
+
+CANDIDATES_FILE = "candidates.json"  # Ballot definition
+THUMB_SIZE = (130, 130)  # Candidate image size on screen
+
+def load_candidates(path=CANDIDATES_FILE):  # Read the ballot definition
+    """Return the candidate list from a JSON file."""
+    with open(path) as f:
+        candidates = json.load(f)
+    names = [c["name"] for c in candidates]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: duplicate candidate names")
+    return candidates
+
+# -----------------------------
+# Thumbnail cache
+# -----------------------------
+class ThumbnailCache:
+    """Decodes candidate images in the background and keeps the most recent ones."""
+
+    def __init__(self, size=THUMB_SIZE, capacity=64):
+        self.size = size
+        self.capacity = capacity  # PIL images kept (a few pages)
+        self.images = OrderedDict()  # path -> resized PIL image (LRU order)
+        self.photos = OrderedDict()  # path -> ImageTk.PhotoImage, created on the Tk thread
+        self.pending = {}  # path -> Future
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbs")  # One core for decoding
+
+    def _load(self, path):  # Worker thread: decode and resize one image
+        from PIL import Image  # Import PIL for image handling (lazily)
+        img = Image.open(path)
+        img.draft("RGB", self.size)  # Let JPEG decode at reduced size
+        img = img.convert("RGB").resize(self.size)
+        with self.lock:
+            self.images[path] = img
+            self.images.move_to_end(path)
+            while len(self.images) > self.capacity:
+                self.images.popitem(last=False)
+            self.pending.pop(path, None)
+        return img
+
+    def prefetch(self, paths):  # Queue images that are not cached yet
+        with self.lock:
+            for path in paths:
+                if path and path not in self.images and path not in self.pending:
+                    self.pending[path] = self.pool.submit(self._load, path)
+
+    def image(self, path):  # Decoded PIL image or None (frame backends, any thread)
+        with self.lock:
+            return self.images.get(path)
+
+    def photo(self, path):  # Tk image if decoded, else None (call from the Tk thread)
+        if path in self.photos:
+            self.photos.move_to_end(path)
+            return self.photos[path]
+        with self.lock:
+            img = self.images.get(path)
+        if img is None:
+            return None
+        from PIL import ImageTk  # Import ImageTk for Tk images
+        photo = ImageTk.PhotoImage(img)
+        self.photos[path] = photo
+        while len(self.photos) > self.capacity:
+            self.photos.popitem(last=False)
+        return photo
+
+    def failed(self, path):  # True if decoding raised
+        with self.lock:
+            future = self.pending.get(path)
+        return future is not None and future.done() and future.exception() is not None
+
+# -----------------------------
+# Paged ballot view
+# -----------------------------
+class BallotView:
+    """Paged candidate grid. on_select(name) is called when a candidate is chosen."""
+
+    def __init__(self, parent, candidates, on_select, cache=None, rows=2, cols=4, bg="#F4F7FA"):
+        self.parent = parent
+        self.candidates = candidates
+        self.on_select = on_select
+        self.cache = cache or ThumbnailCache()
+        self.per_page = rows * cols
+        self.page = 0
+        self.pages = max(1, -(-len(candidates) // self.per_page))
+        self.selected = None
+        self.render_ms = 0.0  # Time of the last page draw
+        self._poll_job = None
+        self.blank = PhotoImage(width=self.cache.size[0], height=self.cache.size[1])  # Placeholder until decoded
+        self.shown_paths = []  # Image path currently displayed per card (None = placeholder)
+
+        self.frame = Frame(parent, bg=bg)
+        grid = Frame(self.frame, bg=bg)
+        grid.pack(pady=10)
+        self.cards = []  # Created once, reused for every page
+        for i in range(min(self.per_page, len(candidates))):
+            card = Frame(grid, bg="#FFFFFF", relief=RAISED, borderwidth=2)
+            card.grid(row=i // cols, column=i % cols, padx=12, pady=8, ipadx=6, ipady=6)
+            image = Label(card, bg="#FFFFFF", image=self.blank)
+            image.pack(pady=4)
+            name = Label(card, bg="#FFFFFF", fg="#000", font=("Arial", 16, "bold"))
+            name.pack(pady=4)
+            for widget in (card, image, name):  # Touch selects the candidate
+                widget.bind("<Button-1>", lambda e, slot=i: self._touch(slot))
+            self.cards.append((card, image, name))
+            self.shown_paths.append(None)
+
+        if self.pages > 1:  # Page controls only when needed
+            nav = Frame(self.frame, bg=bg)
+            nav.pack(pady=5)
+            Button(nav, text="◀ Previous", font=("Arial", 16), command=lambda: self.show_page(self.page - 1)).pack(side=LEFT, padx=20)
+            self.page_label = Label(nav, bg=bg, font=("Arial", 16))
+            self.page_label.pack(side=LEFT, padx=20)
+            Button(nav, text="Next ▶", font=("Arial", 16), command=lambda: self.show_page(self.page + 1)).pack(side=LEFT, padx=20)
+        self.show_page(0)
+
+    def pack(self, **kw):
+        self.frame.pack(**kw)
+        return self
+
+    def visible(self, page=None):  # Candidates on a page
+        page = self.page if page is None else page
+        return self.candidates[page * self.per_page:(page + 1) * self.per_page]
+
+    def show_page(self, page):  # Re-label the existing cards
+        start = time.perf_counter()
+        self.page = max(0, min(page, self.pages - 1))
+        shown = self.visible()
+        self.cache.prefetch([c.get("image") for c in shown])  # Visible page first
+        for i, (card, image, name) in enumerate(self.cards):
+            if i < len(shown):
+                c = shown[i]
+                name.config(text=c["name"], fg="#E53935" if c["name"] == self.selected else "#000")
+                photo = self.cache.photo(c.get("image"))
+                image.config(image=photo or self.blank)
+                self.shown_paths[i] = c.get("image") if photo else None
+                card.grid()
+            else:
+                card.grid_remove()  # Short last page
+        if self.pages > 1:
+            self.page_label.config(text=f"Page {self.page + 1} / {self.pages}")
+            self.cache.prefetch([c.get("image") for c in self.visible((self.page + 1) % self.pages)])  # Next page
+        self.render_ms = (time.perf_counter() - start) * 1000
+        self._schedule_poll()
+
+    def _schedule_poll(self):  # Swap in thumbnails as they finish decoding
+        if self._poll_job is None:
+            self._poll_job = self.frame.after(50, self._poll_images)
+
+    def _poll_images(self):
+        self._poll_job = None
+        if not self.frame.winfo_exists():
+            return
+        missing = False
+        for i, ((card, image, name), c) in enumerate(zip(self.cards, self.visible())):
+            path = c.get("image")
+            if self.shown_paths[i] is None and path and not self.cache.failed(path):
+                photo = self.cache.photo(path)
+                if photo:
+                    image.config(image=photo)
+                    self.shown_paths[i] = path
+                else:
+                    missing = True
+        if missing:
+            self._schedule_poll()
+
+    def _touch(self, slot):  # Card tapped
+        shown = self.visible()
+        if slot < len(shown):
+            self.select(shown[slot]["name"])
+
+    def select(self, name):  # Highlight and report a choice (button or touch)
+        self.selected = name
+        index = [c["name"] for c in self.candidates].index(name)
+        if index // self.per_page != self.page:  # Button for a candidate on another page
+            self.show_page(index // self.per_page)
+        for (card, image, label), c in zip(self.cards, self.visible()):
+            label.config(fg="#E53935" if c["name"] == name else "#000")
+        self.on_select(name)
+
+    def destroy(self):
+        if self._poll_job is not None:
+            self.frame.after_cancel(self._poll_job)
+            self._poll_job = None
+        self.frame.destroy()
+
+# -----------------------------
+# Render benchmark
+# -----------------------------
+def main():
+    import argparse  # Import argparse for the command line
+    parser = argparse.ArgumentParser(description="Measure ballot page render time for growing ballots.")
+    parser.add_argument("cmd", choices=["bench"])
+    parser.add_argument("--counts", type=int, nargs="+", default=[3, 30, 300])
+    parser.add_argument("--image", default="candidate_alice.jpg", help="image used for every synthetic candidate")
+    args = parser.parse_args()
+
+    root = Tk()
+    root.geometry("800x500")
+    cache = ThumbnailCache()
+    for count in args.counts:
+        candidates = [{"name": f"Candidate {i}", "image": args.image} for i in range(count)]
+        start = time.perf_counter()
+        view = BallotView(root, candidates, on_select=lambda name: None, cache=cache).pack()
+        root.update()
+        first = (time.perf_counter() - start) * 1000
+        flips = []
+        for page in range(1, min(view.pages, 20)):
+            view.show_page(page)
+            root.update()
+            flips.append(view.render_ms)
+        flip = sum(flips) / len(flips) if flips else 0.0
+        print(f"{count:5d} candidates: first screen {first:6.1f} ms, page flip {flip:5.2f} ms, {view.pages} pages")
+        view.destroy()
+    root.destroy()
+
+if __name__ == "__main__":
+    main()
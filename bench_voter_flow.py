@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Voter Throughput Benchmark for EVM
+Simulates a queue of voters through the voting6.py flow with a virtual clock
+and reports voters per hour for the sequential flow and for throughput mode
+(EVM_THROUGHPUT_MODE=1), where the sensor is armed while the thank-you or
+already-voted screen is still showing and a new finger ends it early.
+
+Voter behaviour (walk-up, finger placement, choosing) is drawn from seeded
+random distributions, so both modes see exactly the same voters.
+
+This is a queueing model, not a measurement: it does not run voting6.py's
+check_response() or dwell code, and the lookup, recording and dwell times are
+the parameters below, not timings taken from a booth. It assumes that a voter
+who just voted is never matched again by the re-armed sensor (voting6.py
+ignores that voter's finger until the thank-you screen ends). Use it to compare
+the two modes, and session_trace.py replays to time the real flow.
+
+Run with: python3 bench_voter_flow.py [--voters 500] [--dwell-thanks 3000] ...
+"""
+
+import argparse  # Import argparse for the command line
+import random  # Import random for voter behaviour
+
+def simulate(voters, pipelined, args):  # Run one election queue through the model
+    """Return total virtual seconds to serve all voters."""
+    rng = random.Random(args.seed)  # Same voters for both modes
+    recognized, thanks, already = args.dwell_recognized / 1000, args.dwell_thanks / 1000, args.dwell_already / 1000
+    sensor_free = 0.0  # When the sensor is armed for the next finger
+    prev_leave = 0.0  # When the previous voter stepped away from the booth
+    end = 0.0
+    for _ in range(voters):
+        walkup = rng.uniform(1.0, 3.0)  # Next voter steps up and places a finger
+        scan = rng.uniform(0.5, 1.5) + args.lookup  # CHECK round trips + voter lookups in Firebase
+        choose = rng.uniform(2.0, 6.0)  # Voter looks at the ballot and presses a button
+        repeat = rng.random() < args.repeat_rate  # Someone who already voted
+
+        finger_on = max(sensor_free, prev_leave + walkup)
+        matched = finger_on + scan
+        if repeat:  # Warning screen, then the next voter
+            done = matched + already
+            prev_leave = matched + 0.5
+            sensor_free = matched if pipelined else done
+        else:
+            pressed = matched + recognized + choose
+            recorded = pressed + args.record  # CSV, vote log and Firebase push
+            done = recorded + thanks
+            prev_leave = pressed + 0.5
+            sensor_free = recorded if pipelined else done
+        end = max(end, done)
+    return end
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare voters per hour with and without throughput mode.")
+    parser.add_argument("--voters", type=int, default=500)
+    parser.add_argument("--dwell-recognized", type=int, default=2500, help="ms, EVM_DWELL_RECOGNIZED_MS")
+    parser.add_argument("--dwell-thanks", type=int, default=3000, help="ms, EVM_DWELL_THANKS_MS")
+    parser.add_argument("--dwell-already", type=int, default=3000, help="ms, EVM_DWELL_ALREADY_VOTED_MS")
+    parser.add_argument("--lookup", type=float, default=0.6, help="s, name + already-voted requests")
+    parser.add_argument("--record", type=float, default=0.4, help="s, recording and pushing a vote")
+    parser.add_argument("--repeat-rate", type=float, default=0.03, help="share of repeat voters")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rates = {}
+    for mode, pipelined in (("sequential", False), ("throughput mode", True)):
+        seconds = simulate(args.voters, pipelined, args)
+        rates[mode] = args.voters / seconds * 3600
+        print(f"{mode:>16}: {rates[mode]:6.1f} voters/hour ({seconds / args.voters:.2f} s per voter)")
+    gain = rates["throughput mode"] / rates["sequential"] - 1
+    print(f"Throughput mode serves {gain * 100:+.1f}% voters per hour (queue model, not measured)")
+
+if __name__ == "__main__":
+    main()
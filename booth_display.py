@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Booth Display Backends for EVM
+voting7.py draws its screens through this small interface, so the same booth
+runs in an X session with Tk or straight on the Linux framebuffer without X.
+voting6.py draws the same screens through the Tk backend but runs its own Tk
+main loop, so it always needs X (as does voting8.py, which keeps its own screens):
+
+    EVM_UI=tk    Tk window (needs X, as before)
+    EVM_UI=fb    PIL frames written to /dev/fb0 (EVM_FB), touch and keys from /dev/input
+    EVM_UI=sdl   PIL frames shown on a pygame (SDL) surface, e.g. KMS without X
+
+Every backend has:
+    display.message(screen, **fields)   # "starting", "idle", "recognized", "thanks", "already_voted"
+    view = display.ballot(candidates, cache, rows, cols, on_select)    # view.select(name)
+    display.pump()                      # draw and handle input, False once closed
+    display.on_key, display.on_close    # callbacks: key character / window closed
+    display.close()
+
+The frame backends render each static screen once at startup, already in the
+framebuffer's pixel format, so showing one is a single write. Text is pasted
+from pre-rendered glyphs and each candidate card is composed once per ballot.
+
+Run with: python3 booth_display.py bench [--backends tk fb sdl] [--fb-file /tmp/fb.raw]
+to compare startup, RSS and frame latency (each backend in its own process).
+"""
+
+import argparse  # Import argparse for the benchmark
+import glob  # Import glob to find input devices
+import os  # Import os for framebuffer and input I/O
+import struct  # Import struct for evdev events
+import subprocess  # Import subprocess to bench backends separately
+import sys  # Import sys for the interpreter path
+import time  # Import time for frame latency
+
+FONT_DIR = "/usr/share/fonts/truetype/dejavu"  # fonts-dejavu-core, installed on Raspberry Pi OS
+BG = "#F4F7FA"  # Booth background
+STYLES = {  # Same look as the ttk styles: colour, size, bold
+    "Title": ("#0056b3", 28, True),
+    "Text": ("#222222", 20, False),
+    "Message": ("#007700", 22, True),
+    "Card": ("#000000", 16, True),
+    "Selected": ("#E53935", 16, True),
+    "Nav": ("#222222", 16, False),
+}
+SCREENS = {  # Background and (text, style, pady) lines; pady None = centred
+    "starting": (BG, [("Starting voting machine...", "Title", None)]),
+    "idle": (BG, [("Place your finger on the sensor", "Title", 60), ("Waiting for fingerprint...", "Text", 20)]),
+    "recognized": ("#E8F5E9", [("Fingerprint recognized!", "Title", 50),
+                               ("Mr. {name}, you can now cast your vote.", "Message", 20)]),
+    "thanks": (BG, [("✅ Thank you for voting!", "Title", None)]),
+    "already_voted": ("#FFF8E1", [("⚠️ You have already voted!", "Title", 50),
+                                  ("Multiple voting is not allowed.", "Message", 20)]),
+}
+BALLOT_TITLE = "Vote for Your Candidate"
+
+# -----------------------------
+# Tk backend
+# -----------------------------
+class TkDisplay:
+    """The original Tk window; needs an X session."""
+
+    def __init__(self, size=(800, 500)):
+        os.environ.setdefault('DISPLAY', ':0')  # Set display to :0 (soak_test.py runs under Xvfb)
+        os.environ.setdefault('XAUTHORITY', '/home/pi/.Xauthority')  # Set X authority file
+        import tkinter  # Import Tkinter for GUI
+        from tkinter import ttk  # Import ttk for styled widgets
+        self.tk, self.ttk = tkinter, ttk
+        self.root = tkinter.Tk()  # Create main window (pumped, no mainloop)
+        self.root.title("Electronic Voting Machine")
+        self.root.configure(bg=BG)
+        self.root.geometry(f"{size[0]}x{size[1]}+0+0")
+        self.root.resizable(False, False)
+        style = ttk.Style()
+        for name, (color, size_, bold) in STYLES.items():
+            if name in ("Text", "Title", "Message"):
+                style.configure("TLabel" if name == "Text" else f"{name}.TLabel", background=BG, foreground=color,
+                                font=("Arial", size_, "bold") if bold else ("Arial", size_))
+        self.on_key = None
+        self.on_close = None
+        self.closed = False
+        self.root.bind("<Key>", lambda e: self.on_key and e.char and self.on_key(e.char))
+        self.root.protocol("WM_DELETE_WINDOW", lambda: self.on_close and self.on_close())
+
+    def clear(self):  # Remove the previous screen
+        for w in self.root.winfo_children():
+            w.destroy()
+
+    def message(self, screen, **fields):
+        bg, lines = SCREENS[screen]
+        self.clear()
+        frame = self.tk.Frame(self.root, bg=bg)
+        frame.pack(expand=True, fill="both")
+        for text, style, pady in lines:
+            label = self.ttk.Label(frame, text=text.format(**fields), style="TLabel" if style == "Text" else f"{style}.TLabel")
+            label.pack(expand=True) if pady is None else label.pack(pady=pady)
+
+    def ballot(self, candidates, cache, rows, cols, on_select):
+        from ballot_ui import BallotView  # Import paged ballot screen
+        self.clear()
+        self.ttk.Label(self.root, text=BALLOT_TITLE, style="Title.TLabel").pack(pady=10)
+        return BallotView(self.root, candidates, on_select=on_select, cache=cache, rows=rows, cols=cols).pack(pady=5)
+
+    def pump(self):  # Draw and handle every pending Tk event
+        if self.closed:
+            return False
+        try:
+            self.root.update()
+        except self.tk.TclError:  # Window closed
+            self.closed = True
+        return not self.closed
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.root.destroy()
+
+# -----------------------------
+# Frame backends (framebuffer, SDL)
+# -----------------------------
+class GlyphCache:
+    """Every character of every style is rasterised once; text is pasted from the masks."""
+
+    def __init__(self, fonts):
+        from PIL import Image, ImageDraw  # Import PIL for glyph masks
+        self.Image, self.ImageDraw = Image, ImageDraw
+        self.fonts = fonts
+        self.glyphs = {}  # (style, char) -> (mask, left, top, advance)
+        self.line_height = {style: sum(font.getmetrics()) for style, font in fonts.items()}
+
+    def glyph(self, style, char):
+        key = (style, char)
+        if key not in self.glyphs:
+            font = self.fonts[style]
+            left, top, right, bottom = font.getbbox(char)
+            mask = self.Image.new("L", (max(1, right - left), max(1, bottom - top)))
+            self.ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255)
+            self.glyphs[key] = (mask, left, top, font.getlength(char))
+        return self.glyphs[key]
+
+    def preload(self, styles, chars):  # Rasterise ahead of time so drawing never does
+        for style in styles:
+            for char in chars:
+                self.glyph(style, char)
+
+    def width(self, style, text):
+        return sum(self.glyph(style, char)[3] for char in text)
+
+    def draw(self, image, x, y, text, style, color=None):  # (x, y) = top left of the line
+        color = color or STYLES[style][0]
+        for char in text:
+            mask, left, top, advance = self.glyph(style, char)
+            image.paste(color, (round(x + left), y + top), mask)
+            x += advance
+
+    def draw_centered(self, image, cx, y, text, style):
+        self.draw(image, cx - self.width(style, text) / 2, y, text, style)
+
+class FramebufferSink:
+    """Writes frames to /dev/fbN (or a plain file for benchmarks) and reads evdev touch and keys."""
+
+    EVENT = struct.Struct("llHHi")  # struct input_event
+    EV_SYN, EV_KEY, EV_ABS = 0, 1, 3
+    ABS_X, ABS_Y, ABS_MT_X, ABS_MT_Y, BTN_TOUCH = 0x00, 0x01, 0x35, 0x36, 0x14A
+    KEYS = {2: "1", 3: "2", 4: "3", 5: "4", 6: "5", 7: "6", 8: "7", 9: "8", 10: "9", 11: "0", 16: "q"}
+
+    def __init__(self, device="/dev/fb0", size=None, bpp=None):
+        sysfs = f"/sys/class/graphics/{os.path.basename(device)}"
+        if size is None:
+            with open(f"{sysfs}/virtual_size") as f:  # "800,480"
+                size = tuple(int(v) for v in f.read().split(","))
+        if bpp is None:
+            with open(f"{sysfs}/bits_per_pixel") as f:
+                bpp = int(f.read())
+        self.size, self.bpp = size, bpp
+        self.stride = size[0] * bpp // 8
+        if os.path.exists(f"{sysfs}/stride"):  # Rows may be padded
+            with open(f"{sysfs}/stride") as f:
+                self.stride = int(f.read())
+        self.fd = os.open(device, os.O_RDWR | os.O_CREAT, 0o644)
+        self.inputs = []
+        for path in sorted(glob.glob("/dev/input/event*")):
+            try:
+                self.inputs.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+            except OSError:  # Needs the input group
+                pass
+        self._touch = [0, 0]
+        self._pressed = False
+
+    def encode(self, image):  # PIL RGB image -> framebuffer bytes
+        from PIL import Image, ImageChops  # Import PIL for pixel packing
+        if self.bpp == 32:
+            data = image.tobytes("raw", "BGRX")  # XRGB8888, little endian
+        else:  # RGB565 little endian: low byte gggbbbbb, high byte rrrrrggg
+            r, g, b = image.split()
+            low = ImageChops.add(g.point(lambda v: ((v >> 2) & 7) << 5), b.point(lambda v: v >> 3))
+            high = ImageChops.add(r.point(lambda v: v & 0xF8), g.point(lambda v: v >> 5))
+            data = Image.merge("LA", (low, high)).tobytes()
+        row = self.size[0] * self.bpp // 8
+        if self.stride != row:
+            pad = bytes(self.stride - row)
+            data = b"".join(data[i:i + row] + pad for i in range(0, len(data), row))
+        return data
+
+    def show(self, data):
+        os.pwrite(self.fd, data, 0)
+
+    def events(self):  # [("tap", (x, y)) | ("key", char)]
+        found = []
+        for fd in self.inputs:
+            try:
+                data = os.read(fd, self.EVENT.size * 64)
+            except (BlockingIOError, OSError):
+                continue
+            for offset in range(0, len(data) - self.EVENT.size + 1, self.EVENT.size):
+                _, _, kind, code, value = self.EVENT.unpack_from(data, offset)
+                if kind == self.EV_ABS and code in (self.ABS_X, self.ABS_MT_X):
+                    self._touch[0] = value  # Official touchscreen reports screen pixels
+                elif kind == self.EV_ABS and code in (self.ABS_Y, self.ABS_MT_Y):
+                    self._touch[1] = value
+                elif kind == self.EV_KEY and code == self.BTN_TOUCH:
+                    self._pressed = value == 1
+                elif kind == self.EV_SYN and self._pressed:  # Position of this touch is complete
+                    self._pressed = False
+                    found.append(("tap", tuple(self._touch)))
+                elif kind == self.EV_KEY and value == 1 and code in self.KEYS:
+                    found.append(("key", self.KEYS[code]))
+        return found
+
+    def close(self):
+        for fd in [self.fd] + self.inputs:
+            os.close(fd)
+
+class SdlSink:
+    """Shows frames on a pygame (SDL) surface: KMS/DRM, or a window for development."""
+
+    def __init__(self, size=(800, 480)):
+        import pygame  # Import pygame for SDL output (optional dependency)
+        self.pygame = pygame
+        pygame.display.init()
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption("Electronic Voting Machine")
+        self.size = size
+
+    def encode(self, image):
+        return image.tobytes()  # RGB, what frombuffer() wraps without copying
+
+    def show(self, data):
+        self.screen.blit(self.pygame.image.frombuffer(data, self.size, "RGB"), (0, 0))
+        self.pygame.display.flip()
+
+    def events(self):
+        pygame, found = self.pygame, []
+        for event in pygame.event.get():
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                found.append(("tap", event.pos))
+            elif event.type == pygame.KEYDOWN and event.unicode:
+                found.append(("key", event.unicode))
+            elif event.type == pygame.QUIT:
+                found.append(("quit", None))
+        return found
+
+    def close(self):
+        self.pygame.display.quit()
+
+class FrameDisplay:
+    """Screens drawn with PIL and pushed to a sink as whole frames."""
+
+    def __init__(self, sink):
+        from PIL import Image, ImageFont  # Import PIL for rendering
+        self.Image = Image
+        self.sink = sink
+        self.size = sink.size
+        fonts = {style: ImageFont.truetype(os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"), size)
+                 for style, (_, size, bold) in STYLES.items()}
+        self.glyphs = GlyphCache(fonts)
+        self.glyphs.preload(STYLES, "".join(chr(c) for c in range(32, 127)))  # Names on cards and the recognized screen
+        self.on_key = None
+        self.on_close = None
+        self.view = None  # FrameBallot receiving taps
+        self.closed = False
+        self.frames = {}  # Screen -> encoded frame, for screens without fields
+        for screen, (_, lines) in SCREENS.items():
+            if not any("{" in text for text, _, _ in lines):
+                self.frames[screen] = sink.encode(self.render(screen))
+        self.ballot_base = self.Image.new("RGB", self.size, BG)  # Ballot background with its title
+        self.glyphs.draw_centered(self.ballot_base, self.size[0] / 2, 10, BALLOT_TITLE, "Title")
+
+    def render(self, screen, **fields):  # PIL image of a message screen (pack-like layout)
+        bg, lines = SCREENS[screen]
+        image = self.Image.new("RGB", self.size, bg)
+        y = 0
+        for text, style, pady in lines:
+            text = text.format(**fields)
+            height = self.glyphs.line_height[style]
+            if pady is None:  # Single centred line
+                self.glyphs.draw_centered(image, self.size[0] / 2, (self.size[1] - height) // 2, text, style)
+                continue
+            y += pady
+            self.glyphs.draw_centered(image, self.size[0] / 2, y, text, style)
+            y += height + pady
+        return image
+
+    def message(self, screen, **fields):
+        self.view = None
+        frame = self.frames.get(screen)
+        self.sink.show(frame if frame is not None else self.sink.encode(self.render(screen, **fields)))
+
+    def show(self, image):
+        self.sink.show(self.sink.encode(image))
+
+    def ballot(self, candidates, cache, rows, cols, on_select):
+        self.view = FrameBallot(self, candidates, cache, rows, cols, on_select)
+        return self.view
+
+    def pump(self):  # Handle input and finish pending thumbnails
+        if self.closed:
+            return False
+        for kind, value in self.sink.events():
+            if kind == "tap" and self.view is not None:
+                self.view.tap(*value)
+            elif kind == "key" and self.on_key:
+                self.on_key(value)
+            elif kind == "quit" and self.on_close:
+                self.on_close()
+        if self.view is not None:
+            self.view.poll()
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.sink.close()
+
+class FrameBallot:
+    """Paged candidate grid drawn as frames, with the behaviour of ballot_ui.BallotView."""
+
+    GAP_X, GAP_Y, TOP, NAV_H = 24, 16, 60, 44
+
+    def __init__(self, display, candidates, cache, rows, cols, on_select):
+        self.display = display
+        self.candidates = candidates
+        self.cache = cache
+        self.cols = cols
+        self.on_select = on_select
+        self.per_page = rows * cols
+        self.pages = max(1, -(-len(candidates) // self.per_page))
+        self.page = 0
+        self.selected = None
+        self.thumb = cache.size
+        self.card_size = (self.thumb[0] + 20, self.thumb[1] + 50)
+        self.cards = {}  # (name, selected, has image) -> card image
+        self.targets = []  # (x0, y0, x1, y1, action) on the current page
+        self.missing = False  # Some thumbnail was still decoding
+        self.show_page(0)
+
+    def visible(self, page=None):
+        page = self.page if page is None else page
+        return self.candidates[page * self.per_page:(page + 1) * self.per_page]
+
+    def card(self, candidate, selected):  # Composed once per candidate and highlight
+        image = self.cache.image(candidate.get("image"))
+        key = (candidate["name"], selected, image is not None)
+        if key not in self.cards:
+            from PIL import ImageDraw  # Import PIL for the card border
+            w, h = self.card_size
+            card = self.display.Image.new("RGB", (w, h), "#FFFFFF")
+            ImageDraw.Draw(card).rectangle((0, 0, w - 1, h - 1), outline="#B0B0B0", width=2)
+            if image is not None:
+                card.paste(image, (10, 8))
+            else:
+                card.paste("#E0E0E0", (10, 8, 10 + self.thumb[0], 8 + self.thumb[1]))  # Placeholder
+            style = "Selected" if selected else "Card"
+            self.display.glyphs.draw_centered(card, w / 2, self.thumb[1] + 16, candidate["name"], style)
+            self.cards[key] = card
+        return self.cards[key]
+
+    def show_page(self, page):
+        self.page = max(0, min(page, self.pages - 1))
+        shown = self.visible()
+        self.cache.prefetch([c.get("image") for c in shown])
+        frame = self.display.ballot_base.copy()
+        width = self.display.size[0]
+        w, h = self.card_size
+        x0 = (width - self.cols * w - (self.cols - 1) * self.GAP_X) // 2
+        self.targets, self.missing = [], False
+        for i, c in enumerate(shown):
+            x = x0 + (i % self.cols) * (w + self.GAP_X)
+            y = self.TOP + (i // self.cols) * (h + self.GAP_Y)
+            frame.paste(self.card(c, c["name"] == self.selected), (x, y))
+            self.missing |= c.get("image") is not None and self.cache.image(c["image"]) is None \
+                and not self.cache.failed(c["image"])
+            self.targets.append((x, y, x + w, y + h, lambda name=c["name"]: self.select(name)))
+        if self.pages > 1:
+            self._draw_nav(frame)
+            self.cache.prefetch([c.get("image") for c in self.visible((self.page + 1) % self.pages)])
+        self.display.show(frame)
+
+    def _draw_nav(self, frame):  # ◀ Previous   Page n / m   Next ▶
+        glyphs, width = self.display.glyphs, self.display.size[0]
+        y = self.display.size[1] - self.NAV_H
+        label = f"Page {self.page + 1} / {self.pages}"
+        glyphs.draw_centered(frame, width / 2, y + 10, label, "Nav")
+        for text, x, step in (("◀ Previous", width / 2 - 240, -1), ("Next ▶", width / 2 + 140, 1)):
+            box = (int(x), y, int(x) + 120, y + self.NAV_H - 6)
+            frame.paste("#E0E0E0", box)
+            glyphs.draw_centered(frame, x + 60, y + 10, text, "Nav")
+            self.targets.append(box + (lambda step=step: self.show_page(self.page + step),))
+
+    def poll(self):  # Redraw once the visible thumbnails are decoded
+        if self.missing and all(self.cache.image(c.get("image")) is not None or self.cache.failed(c.get("image"))
+                                for c in self.visible() if c.get("image")):
+            self.show_page(self.page)
+
+    def tap(self, x, y):
+        for x0, y0, x1, y1, action in self.targets:
+            if x0 <= x < x1 and y0 <= y < y1:
+                action()
+                return
+
+    def select(self, name):  # Highlight and report a choice (button or touch)
+        self.selected = name
+        index = [c["name"] for c in self.candidates].index(name)
+        self.page = index // self.per_page  # A button may choose a candidate on another page
+        self.show_page(self.page)
+        self.on_select(name)
+
+def open_display(kind="tk"):  # Backend named by EVM_UI
+    if kind == "fb":
+        return FrameDisplay(FramebufferSink(os.environ.get("EVM_FB", "/dev/fb0")))
+    if kind == "sdl":
+        return FrameDisplay(SdlSink())
+    return TkDisplay()
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def rss_kb():  # Resident set size of this process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def bench_one(kind, rounds, fb_file):  # Runs in a fresh process per backend
+    start = time.perf_counter()
+    if kind == "fb" and fb_file:  # Plain file in the framebuffer's format (no /dev/fb0 needed)
+        display = FrameDisplay(FramebufferSink(fb_file, size=(800, 480), bpp=16))
+    else:
+        display = open_display(kind)
+    display.message("starting")
+    display.pump()
+    ready = time.perf_counter() - start
+
+    from ballot_ui import ThumbnailCache, load_candidates  # Import the booth's ballot and images
+    candidates = load_candidates()
+    cache = ThumbnailCache()
+    cache.prefetch([c.get("image") for c in candidates])
+    for future in list(cache.pending.values()):
+        future.exception()  # Wait for decoding; missing images become placeholders
+    times = {"message": [], "ballot": [], "select": []}
+
+    def timed(kind_, action):
+        t = time.perf_counter()
+        result = action()
+        display.pump()
+        times[kind_].append(time.perf_counter() - t)
+        return result
+
+    for i in range(rounds):
+        for screen in ("idle", "recognized", "thanks", "already_voted"):
+            timed("message", lambda: display.message(screen, name="Voter"))
+        view = timed("ballot", lambda: display.ballot(candidates, cache, 2, 4, lambda name: None))
+        timed("select", lambda: view.select(candidates[i % len(candidates)]["name"]))
+    frames = " ".join(f"{k} {sorted(v)[len(v) // 2] * 1000:.1f}/{max(v) * 1000:.1f}" for k, v in times.items())
+    print(f"{kind:>4}: ready {ready * 1000:6.0f} ms, RSS {rss_kb() / 1024:5.1f} MB, frame p50/max ms: {frames}")
+    display.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare booth display backends.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_bench = sub.add_parser("bench", help="startup, RSS and frame latency per backend")
+    p_bench.add_argument("--backends", nargs="+", default=["tk", "fb", "sdl"])
+    p_bench.add_argument("--rounds", type=int, default=20)
+    p_bench.add_argument("--fb-file", help="write fb frames to this file instead of /dev/fb0")
+    p_one = sub.add_parser("bench-one")
+    p_one.add_argument("backend")
+    p_one.add_argument("--rounds", type=int, default=20)
+    p_one.add_argument("--fb-file")
+    args = parser.parse_args()
+
+    if args.cmd == "bench-one":
+        bench_one(args.backend, args.rounds, args.fb_file)
+        return
+    for kind in args.backends:  # Separate processes so RSS and startup are not shared
+        cmd = [sys.executable, os.path.abspath(__file__), "bench-one", kind, "--rounds", str(args.rounds)]
+        if args.fb_file:
+            cmd += ["--fb-file", args.fb_file]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode:
+            print(f"{kind:>4}: unavailable ({result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'})")
+        else:
+            print(result.stdout, end="")
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,424 @@
 #!/usr/bin/env python3
 """
-Push Button Check Script for EVM
-This script tests the GPIO push buttons connected to the Raspberry Pi.
-It detects button presses and prints messages to the console.
-Run with: sudo python3 button_check.py
+Push Button Check and Hardware Self-Test for EVM
+Without arguments this tests the GPIO push buttons connected to the Raspberry
+Pi as before: it prints every press, now with its edge-to-callback latency.
+The subcommands qualify a booth before election day:
+
+    buttons     press each button --presses times: latency histogram and bounce counts
+    buzzer      buzzer switching time (true pin latency with a --loopback wire)
+    sensor      PING round trip, CHECK round trip and match rate over --trials, link errors
+    factories   gpiozero pin factories (lgpio, pigpio, RPi.GPIO) on idle CPU and latency
+    all         buttons, buzzer and sensor with a PASS/FAIL summary
+
+Latency is measured from the edge timestamp the pin factory reports to the
+moment gpiozero runs the callback. lgpio and pigpio timestamp edges where they
+happen; RPi.GPIO only timestamps them in the callback thread, so its button
+latency reads too low. For a fair comparison connect an output pin to an
+input pin and use factories --loopback OUT IN.
+
+Run with: sudo python3 button_check.py [buttons|buzzer|sensor|factories|all] [--sim]
 """
 
-from gpiozero import Button
-import time
-import signal
-import sys
+import argparse  # Import argparse for the subcommands
+import json  # Import json for candidates.json and factory results
+import os  # Import os for candidates.json and the environment
+import signal  # Import signal for Ctrl+C
+import subprocess  # Import subprocess to test each pin factory separately
+import sys  # Import sys for exit codes
+import threading  # Import threading for callback events
+import time  # Import time for trials and CPU
 
-# GPIO pins for candidates (same as in voting scripts)
+# GPIO pins for candidates (used when candidates.json has none)
 BUTTON_PINS = {
     "Alice": 17,
     "Bob": 27,
     "Charlie": 22
 }
+BUZZER_PIN = 18  # Active low, Physical Pin 12 (same as the voting scripts)
+BOOTH_BOUNCE = 0.2  # bounce_time the voting scripts use, seconds
+BURST_GAP = 0.02  # Edges closer than this belong to one press or release
+LATENCY_BUCKETS_US = (100, 250, 500, 1000, 2000, 5000, 10000)  # Histogram upper bounds
+FACTORIES = ("lgpio", "pigpio", "rpigpio")  # GPIOZERO_PIN_FACTORY names
+LIMITS = {  # Qualification thresholds for "all"
+    "button_p99_ms": 5.0,  # Edge to callback
+    "buzzer_ms": 5.0,  # on() to pin, measured with --loopback only
+    "ping_p95_ms": 50.0,  # Serial round trip
+    "match_rate": 0.9,  # Enrolled finger held on the sensor
+}
+
+def button_pins(path="candidates.json"):  # Candidate name -> GPIO, as the voting scripts use
+    if os.path.exists(path):
+        with open(path) as f:
+            pins = {c["name"]: c["gpio"] for c in json.load(f) if c.get("gpio") is not None}
+        if pins:
+            return pins
+    return dict(BUTTON_PINS)
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+def histogram(latencies_us, width=30):  # Text histogram of microsecond latencies
+    counts = [0] * (len(LATENCY_BUCKETS_US) + 1)
+    for value in latencies_us:
+        counts[next((i for i, b in enumerate(LATENCY_BUCKETS_US) if value < b), len(LATENCY_BUCKETS_US))] += 1
+    top = max(counts) or 1
+    labels = [f"<{b / 1000:g} ms" if b >= 1000 else f"<{b} µs" for b in LATENCY_BUCKETS_US] + [f"≥{LATENCY_BUCKETS_US[-1] / 1000:g} ms"]
+    return "\n".join(f"      {label:>8} {'█' * round(count / top * width):<{width}} {count}"
+                     for label, count in zip(labels, counts) if count or label == labels[0])
+
+# -----------------------------
+# Buttons
+# -----------------------------
+class ButtonProbe:
+    """A button without debouncing whose raw edges are timestamped and grouped into presses."""
+
+    def __init__(self, name, pin):
+        from gpiozero import Button  # Import gpiozero for GPIO control
+        self.name, self.pin = name, pin
+        self.button = Button(pin, pull_up=True, bounce_time=None)  # Raw edges, to count bounces
+        self.factory = self.button.pin_factory
+        self.inner = self.button.pin.when_changed  # Button's own edge handler
+        self.button.pin.when_changed = self._changed  # Held weakly by gpiozero: keep the probe referenced
+        self.button.when_pressed = self._pressed
+        self.latencies = []  # Seconds from the first edge of a press to when_pressed
+        self.bursts = []  # (pressed, edges, seconds from first to last edge)
+        self.presses = threading.Semaphore(0)  # Released once per press
+        self.on_press = None  # Called with the latency of each press
+        self._burst = None  # [pressed, first ticks, last ticks, edges]
+        self._edge = None  # Ticks of the edge being handled
+        self._first = False  # That edge starts a press
+
+    def _changed(self, ticks, state):  # Pin factory thread, for every edge
+        burst = self._burst
+        if burst is None or self.factory.ticks_diff(ticks, burst[2]) > BURST_GAP:
+            self._close_burst()
+            self._burst = [not state, ticks, ticks, 1]  # Pulled up: low means pressed
+            self._first = not state
+        else:
+            burst[2], burst[3] = ticks, burst[3] + 1
+            self._first = False
+        self._edge = ticks
+        self.inner(ticks, state)  # Button decides whether this is a press
+
+    def _pressed(self):
+        if self._first:  # Bounces of the same press are not presses
+            latency = self.factory.ticks_diff(self.factory.ticks(), self._edge)
+            self.latencies.append(latency)
+            self.presses.release()
+            if self.on_press:
+                self.on_press(latency)
+
+    def quiet(self):  # Seconds since the last edge
+        return self.factory.ticks_diff(self.factory.ticks(), self._edge) if self._edge is not None else float("inf")
+
+    def _close_burst(self):
+        if self._burst is not None:
+            pressed, first, last, edges = self._burst
+            self.bursts.append((pressed, edges, self.factory.ticks_diff(last, first)))
+            self._burst = None
+
+    def report(self):
+        self._close_burst()
+        bounces = sum(edges - 1 for _, edges, _ in self.bursts)
+        settle = max((s for _, _, s in self.bursts), default=0.0)
+        us = [l * 1e6 for l in self.latencies]
+        mark = "✅" if settle < BOOTH_BOUNCE else "⚠️"
+        print(f"   🔘 {self.name} (GPIO {self.pin}): {len(self.latencies)} presses, "
+              f"latency p50 {percentile(us, 0.5):.0f} µs, p99 {percentile(us, 0.99):.0f} µs, max {max(us, default=0):.0f} µs")
+        print(f"      {mark} {bounces} bounce edges in {len(self.bursts)} presses/releases, "
+              f"longest settle {settle * 1000:.1f} ms (booth bounce_time {BOOTH_BOUNCE * 1000:.0f} ms)")
+        if us:
+            print(histogram(us))
+        return len(self.latencies), percentile(us, 0.99) / 1000, settle
+
+    def close(self):
+        self.button.close()
+
+def open_probes(pins):
+    probes = {}
+    for name, pin in pins.items():
+        try:
+            probes[name] = ButtonProbe(name, pin)
+            print(f"✅ Button {name} setup on GPIO {pin}")
+        except Exception as e:
+            print(f"❌ Failed to setup button {name} on GPIO {pin}: {e}")
+            sys.exit(1)
+    return probes
 
-# Setup buttons with pull-up resistors and bounce time
-buttons = {}
-for name, pin in BUTTON_PINS.items():
+def watch(pins):  # The original check: print presses until Ctrl+C
+    probes = open_probes(pins)
+    for name, probe in probes.items():
+        probe.on_press = lambda latency, n=name: print(f"🔘 Button '{n}' pressed! (GPIO {pins[n]}, {latency * 1e6:.0f} µs)")
+
+    print("\n" + "=" * 50)
+    print("PUSH BUTTON CHECK SCRIPT")
+    print("=" * 50)
+    print("Press any candidate button to test.")
+    print("Expected buttons: " + ", ".join(f"{name} (GPIO {pin})" for name, pin in pins.items()))
+    print("Press Ctrl+C to exit.")
+    print("=" * 50 + "\n")
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        print("\nExiting button check script...")
+    for probe in probes.values():
+        if probe.latencies:
+            probe.report()
+
+def test_buttons(pins, presses, timeout):  # Guided: press each button in turn
+    print(f"\n🔘 Button test: press each button {presses} times")
+    probes = open_probes(pins)
+    results = {}
+    for name, probe in probes.items():
+        print(f"   Press {name} (GPIO {probe.pin}) {presses} times...")
+        for i in range(presses):
+            if not probe.presses.acquire(timeout=timeout):
+                print(f"   ❌ No press of {name} within {timeout:.0f} s")
+                break
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and (probe.button.is_pressed or probe.quiet() < 5 * BURST_GAP):
+            time.sleep(0.01)  # Let the last release and its bounces finish
+        results[name] = probe.report()
+        probe.close()
+    return results
+
+def simulate_presses(pins, presses):  # --sim: press mock pins with a few bounces
+    from gpiozero import Device  # Import gpiozero for the mock pins
+    import random  # Import random for bounce counts
+    time.sleep(0.2)
+    for pin in pins.values():
+        for _ in range(presses):
+            mock = Device.pin_factory.pin(pin)
+            for level in [0, 1] * random.randint(0, 2) + [0]:  # Bouncing contact, then pressed
+                mock.drive_low() if level == 0 else mock.drive_high()
+                time.sleep(0.001)
+            time.sleep(0.05)
+            mock.drive_high()
+            time.sleep(0.05)
+
+# -----------------------------
+# Buzzer
+# -----------------------------
+def test_buzzer(trials, loopback=None):  # Milliseconds from on()/off() to the pin changing, None without loopback
+    from gpiozero import Buzzer, DigitalInputDevice  # Import gpiozero for GPIO control
+    print(f"\n🔊 Buzzer test on GPIO {BUZZER_PIN}, {trials} beeps")
+    buzzer = Buzzer(BUZZER_PIN, active_high=False, initial_value=False)
+    factory = buzzer.pin_factory
+    sense, changed, edge = None, threading.Event(), [None]
+    if loopback is not None:  # Wire from the buzzer pin to this input
+        sense = DigitalInputDevice(loopback, pull_up=None, active_state=True)
+        sense.pin.when_changed = lambda ticks, state: (edge.__setitem__(0, ticks), changed.set())
+    calls, pins = [], []
+    for i in range(trials):
+        for action in (buzzer.on, buzzer.off):
+            changed.clear()
+            start = factory.ticks()
+            action()
+            calls.append(factory.ticks_diff(factory.ticks(), start))
+            if sense is not None:
+                if changed.wait(0.1):
+                    pins.append(factory.ticks_diff(edge[0], start))
+            time.sleep(0.05)  # Short chirps
+    buzzer.close()
+    if sense is not None:
+        sense.close()
+    print(f"   on()/off() call: p50 {percentile(calls, 0.5) * 1e6:.0f} µs, max {max(calls) * 1e6:.0f} µs")
+    if loopback is not None:
+        missed = 2 * trials - len(pins)
+        print(f"   pin change (loopback GPIO {loopback}): p50 {percentile(pins, 0.5) * 1e6:.0f} µs, "
+              f"max {max(pins, default=0) * 1e6:.0f} µs, {missed} missed")
+        return max(pins, default=float("inf")) * 1000 if not missed else float("inf")
+    print("   (connect the buzzer pin to an input and pass --loopback to measure the pin itself)")
+    return None  # The call time says nothing about the pin
+
+# -----------------------------
+# Fingerprint sensor
+# -----------------------------
+def test_sensor(port, trials, expect=None, sim=False):  # Serial round trips, match rate, link errors
+    from serial_session import COMMAND_DONE, ReconnectingSession, SensorError  # Import serial session for the Arduino
+    errors = {"timeouts": 0, "unexpected lines": 0, "reconnects": 0}
+    known = lambda line: any(done(line) for done in COMMAND_DONE.values()) or line in ("WAKE", "SLEEPING")
+
+    def unexpected(line):
+        errors["unexpected lines"] += 1
+        print(f"   ⚠️ Unexpected line: {line!r}")
+    if sim:
+        from arduino_sim import SimulatedArduino  # Import simulated Arduino for a dry run
+        board = SimulatedArduino(enrolled={expect or 1}, scan_time=0.3)
+        sensor = ReconnectingSession(port, opener=lambda: board, on_event=print)
+    else:
+        sensor = ReconnectingSession(port, on_event=print)
+    print(f"\n🖐️ Sensor test on {port}, {trials} trials")
     try:
-        buttons[name] = Button(pin, pull_up=True, bounce_time=0.2)
-        print(f"✅ Button {name} setup on GPIO {pin}")
-    except Exception as e:
-        print(f"❌ Failed to setup button {name} on GPIO {pin}: {e}")
-        sys.exit(1)
-
-# Signal handler for clean exit
-def signal_handler(sig, frame):
-    print("\nExiting button check script...")
-    sys.exit(0)
-
-signal.signal(signal.SIGINT, signal_handler)
-
-# Button press handlers
-def button_pressed(name):
-    print(f"🔘 Button '{name}' pressed! (GPIO {BUTTON_PINS[name]})")
-
-# Assign handlers
-for name, btn in buttons.items():
-    btn.when_pressed = lambda n=name: button_pressed(n)
-
-print("\n" + "="*50)
-print("PUSH BUTTON CHECK SCRIPT")
-print("="*50)
-print("Press any candidate button to test.")
-print("Expected buttons: Alice (GPIO 17), Bob (GPIO 27), Charlie (GPIO 22)")
-print("Press Ctrl+C to exit.")
-print("="*50 + "\n")
-
-# Keep script running
-while True:
-    time.sleep(0.1)
\ No newline at end of file
+        sensor.open()
+        sensor.wait_ready(on_line=lambda line: known(line) or unexpected(line))
+    except (OSError, SensorError) as e:
+        print(f"   ❌ Sensor not ready: {e}")
+        return None
+
+    pings = []
+    for _ in range(trials):
+        start = time.perf_counter()
+        reply = sensor.request("PING", on_line=unexpected)
+        if reply is None:
+            errors["timeouts"] += 1
+        else:
+            pings.append(time.perf_counter() - start)
+    print(f"   PING round trip: p50 {percentile(pings, 0.5) * 1000:.1f} ms, "
+          f"p95 {percentile(pings, 0.95) * 1000:.1f} ms, max {max(pings, default=0) * 1000:.1f} ms")
+
+    if not sim:
+        input("   Rest an enrolled finger on the sensor and press Enter...")
+    checks, matches, wrong = [], 0, 0
+    for i in range(trials):
+        if sim:
+            board.place_finger(expect or 1)
+        start = time.perf_counter()
+        reply = sensor.request("CHECK", on_line=unexpected)
+        if reply is None:
+            errors["timeouts"] += 1
+            continue
+        checks.append(time.perf_counter() - start)
+        if reply.startswith("MATCH:"):
+            matches += 1
+            wrong += expect is not None and reply[6:] != str(expect)
+    errors["reconnects"] = len(sensor.recoveries)
+    sensor.close()
+    rate = matches / trials if trials else 0.0
+    print(f"   CHECK round trip: p50 {percentile(checks, 0.5) * 1000:.0f} ms, "
+          f"p95 {percentile(checks, 0.95) * 1000:.0f} ms, max {max(checks, default=0) * 1000:.0f} ms")
+    print(f"   Match rate: {matches}/{trials} ({rate:.0%})" + (f", {wrong} matched the wrong ID" if wrong else ""))
+    print("   Link errors: " + ", ".join(f"{count} {name}" for name, count in errors.items()))
+    return {"ping_p95_ms": percentile(pings, 0.95) * 1000, "match_rate": rate if not wrong else 0.0,
+            "link_errors": sum(errors.values())}
+
+# -----------------------------
+# Pin factories
+# -----------------------------
+def probe_factory(seconds, loopback, toggles=200):  # Runs in a child with GPIOZERO_PIN_FACTORY set
+    from gpiozero import Button, DigitalInputDevice, Device, OutputDevice  # Import gpiozero for GPIO control
+    buttons = [Button(pin, pull_up=True, bounce_time=BOOTH_BOUNCE) for pin in button_pins().values()]  # As the booth
+    factory = Device.pin_factory
+    start_cpu, start = time.process_time(), time.monotonic()
+    time.sleep(seconds)  # Idle booth waiting for a press
+    result = {"factory": type(factory).__name__,
+              "idle_cpu": (time.process_time() - start_cpu) / (time.monotonic() - start) * 100}
+    if loopback:
+        out = OutputDevice(loopback[0], initial_value=False)
+        sense = DigitalInputDevice(loopback[1], pull_up=None, active_state=True)
+        changed, latencies = threading.Event(), []
+        sense.when_activated = sense.when_deactivated = changed.set
+        start_cpu, start = time.process_time(), time.monotonic()
+        for i in range(toggles):
+            changed.clear()
+            begin = factory.ticks()
+            out.toggle()
+            if changed.wait(0.1):
+                latencies.append(factory.ticks_diff(factory.ticks(), begin))
+            time.sleep(0.005)
+        result.update(busy_cpu=(time.process_time() - start_cpu) / (time.monotonic() - start) * 100,
+                      p50_us=percentile(latencies, 0.5) * 1e6, p99_us=percentile(latencies, 0.99) * 1e6,
+                      missed=toggles - len(latencies))
+        out.close()
+        sense.close()
+    for button in buttons:
+        button.close()
+    print(json.dumps(result))
+
+def compare_factories(names, seconds, loopback):
+    print(f"\n⚙️ Pin factories: idle CPU with the booth's buttons over {seconds:g} s"
+          + (f", loopback GPIO {loopback[0]} -> {loopback[1]}" if loopback else ""))
+    for name in names:
+        cmd = [sys.executable, os.path.abspath(__file__), "factory-probe", "--seconds", str(seconds)]
+        if loopback:
+            cmd += ["--loopback", *map(str, loopback)]
+        result = subprocess.run(cmd, capture_output=True, text=True, env=dict(os.environ, GPIOZERO_PIN_FACTORY=name))
+        if result.returncode:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+            print(f"   {name:>8}: unavailable ({error})")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        line = f"   {name:>8}: idle CPU {r['idle_cpu']:5.2f}%"
+        if "p50_us" in r:
+            line += (f", toggle->callback p50 {r['p50_us']:.0f} µs, p99 {r['p99_us']:.0f} µs, "
+                     f"{r['missed']} missed, CPU while toggling {r['busy_cpu']:.1f}%")
+        print(line)
+
+# -----------------------------
+# Start program
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Check buttons, buzzer and sensor of a booth.")
+    parser.add_argument("--sim", action="store_true", help="dry run on mock pins and the simulated Arduino")
+    sub = parser.add_subparsers(dest="cmd")
+    p_buttons = sub.add_parser("buttons", help="latency histogram and bounce counts per button")
+    p_buttons.add_argument("--presses", type=int, default=10)
+    p_buttons.add_argument("--timeout", type=float, default=30, help="seconds to wait for each press")
+    p_buzzer = sub.add_parser("buzzer", help="buzzer switching time")
+    p_buzzer.add_argument("--trials", type=int, default=10)
+    p_buzzer.add_argument("--loopback", type=int, help="input GPIO wired to the buzzer pin")
+    p_sensor = sub.add_parser("sensor", help="serial round trips, match rate and link errors")
+    p_sensor.add_argument("--port", default="/dev/ttyACM0")
+    p_sensor.add_argument("--trials", type=int, default=20)
+    p_sensor.add_argument("--expect", type=int, help="enrolled ID of the test finger")
+    p_factories = sub.add_parser("factories", help="compare gpiozero pin factories")
+    p_factories.add_argument("--seconds", type=float, default=5)
+    p_factories.add_argument("--loopback", type=int, nargs=2, metavar=("OUT", "IN"))
+    p_factories.add_argument("--factories", nargs="+", default=list(FACTORIES))
+    p_probe = sub.add_parser("factory-probe")
+    p_probe.add_argument("--seconds", type=float, default=5)
+    p_probe.add_argument("--loopback", type=int, nargs=2)
+    p_all = sub.add_parser("all", help="buttons, buzzer and sensor with PASS/FAIL")
+    p_all.add_argument("--presses", type=int, default=5)
+    p_all.add_argument("--trials", type=int, default=20)
+    p_all.add_argument("--port", default="/dev/ttyACM0")
+    p_all.add_argument("--expect", type=int)
+    p_all.add_argument("--loopback", type=int, help="input GPIO wired to the buzzer pin")
+    args = parser.parse_args()
+
+    if args.sim:
+        os.environ.setdefault("GPIOZERO_PIN_FACTORY", "mock")
+    pins = button_pins()
+    if args.sim and args.cmd in ("buttons", "all"):
+        threading.Thread(target=simulate_presses, args=(pins, args.presses), daemon=True).start()
+
+    if args.cmd is None:
+        watch(pins)
+    elif args.cmd == "buttons":
+        test_buttons(pins, args.presses, args.timeout)
+    elif args.cmd == "buzzer":
+        test_buzzer(args.trials, args.loopback)
+    elif args.cmd == "sensor":
+        test_sensor(args.port, args.trials, args.expect, args.sim)
+    elif args.cmd == "factories":
+        compare_factories(args.factories, args.seconds, args.loopback)
+    elif args.cmd == "factory-probe":
+        probe_factory(args.seconds, args.loopback)
+    else:  # all: qualify the booth
+        checks = []
+        for name, (seen, p99_ms, settle) in test_buttons(pins, args.presses, 30).items():
+            checks.append((f"button {name} {seen}/{args.presses} presses seen", seen >= args.presses))
+            checks.append((f"button {name} latency p99 {p99_ms:.2f} ms", p99_ms <= LIMITS["button_p99_ms"]))
+            checks.append((f"button {name} settles in {settle * 1000:.1f} ms", settle < BOOTH_BOUNCE))
+        buzzer_ms = test_buzzer(5, args.loopback)
+        if buzzer_ms is None:
+            checks.append(("buzzer pin not measured (no --loopback)", None))
+        else:
+            checks.append((f"buzzer {buzzer_ms:.2f} ms", buzzer_ms <= LIMITS["buzzer_ms"]))
+        sensor = test_sensor(args.port, args.trials, args.expect, args.sim)
+        if sensor is None:
+            checks.append(("sensor ready", False))
+        else:
+            checks.append((f"sensor PING p95 {sensor['ping_p95_ms']:.1f} ms", sensor["ping_p95_ms"] <= LIMITS["ping_p95_ms"]))
+            checks.append((f"sensor match rate {sensor['match_rate']:.0%}", sensor["match_rate"] >= LIMITS["match_rate"]))
+            checks.append((f"sensor link errors {sensor['link_errors']}", sensor["link_errors"] == 0))
+        print("\n" + "=" * 50)
+        for text, ok in checks:
+            print(f"{'➖ N/A ' if ok is None else '✅ PASS' if ok else '❌ FAIL'}  {text}")
+        print("=" * 50)
+        sys.exit(0 if all(ok is not False for _, ok in checks) else 1)
+
+if __name__ == "__main__":
+    main()
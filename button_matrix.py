@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Button Matrix Input for EVM
+Reads a bank of candidate buttons wired as a key matrix, either directly on
+GPIO pins or through an MCP23017 I2C I/O expander, so the number of candidates
+is no longer limited by free GPIO pins (8 rows x 8 columns = 64 buttons on
+16 pins, or on 2 pins of I2C).
+
+A background thread drives one row at a time and reads the columns. Each key is
+debounced on its own and exposed as a MatrixKey with the same interface as a
+gpiozero Button (is_pressed, when_pressed, when_released, wait_for_press), so
+voting6.py can treat matrix keys and plain buttons alike.
+
+keypad.json (read by voting6.py when present):
+    {"backend": "gpio", "rows": [5, 6, 13, 19], "cols": [12, 16, 20, 21]}
+    {"backend": "mcp23017", "bus": 1, "address": 32, "rows": 8, "cols": 8}
+and each candidate in candidates.json names its key as "key": [row, col].
+
+Run with: python3 button_matrix.py bench [--rows 8 --cols 8 --hz 500]
+(uses a software-mocked matrix, no hardware needed)
+"""
+
+import argparse  # Import argparse for the benchmark CLI
+import json  # Import json for keypad.json
+import random  # Import random for benchmark presses
+import threading  # Import threading for the scan thread
+import time  # Import time for debounce and statistics
+
+KEYPAD_FILE = "keypad.json"  # Matrix wiring for voting6.py
+
+# -----------------------------
+# Backends: scan_row(row) -> bitmask of pressed columns
+# -----------------------------
+class GpioMatrixBackend:
+    """Rows driven low one at a time, columns read with pull-ups (gpiozero)."""
+
+    def __init__(self, row_pins, col_pins):
+        from gpiozero import DigitalInputDevice, DigitalOutputDevice  # Import gpiozero for GPIO control
+        self.rows, self.cols = len(row_pins), len(col_pins)
+        self.row_out = [DigitalOutputDevice(p, active_high=False, initial_value=False) for p in row_pins]
+        self.col_in = [DigitalInputDevice(p, pull_up=True) for p in col_pins]  # Pressed key pulls column low
+
+    def scan_row(self, row):
+        self.row_out[row].on()  # Drive this row low
+        mask = 0
+        for c, pin in enumerate(self.col_in):
+            if pin.value:  # Active (low) column
+                mask |= 1 << c
+        self.row_out[row].off()
+        return mask
+
+    def close(self):
+        for dev in self.row_out + self.col_in:
+            dev.close()
+
+class MCP23017Backend:
+    """Rows on port A (outputs), columns on port B (inputs with pull-ups) of an MCP23017."""
+
+    IODIRA, IODIRB, GPPUB, GPIOA, GPIOB = 0x00, 0x01, 0x0D, 0x12, 0x13  # Register addresses (BANK=0)
+
+    def __init__(self, bus=1, address=0x20, rows=8, cols=8):
+        from smbus2 import SMBus  # Import smbus2 for I2C
+        self.rows, self.cols = rows, cols
+        self.address = address
+        self.bus = SMBus(bus)
+        self.bus.write_byte_data(address, self.IODIRA, 0x00)  # Port A outputs
+        self.bus.write_byte_data(address, self.IODIRB, 0xFF)  # Port B inputs
+        self.bus.write_byte_data(address, self.GPPUB, 0xFF)  # Pull-ups on port B
+        self.bus.write_byte_data(address, self.GPIOA, 0xFF)  # All rows idle (high)
+
+    def scan_row(self, row):
+        self.bus.write_byte_data(self.address, self.GPIOA, 0xFF ^ (1 << row))  # Drive this row low
+        cols = self.bus.read_byte_data(self.address, self.GPIOB)
+        return ~cols & ((1 << self.cols) - 1)  # Low column = pressed
+
+    def close(self):
+        self.bus.write_byte_data(self.address, self.GPIOA, 0xFF)
+        self.bus.close()
+
+class MockMatrix:
+    """Software matrix for tests and benchmarks; press()/release() from any thread."""
+
+    def __init__(self, rows=4, cols=4, bounce=0):
+        self.rows, self.cols = rows, cols
+        self.bounce = bounce  # Extra noisy samples after each change
+        self.state = [0] * rows
+        self.noise = {}  # (row, col) -> remaining bouncing samples
+        self.pressed_at = {}  # (row, col) -> perf_counter of the last press, for latency
+
+    def press(self, row, col):
+        self.pressed_at[(row, col)] = time.perf_counter()
+        self.state[row] |= 1 << col
+        self.noise[(row, col)] = self.bounce
+
+    def release(self, row, col):
+        self.state[row] &= ~(1 << col)
+        self.noise[(row, col)] = self.bounce
+
+    def scan_row(self, row):
+        mask = self.state[row]
+        for (r, c), left in list(self.noise.items()):
+            if r == row and left > 0:  # Contact bounce: flip the bit on some samples
+                self.noise[(r, c)] = left - 1
+                if random.random() < 0.5:
+                    mask ^= 1 << c
+        return mask
+
+    def close(self):
+        pass
+
+# -----------------------------
+# Keys and scanner
+# -----------------------------
+class MatrixKey:
+    """One debounced key with a gpiozero Button-like interface."""
+
+    def __init__(self, row, col):
+        self.row, self.col = row, col
+        self.is_pressed = False
+        self.when_pressed = None  # Called from the scan thread, like gpiozero callbacks
+        self.when_released = None
+        self._event = threading.Event()
+        self._raw = False  # Last raw sample
+        self._since = 0.0  # When the raw sample started to differ from is_pressed
+
+    def wait_for_press(self, timeout=None):
+        self._event.clear()
+        return self._event.wait(timeout)
+
+class ButtonMatrix:
+    """Scans a matrix backend in a background thread and debounces every key."""
+
+    def __init__(self, backend, scan_hz=500, debounce_ms=20):
+        self.backend = backend
+        self.period = 1.0 / scan_hz  # One full matrix scan
+        self.debounce = debounce_ms / 1000
+        self.keys = {(r, c): MatrixKey(r, c) for r in range(backend.rows) for c in range(backend.cols)}
+        self.scans = 0  # Completed full scans
+        self.scan_cpu = 0.0  # CPU seconds spent in the scan thread
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="button-matrix", daemon=True)
+
+    def key(self, row, col):  # MatrixKey for a position
+        return self.keys[(row, col)]
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        cpu_start = time.thread_time()
+        next_scan = time.perf_counter()
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            for r in range(self.backend.rows):
+                mask = self.backend.scan_row(r)
+                for c in range(self.backend.cols):
+                    self._sample(self.keys[(r, c)], bool(mask >> c & 1), now)
+            self.scans += 1
+            self.scan_cpu = time.thread_time() - cpu_start
+            next_scan += self.period
+            delay = next_scan - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)  # Sleep between scans: no busy loop
+            else:
+                next_scan = time.perf_counter()  # Overrun: do not try to catch up
+
+    def _sample(self, key, raw, now):  # Per-key debounce
+        if raw == key.is_pressed:  # Stable, nothing pending
+            key._raw = raw
+            return
+        if raw != key._raw:  # First sample of a change (or bounce back): restart the timer
+            key._raw, key._since = raw, now
+            return
+        if now - key._since >= self.debounce:  # Changed state held long enough
+            key.is_pressed = raw
+            if raw:
+                key._event.set()
+            callback = key.when_pressed if raw else key.when_released
+            if callback:
+                callback()
+
+    def stats(self):  # Scan rate, worst-case latency and CPU use
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        rate = self.scans / elapsed if elapsed else 0.0
+        return {
+            "scan_hz": rate,
+            "worst_latency_ms": (self.debounce + 2 / rate) * 1000 if rate else None,  # After contacts settle: debounce + two scans
+            "cpu_percent": self.scan_cpu / elapsed * 100 if elapsed else 0.0,
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.backend.close()
+
+def load_keypad(path=KEYPAD_FILE, scan_hz=500, debounce_ms=20):  # Build a matrix from keypad.json
+    with open(path) as f:
+        cfg = json.load(f)
+    if cfg.get("backend") == "mcp23017":
+        backend = MCP23017Backend(cfg.get("bus", 1), cfg.get("address", 0x20), cfg.get("rows", 8), cfg.get("cols", 8))
+    else:
+        backend = GpioMatrixBackend(cfg["rows"], cfg["cols"])
+    return ButtonMatrix(backend, cfg.get("scan_hz", scan_hz), cfg.get("debounce_ms", debounce_ms)).start()
+
+# -----------------------------
+# Benchmark with a mocked matrix
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Measure matrix scan rate, latency and CPU with a mocked matrix.")
+    parser.add_argument("cmd", choices=["bench"])
+    parser.add_argument("--rows", type=int, default=8)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--hz", type=int, default=500, help="target full scans per second")
+    parser.add_argument("--debounce-ms", type=int, default=20)
+    parser.add_argument("--presses", type=int, default=50)
+    parser.add_argument("--bounce", type=int, default=3, help="noisy samples after each edge")
+    args = parser.parse_args()
+
+    mock = MockMatrix(args.rows, args.cols, bounce=args.bounce)
+    matrix = ButtonMatrix(mock, args.hz, args.debounce_ms)
+    latencies = []
+    for key in matrix.keys.values():
+        def pressed(k=key):
+            latencies.append((time.perf_counter() - mock.pressed_at[(k.row, k.col)]) * 1000)
+        key.when_pressed = pressed
+    matrix.start()
+    for _ in range(args.presses):  # Press random keys like a voter would
+        r, c = random.randrange(args.rows), random.randrange(args.cols)
+        mock.press(r, c)
+        time.sleep(0.08)
+        mock.release(r, c)
+        time.sleep(0.05)
+    time.sleep(0.1)
+    stats = matrix.stats()
+    matrix.close()
+    extra = len(latencies) - args.presses  # Bounce that slipped through as extra presses
+    latencies.sort()
+    print(f"Matrix {args.rows}x{args.cols}: {stats['scan_hz']:.0f} scans/s, {stats['cpu_percent']:.1f}% CPU")
+    print(f"Detected {len(latencies)}/{args.presses} presses ({max(extra, 0)} false)")
+    if latencies:
+        bound = stats["worst_latency_ms"] + args.bounce / stats["scan_hz"] * 1000  # Bouncing samples restart the timer
+        print(f"Press latency: median {latencies[len(latencies) // 2]:.1f} ms, max {latencies[-1]:.1f} ms "
+              f"(bound {bound:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
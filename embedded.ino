@@ -1,15 +1,35 @@
 #include <Adafruit_Fingerprint.h>  // Include library for FPM10A fingerprint sensor
 #include <SoftwareSerial.h>  // Include library for software serial communication
+#include <avr/sleep.h>  // Include sleep modes for idle
 
 SoftwareSerial mySerial(2, 3); // RX, TX for fingerprint sensor - Pin 2 is RX (receive from sensor), Pin 3 is TX (transmit to sensor)
 Adafruit_Fingerprint finger(&mySerial);  // Create fingerprint sensor object using software serial
 
+#define TEMPLATE_SIZE 512  // Bytes in one FPM10A character file (template)
+#define TEMPLATE_CHUNK 64  // Data bytes per sensor packet (set in setup)
+#define FINGERPRINT_DOWNCHAR 0x09  // Sensor command: download a template into a char buffer
+#define FINGERPRINT_READINDEX 0x1F  // Sensor command: read one page (256 slots) of the index table
+uint8_t templateBuf[TEMPLATE_SIZE];  // One template for DUMP and LOAD; also holds the index bitmap
+
+// Touch (WAK) output of the sensor module, active low. The FPM10A has none, so the
+// default -1 polls with getImage(); set the pin only if a touch-capable module is wired.
+#define TOUCH_PIN -1
+#define TOUCH_POLL_MS 300  // Without a touch wire (default): how often a sleeping board checks for a finger
+bool sleeping = false;  // Set by SLEEP, cleared by a touch or any command
+
 void setup() {
   Serial.begin(9600);       // Initialize hardware serial at 9600 baud for communication with Raspberry Pi
   finger.begin(57600);      // Initialize fingerprint sensor at 57600 baud
+#if TOUCH_PIN >= 0
+  pinMode(TOUCH_PIN, INPUT_PULLUP);  // Open-collector touch output
+  *digitalPinToPCMSK(TOUCH_PIN) |= bit(digitalPinToPCMSKbit(TOUCH_PIN));  // A touch wakes the CPU at once
+  PCICR |= bit(digitalPinToPCICRbit(TOUCH_PIN));  // SoftwareSerial's PCINT handler runs and ignores it
+#endif
   delay(100);               // Wait 100ms for sensor to initialize
 
   if (finger.verifyPassword()) {  // Check if sensor is responding correctly
+    finger.setPacketSize(FINGERPRINT_PACKET_SIZE_64);  // Template packets must fit Adafruit_Fingerprint_Packet.data
+    finger.getParameters();  // Read library capacity for LIST and INDEX
     Serial.println("FINGERPRINT_READY");  // Send ready signal to Raspberry Pi
   } else {
     Serial.println("FINGERPRINT_ERROR");  // Send error signal if sensor fails
@@ -18,10 +38,22 @@ void setup() {
 }
 
 void loop() {
+  if (sleeping && !Serial.available()) {  // Idle booth: wait for a finger or a command
+    if (fingerTouched()) {
+      sleeping = false;
+      Serial.println("WAKE");  // Pi turns the screen on and sends CHECK
+    } else {
+      set_sleep_mode(SLEEP_MODE_IDLE);  // UART, pin-change and the millis() timer wake the CPU
+      sleep_mode();
+    }
+    return;
+  }
+
   // Wait for commands from Raspberry Pi
   if (Serial.available()) {  // Check if data is available on serial port
     String command = Serial.readStringUntil('\n');  // Read command until newline
     command.trim();  // Remove any whitespace
+    sleeping = false;  // Any command wakes the board
 
     if (command == "CHECK") {  // If command is CHECK (scan fingerprint)
       int result = getFingerprintID();  // Call function to get fingerprint ID
@@ -32,9 +64,64 @@ void loop() {
         Serial.println("NO_MATCH");  // Send no match signal
       }
     }
+    else if (command == "SLEEP") {  // Booth idle: stop scanning until a finger touches the sensor
+      sleeping = true;
+      Serial.println("SLEEPING");
+    }
+    else if (command == "PING") {  // Handshake from a Pi that opened the port without resetting the board
+      Serial.println("FINGERPRINT_READY");  // Sensor was verified in setup()
+    }
+    else if (command == "DELETE_ALL") {  // Wipe all templates (used by finger3.py)
+      if (finger.emptyDatabase() == FINGERPRINT_OK) {  // Clear the sensor library
+        Serial.println("ALL_DELETED");  // Success
+      } else {
+        Serial.println("DELETE_FAILED");  // Sensor refused
+      }
+    }
+    else if (command == "LIST") {  // Occupied template slots, for template_backup.py
+      listTemplates();
+    }
+    else if (command == "INDEX") {  // Occupied-slot bitmap, for slot_allocator.py
+      printIndex();
+    }
+    else if (command.startsWith("DUMP:")) {  // Upload one template to the Pi
+      uint16_t id = command.substring(5).toInt();  // Slot to read
+      if (id > 0 && readTemplate(id)) {
+        Serial.print("TEMPLATE:");  // TEMPLATE:<id>:<crc16>:<hex>
+        Serial.print(id);
+        Serial.print(":");
+        printHex16(crc16(templateBuf, TEMPLATE_SIZE));
+        Serial.print(":");
+        for (uint16_t i = 0; i < TEMPLATE_SIZE; i++) printHex8(templateBuf[i]);
+        Serial.println();
+      } else {
+        Serial.print("DUMP_FAILED:");
+        Serial.println(id);
+      }
+    }
+    else if (command.startsWith("LOAD:")) {  // LOAD:<id>:<crc16>, then one line of hex
+      int sep = command.indexOf(':', 5);  // Between id and checksum
+      uint16_t id = command.substring(5, sep).toInt();
+      uint16_t crc = (uint16_t)strtol(command.substring(sep + 1).c_str(), NULL, 16);
+      if (id == 0 || sep < 0) {
+        Serial.println("LOAD_FAILED:0:bad command");
+        return;
+      }
+      Serial.println("READY_LOAD");  // Pi sends the template now
+      if (!readHexTemplate()) {
+        Serial.print("LOAD_FAILED:"); Serial.print(id); Serial.println(":timeout");
+      } else if (crc16(templateBuf, TEMPLATE_SIZE) != crc) {
+        Serial.print("LOAD_FAILED:"); Serial.print(id); Serial.println(":checksum");
+      } else if (!writeTemplate(id)) {
+        Serial.print("LOAD_FAILED:"); Serial.print(id); Serial.println(":sensor");
+      } else {
+        Serial.print("LOADED:");
+        Serial.println(id);
+      }
+    }
     else if (command.startsWith("ENROLL:")) {  // If command starts with ENROLL:
       int id = command.substring(7).toInt();  // Extract ID from command (after "ENROLL:")
-      if (id <= 0) {  // Validate ID
+      if (id <= 0 || id >= finger.capacity) {  // Validate ID
         Serial.println("ERROR: Invalid ID");  // Send error if invalid
       } else {
         enrollFingerprint(id);  // Call enrollment function
@@ -43,6 +130,18 @@ void loop() {
   }
 }
 
+// Finger on the sensor while sleeping
+bool fingerTouched() {
+#if TOUCH_PIN >= 0
+  return digitalRead(TOUCH_PIN) == LOW;  // Touch output needs no sensor command
+#else
+  static unsigned long lastPoll = 0;
+  if (millis() - lastPoll < TOUCH_POLL_MS) return false;
+  lastPoll = millis();
+  return finger.getImage() != FINGERPRINT_NOFINGER;  // No touch wire: one capture every TOUCH_POLL_MS
+#endif
+}
+
 // Function to get fingerprint ID
 int getFingerprintID() {
   uint8_t p = finger.getImage();  // Capture fingerprint image
@@ -139,4 +238,125 @@ void enrollFingerprint(int id) {
   } else {
     Serial.println("Failed to store fingerprint model");  // Error
   }
-}
\ No newline at end of file
+}
+
+// -----------------------------
+// Template backup and restore
+// -----------------------------
+uint16_t crc16(const uint8_t *data, uint16_t len) {  // CRC-16/CCITT-FALSE, same as Python binascii.crc_hqx(data, 0xFFFF)
+  uint16_t crc = 0xFFFF;
+  for (uint16_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t b = 0; b < 8; b++) crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+  }
+  return crc;
+}
+
+void printHex8(uint8_t v) {  // Two hex digits
+  const char digits[] = "0123456789ABCDEF";
+  Serial.write(digits[v >> 4]);
+  Serial.write(digits[v & 0x0F]);
+}
+
+void printHex16(uint16_t v) {  // Four hex digits
+  printHex8(v >> 8);
+  printHex8(v & 0xFF);
+}
+
+int hexValue(int c) {  // Hex digit to 0-15, or -1
+  if (c >= '0' && c <= '9') return c - '0';
+  if (c >= 'A' && c <= 'F') return c - 'A' + 10;
+  if (c >= 'a' && c <= 'f') return c - 'a' + 10;
+  return -1;
+}
+
+bool readIndex() {  // Sensor index table -> templateBuf, bit n % 8 of byte n / 8 = slot n
+  for (uint8_t page = 0; page * 256 < finger.capacity; page++) {  // 32 bytes per page
+    uint8_t cmd[] = {FINGERPRINT_READINDEX, page};
+    Adafruit_Fingerprint_Packet request(FINGERPRINT_COMMANDPACKET, sizeof(cmd), cmd);
+    finger.writeStructuredPacket(request);
+    Adafruit_Fingerprint_Packet ack;
+    if (finger.getStructuredPacket(&ack) != FINGERPRINT_OK) return false;
+    if (ack.type != FINGERPRINT_ACKPACKET || ack.data[0] != FINGERPRINT_OK) return false;
+    memcpy(templateBuf + page * 32, ack.data + 1, 32);
+  }
+  return true;
+}
+
+bool slotUsed(uint16_t id) {  // After readIndex()
+  return templateBuf[id / 8] & (1 << (id % 8));
+}
+
+void printIndex() {  // INDEX:<capacity>:<hex bitmap>, or INDEX_FAILED
+  if (!readIndex()) {
+    Serial.println("INDEX_FAILED");
+    return;
+  }
+  Serial.print("INDEX:");
+  Serial.print(finger.capacity);
+  Serial.print(":");
+  for (uint16_t i = 0; i < (finger.capacity + 7) / 8; i++) printHex8(templateBuf[i]);
+  Serial.println();
+}
+
+void listTemplates() {  // SLOTS:<id>,<id>,... from the index table, no per-slot probing
+  Serial.print("SLOTS:");
+  if (readIndex()) {
+    bool first = true;
+    for (uint16_t id = 1; id < finger.capacity; id++) {
+      if (slotUsed(id)) {
+        if (!first) Serial.print(",");
+        Serial.print(id);
+        first = false;
+      }
+    }
+  }
+  Serial.println();
+}
+
+bool readTemplate(uint16_t id) {  // Sensor flash -> char buffer 1 -> templateBuf
+  if (finger.loadModel(id) != FINGERPRINT_OK) return false;  // Slot empty or error
+  if (finger.getModel() != FINGERPRINT_OK) return false;  // UpChar: sensor now streams data packets
+  uint16_t n = 0;
+  Adafruit_Fingerprint_Packet packet;
+  while (true) {
+    if (finger.getStructuredPacket(&packet) != FINGERPRINT_OK) return false;
+    uint16_t len = packet.length - 2;  // Length field counts the checksum
+    if (n + len > TEMPLATE_SIZE) return false;
+    memcpy(templateBuf + n, packet.data, len);
+    n += len;
+    if (packet.type == FINGERPRINT_ENDDATAPACKET) break;
+    if (packet.type != FINGERPRINT_DATAPACKET) return false;
+  }
+  return n == TEMPLATE_SIZE;
+}
+
+bool readHexTemplate() {  // Read TEMPLATE_SIZE bytes as hex from the Pi into templateBuf
+  unsigned long deadline = millis() + 5000;  // About 1.1 s at 9600 baud, plus margin
+  uint16_t i = 0;
+  while (i < 2 * TEMPLATE_SIZE) {
+    if (millis() > deadline) return false;
+    if (!Serial.available()) continue;
+    int v = hexValue(Serial.read());
+    if (v < 0) return false;
+    if (i % 2 == 0) templateBuf[i / 2] = v << 4;
+    else templateBuf[i / 2] |= v;
+    i++;
+  }
+  return true;
+}
+
+bool writeTemplate(uint16_t id) {  // templateBuf -> char buffer 1 -> sensor flash
+  uint8_t cmd[] = {FINGERPRINT_DOWNCHAR, 0x01};  // Download into char buffer 1
+  Adafruit_Fingerprint_Packet request(FINGERPRINT_COMMANDPACKET, sizeof(cmd), cmd);
+  finger.writeStructuredPacket(request);
+  Adafruit_Fingerprint_Packet ack;
+  if (finger.getStructuredPacket(&ack) != FINGERPRINT_OK) return false;
+  if (ack.type != FINGERPRINT_ACKPACKET || ack.data[0] != FINGERPRINT_OK) return false;
+  for (uint16_t off = 0; off < TEMPLATE_SIZE; off += TEMPLATE_CHUNK) {
+    uint8_t type = off + TEMPLATE_CHUNK >= TEMPLATE_SIZE ? FINGERPRINT_ENDDATAPACKET : FINGERPRINT_DATAPACKET;
+    Adafruit_Fingerprint_Packet data(type, TEMPLATE_CHUNK, templateBuf + off);
+    finger.writeStructuredPacket(data);
+  }
+  return finger.storeModel(id) == FINGERPRINT_OK;  // Store char buffer 1 at the slot
+}
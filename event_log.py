@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Structured Event Log for EVM
+Booth events (sensor matches, lookups, votes, uploads, errors) as records
+instead of console prints. log() only appends a tuple to an in-memory ring
+buffer, which costs about a microsecond; a background thread turns new records
+into compact JSON lines every half second, fsyncs them and rotates the file by
+size, so events survive a reboot and logging never delays a voter.
+
+    events = EventLog("booth_events.jsonl")
+    events.log("vote_pushed", voter_id="5", ok=True)
+    events.close()
+
+Run with:
+    python3 event_log.py query [--event 'vote_*'] [--since 2026-10-19T08:00] [--where voter_id=5] [--count]
+    python3 event_log.py bench [--events 200000]
+"""
+
+import argparse  # Import argparse for the command line
+import fnmatch  # Import fnmatch for event name patterns
+import itertools  # Import itertools for the sequence counter
+import json  # Import json for the line format
+import os  # Import os for rotation and fsync
+import threading  # Import threading for the writer thread
+import time  # Import time for timestamps
+from collections import deque  # Import deque for the ring buffer
+from datetime import datetime  # Import datetime for query times
+
+EVENT_FILE = "booth_events.jsonl"  # Default log file
+
+class EventLog:
+    """Ring buffer of events with a batching, rotating background writer."""
+
+    def __init__(self, path=EVENT_FILE, capacity=8192, max_bytes=5_000_000, backups=5, flush_interval=0.5):
+        self.path = path
+        self.max_bytes = max_bytes  # Rotate when the file grows past this
+        self.backups = backups  # booth_events.jsonl.1 ... .N
+        self.flush_interval = flush_interval
+        self.ring = deque(maxlen=capacity)  # Newest events, in sequence order
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()  # Numbering and appending are one step, so the ring never goes out of order
+        self.written = 0  # Highest sequence number on disk
+        self.dropped = 0  # Events overwritten before the writer reached them
+        self._file = open(path, "a")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def log(self, event, **fields):  # Hot path: one tuple into the ring
+        with self._lock:
+            self.ring.append((next(self._seq), time.time(), event, fields))
+
+    def recent(self, n=50):  # Last events still in memory (e.g. for a crash report)
+        with self._lock:
+            return list(self.ring)[-n:]
+
+    # -----------------------------
+    # Writer thread
+    # -----------------------------
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):  # Write every record newer than the last flush
+        with self._lock:  # Snapshot while no thread is between numbering and appending
+            batch = [r for r in self.ring if r[0] > self.written]
+        if not batch:
+            return
+        if batch[0][0] > self.written + 1:  # Writer fell a whole ring behind
+            self.dropped += batch[0][0] - self.written - 1
+        lines = []
+        for seq, t, event, fields in batch:
+            record = {"t": round(t, 6), "seq": seq, "ev": event}
+            record.update(fields)
+            lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())  # Survives a power cut after at most one interval
+        self.written = batch[-1][0]
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):  # booth_events.jsonl -> .1 -> .2 ... (oldest dropped)
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "a")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+
+# -----------------------------
+# Query tool
+# -----------------------------
+def log_files(path):  # Oldest rotated file first
+    rotated = sorted((p for p in os.listdir(os.path.dirname(path) or ".")
+                      if p.startswith(os.path.basename(path) + ".") and p.rsplit(".", 1)[1].isdigit()),
+                     key=lambda p: -int(p.rsplit(".", 1)[1]))
+    files = [os.path.join(os.path.dirname(path), p) for p in rotated]
+    return files + ([path] if os.path.exists(path) else [])
+
+def read_events(path):  # All records across rotations, skipping a torn last line
+    for name in log_files(path):
+        with open(name) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+def parse_time(text):  # ISO time (local) -> epoch seconds
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+def query(path, event="*", since=None, until=None, where=()):
+    conditions = [w.split("=", 1) for w in where]
+    for record in read_events(path):
+        if not fnmatch.fnmatch(record.get("ev", ""), event):
+            continue
+        if since and record["t"] < since or until and record["t"] > until:
+            continue
+        if all(str(record.get(k)) == v for k, v in conditions):
+            yield record
+
+def format_record(record):  # One readable line
+    stamp = datetime.fromtimestamp(record["t"]).isoformat(sep=" ", timespec="milliseconds")
+    fields = " ".join(f"{k}={v}" for k, v in record.items() if k not in ("t", "seq", "ev"))
+    return f"{stamp} {record['ev']:<18} {fields}"
+
+def bench(events):  # Per-event cost on the hot path
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "bench.jsonl")
+    log = EventLog(path, capacity=max(8192, events))
+    start = time.perf_counter()
+    for i in range(events):
+        log.log("finger_matched", voter_id=str(i % 500), port="/dev/ttyACM0")
+    elapsed = time.perf_counter() - start
+    flush_start = time.perf_counter()
+    log.close()
+    flushed = time.perf_counter() - flush_start
+    print(f"log(): {elapsed / events * 1e6:.2f} µs per event ({events} events)")
+    size = sum(os.path.getsize(name) for name in log_files(path))
+    kept = sum(1 for _ in read_events(path))  # Older files beyond the backups were rotated away
+    print(f"writer: {events / flushed:,.0f} events/s to disk, {size / kept:.0f} bytes per event")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or benchmark the booth event log.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_query = sub.add_parser("query", help="filter events across rotated files")
+    p_query.add_argument("--file", default=EVENT_FILE)
+    p_query.add_argument("--event", default="*", help="event name pattern, e.g. 'vote_*'")
+    p_query.add_argument("--since", help="ISO time, e.g. 2026-10-19T08:00")
+    p_query.add_argument("--until", help="ISO time")
+    p_query.add_argument("--where", action="append", default=[], help="field=value (repeatable)")
+    p_query.add_argument("--count", action="store_true", help="print counts per event instead")
+    p_query.add_argument("--json", action="store_true", help="print raw JSON lines")
+    p_bench = sub.add_parser("bench", help="measure per-event cost")
+    p_bench.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.events)
+        return
+    records = query(args.file, args.event, parse_time(args.since), parse_time(args.until), args.where)
+    if args.count:
+        counts = {}
+        for record in records:
+            counts[record["ev"]] = counts.get(record["ev"], 0) + 1
+        for event, n in sorted(counts.items()):
+            print(f"{n:8d}  {event}")
+        return
+    for record in records:
+        print(json.dumps(record) if args.json else format_record(record))
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,20 @@
-import serial  # Import serial library for communication with Arduino
-import time  # Import time for delays and timeouts
 import requests  # Import requests for HTTP calls to Firebase
+from serial_session import SerialSession, SensorError  # Import blocking serial session for Arduino
+from slot_allocator import SlotAllocator, print_report  # Import free-slot allocator (sensor index table + Firebase)
 
 # -----------------------------
 # Firebase REST setup
 # -----------------------------
 FIREBASE_URL = "https://e-vm-f7bdf-default-rtdb.firebaseio.com"  # Base URL for Firebase Realtime Database
 VOTERS_NODE = "voters"  # Node for storing voter information
-VOTES_NODE = "votes"  # Node for storing vote records
-
-def save_voter(fid, name):  # Function to save a voter's fingerprint ID and name to Firebase
-    """Save voter info to Firebase using REST API"""
-    data = {"name": name}  # Prepare data as JSON object
-    url = f"{FIREBASE_URL}/{VOTERS_NODE}/{fid}.json"  # Construct URL for specific voter ID
-    try:
-        response = requests.put(url, json=data)  # Send PUT request to Firebase
-        if response.status_code == 200:  # Check if request was successful
-            print(f"✅ Voter saved to Firebase: ID={fid}, Name={name}")  # Success message
-        else:
-            print(f"❌ Firebase error: {response.text}")  # Error message with response
-    except Exception as e:  # Handle exceptions like network errors
-        print(f"❌ Exception saving to Firebase: {e}")  # Exception message
+VOTES_NODES = ["votes", "vote_shards", "vote_index", "voted"]  # Vote records, flat and sharded (vote_store.py)
+http = requests.Session()  # Keep-alive session for Firebase
 
 def delete_all_data():  # Function to delete all voters and votes from Firebase
     """Delete all voters and votes from Firebase"""
     try:
-        res_voters = requests.delete(f"{FIREBASE_URL}/{VOTERS_NODE}.json")  # Delete voters node
-        res_votes = requests.delete(f"{FIREBASE_URL}/{VOTES_NODE}.json")  # Delete votes node
+        res_voters = http.delete(f"{FIREBASE_URL}/{VOTERS_NODE}.json")  # Delete voters node
+        res_votes = http.patch(f"{FIREBASE_URL}/.json", json={node: None for node in VOTES_NODES})  # Delete vote nodes
 
         if res_voters.status_code == 200:  # Check voters deletion success
             print("🗑️  All voters deleted from Firebase.")  # Success message
@@ -44,27 +32,72 @@ def delete_all_data():  # Function to delete all voters and votes from Firebase
 # -----------------------------
 # Serial setup (Arduino + fingerprint)
 # -----------------------------
-ser = serial.Serial('/dev/ttyACM0', 9600, timeout=2)  # Open serial connection to Arduino at 9600 baud
-time.sleep(2)  # Wait 2 seconds for connection to stabilize
+sensor = SerialSession('/dev/ttyACM0').open()  # Open serial connection to Arduino at 9600 baud
 
 # Wait for sensor ready
-while True:  # Loop until sensor is ready
-    if ser.in_waiting > 0:  # Check if data is available from Arduino
-        msg = ser.readline().decode().strip()  # Read and decode message
-        print(msg)  # Print the message
-        if "FINGERPRINT_READY" in msg:  # If sensor is ready
-            print("✅ Sensor ready!")  # Confirmation message
-            break  # Exit loop
-        elif "FINGERPRINT_ERROR" in msg:  # If sensor error
-            print("❌ Sensor error")  # Error message
-            exit()  # Exit program
+try:
+    sensor.wait_ready()  # Blocks (no CPU) until FINGERPRINT_READY
+    print("✅ Sensor ready!")  # Confirmation message
+except SensorError as e:  # Sensor error or no answer
+    print(f"❌ {e}")  # Error message
+    exit()  # Exit program
+
+def print_arduino(line):  # Show progress lines from the Arduino
+    print(f"Arduino → {line}")
+
+allocator = SlotAllocator(sensor, http, FIREBASE_URL)  # Free IDs, cached from one INDEX read
+try:
+    allocator.refresh()  # Sensor index table + voter IDs in Firebase
+    print_report(allocator)
+except Exception as e:  # Old firmware without INDEX, or Firebase unreachable
+    print(f"❌ Slot table unavailable: {e}")  # Error message
+    exit()  # Exit program
+
+def enroll(name, fid=None):  # Claim a slot for the voter, then store the finger there
+    """Enroll one voter; fid=None takes the lowest free slot. Returns the slot or None."""
+    if fid is None:
+        fid = allocator.claim_next(name)  # Free on the sensor and in Firebase
+        if fid is None:
+            print("❌ No free slot left on the sensor")  # Error message
+            return None
+    else:
+        problem = allocator.reserve(fid)  # Never overwrite a template or a voter
+        if problem:
+            print(f"❌ ID {fid} {problem}")  # Error message
+            return None
+        if not allocator.claim(fid, name):
+            print(f"❌ ID {fid} was just taken by another station")  # Error message
+            return None
+
+    response = sensor.request(f'ENROLL:{fid}', on_line=print_arduino)  # Wait up to 30s for the result
+    if response is not None and "Enrollment successful" in response:  # If success
+        print_arduino(response)  # Print response
+        allocator.confirm(fid)
+        print(f"✅ Voter saved: ID={fid}, Name={name}")  # Success message
+        return fid
+    if response is None:  # Timeout: the Arduino may still finish the enrollment
+        print("❌ Enrollment timed out, reading the sensor's index table")  # Error message
+        try:
+            stored = allocator.settle(fid)  # Frees the slot only if no template arrived
+        except Exception as e:  # Sensor still busy or Firebase unreachable
+            print(f"⚠️ ID {fid} stays reserved until the next SLOTS ({e})")  # Warning
+            return None
+        if stored:
+            print(f"✅ Voter saved: ID={fid}, Name={name} (finished after the timeout)")  # Success message
+            return fid
+        print("❌ Enrollment failed")  # Error message
+        return None
+    print_arduino(response)  # Print response
+    allocator.release(fid)  # Slot and voter record are free again
+    print("❌ Enrollment failed")  # Error message
+    return None
 
 # -----------------------------
 # Main loop
 # -----------------------------
 while True:  # Infinite loop for user input
     user_input = input(  # Prompt user for input
-        "\nPress Enter to scan fingerprint, type ENROLL:<ID>, DELETE_ALL, or 'exit': "
+        "\nPress Enter to scan fingerprint, type ENROLL, ENROLL:<ID>, BULK, SLOTS, DELETE_ALL, or 'exit': "
     ).strip()  # Read and strip input
 
     if user_input.lower() == 'exit':  # If user wants to exit
@@ -72,60 +105,70 @@ while True:  # Infinite loop for user input
         break  # Break loop
 
     if user_input == "":  # If Enter pressed (scan fingerprint)
-        ser.write(b'CHECK\n')  # Send CHECK command to Arduino
+        response = sensor.request("CHECK", on_line=print_arduino)  # Wait up to 10s for the scan result
+        if response:  # MATCH:<id> or NO_MATCH
+            print_arduino(response)
+        else:
+            print("❌ No response from sensor")  # Timeout
+
+    elif user_input == "ENROLL":  # Next free ID
+        name = input("Enter voter name: ").strip()  # Prompt for name
+        if not name:  # If name is empty
+            print("❌ Name cannot be empty")  # Error message
+            continue  # Skip
+        enroll(name)
 
-    elif user_input.startswith("ENROLL:"):  # If ENROLL command
+    elif user_input.startswith("ENROLL:"):  # If ENROLL command with a chosen ID
         id_str = user_input.split(":")[1].strip()  # Extract ID from input
         if not id_str.isdigit():  # Validate ID is digit
             print("❌ Invalid ID")  # Error message
             continue  # Skip to next iteration
         fid = int(id_str)  # Convert to integer
+        problem = allocator.problem(fid)  # Checked before asking for a name
+        if problem:
+            print(f"❌ ID {fid} {problem}")  # Error message
+            continue  # Skip
 
         name = input("Enter voter name for this ID: ").strip()  # Prompt for name
         if not name:  # If name is empty
             print("❌ Name cannot be empty")  # Error message
             continue  # Skip
-
-        ser.write(f'ENROLL:{fid}\n'.encode())  # Send ENROLL command to Arduino
-
-        start_time = time.time()  # Start timeout timer
-        while time.time() - start_time < 30:  # Wait up to 30 seconds
-            if ser.in_waiting > 0:  # If data from Arduino
-                response = ser.readline().decode().strip()  # Read response
-                if response:  # If response not empty
-                    print(f"Arduino → {response}")  # Print response
-                    if "Enrollment successful" in response:  # If success
-                        save_voter(fid, name)  # Save to Firebase
-                        break  # Exit wait loop
-                    elif "Failed" in response:  # If failed
-                        print("❌ Enrollment failed")  # Error message
-                        break  # Exit wait loop
+        enroll(name, fid)
+
+    elif user_input == "BULK":  # Enroll voters one after another, IDs assigned automatically
+        enrolled = []
+        while True:
+            name = input(f"Voter name ({len(enrolled)} enrolled, empty to stop): ").strip()  # Prompt for name
+            if not name:
+                break
+            fid = enroll(name)
+            if fid is not None:
+                enrolled.append(fid)
+            elif not allocator.free:
+                break  # Sensor full
+        print(f"✅ Bulk enrollment done: {len(enrolled)} voters" + (f", IDs {enrolled[0]}-{enrolled[-1]}" if enrolled else ""))
+
+    elif user_input == "SLOTS":  # Re-read the sensor and Firebase
+        try:
+            allocator.refresh()
+            print_report(allocator)
+        except Exception as e:
+            print(f"❌ Slot table unavailable: {e}")  # Error message
 
     elif user_input == "DELETE_ALL":  # If DELETE_ALL command
-        ser.write(b'DELETE_ALL\n')  # Send DELETE_ALL to Arduino
-        start_time = time.time()  # Start timeout
-        while time.time() - start_time < 10:  # Wait up to 10 seconds
-            if ser.in_waiting > 0:  # If data from Arduino
-                response = ser.readline().decode().strip()  # Read response
-                if response:  # If response not empty
-                    print(f"Arduino → {response}")  # Print response
-                    if response == "ALL_DELETED":  # If success
-                        print("✅ Fingerprint templates deleted from sensor.")  # Success message
-                        delete_all_data()  # Delete from Firebase
-                        break  # Exit wait loop
-                    elif response == "DELETE_FAILED":  # If failed
-                        print("❌ Delete failed on Arduino.")  # Error message
-                        break  # Exit wait loop
+        response = sensor.request('DELETE_ALL', on_line=print_arduino)  # Wait up to 10s for the result
+        if response == "ALL_DELETED":  # If success
+            print_arduino(response)  # Print response
+            print("✅ Fingerprint templates deleted from sensor.")  # Success message
+            delete_all_data()  # Delete from Firebase
+            allocator.reset()  # Every slot is free again
+        elif response == "DELETE_FAILED":  # If failed
+            print_arduino(response)  # Print response
+            print("❌ Delete failed on Arduino.")  # Error message
+        else:  # Timeout
+            print("❌ No response to DELETE_ALL")  # Error message
 
     else:  # Unknown command
         print("❌ Unknown command")  # Error message
 
-    # Wait for scan responses
-    start_time = time.time()  # Start timeout for scan responses
-    while time.time() - start_time < 10:  # Wait up to 10 seconds
-        if ser.in_waiting > 0:  # If data from Arduino
-            response = ser.readline().decode().strip()  # Read response
-            if response:  # If response not empty
-                print(f"Arduino → {response}")  # Print response
-                if response.startswith("MATCH") or response == "NO_MATCH":  # If scan result
-                    break  # Exit wait loop
+sensor.close()  # Release the serial port
@@ -1,21 +1,14 @@
-import serial
-import time
+from serial_session import SerialSession, SensorError
 
 # Connect to Arduino serial
-ser = serial.Serial('/dev/ttyACM0', 9600, timeout=2)
-time.sleep(2)
+sensor = SerialSession('/dev/ttyACM0').open()
 
 # Wait for Arduino startup message
-while True:
-    if ser.in_waiting > 0:
-        msg = ser.readline().decode().strip()
-        print(msg)
-        if "FINGERPRINT_READY" in msg:
-            print("✅ Sensor ready!")
-            break
-        elif "FINGERPRINT_ERROR" in msg:
-            print("❌ Sensor error")
-            break
+try:
+    sensor.wait_ready()
+    print("✅ Sensor ready!")
+except SensorError as e:
+    print(f"❌ {e}")
 
 # Main loop
 while True:
@@ -24,19 +17,14 @@ while True:
     if user_input.lower() == 'exit':
         break
 
-    if user_input == "":
-        # If Enter is pressed with no input, send CHECK
-        ser.write(b'CHECK\n')
+    # Enter alone sends CHECK, anything else (ENROLL:<ID>) is sent as typed
+    command = user_input or "CHECK"
+
+    # Wait for Arduino response (blocking reads, per-command timeout)
+    response = sensor.request(command, on_line=lambda line: print(f"Arduino → {line}"))
+    if response:
+        print(f"Arduino → {response}")
     else:
-        # Send whatever command user typed (ENROLL:<ID>)
-        ser.write((user_input + '\n').encode())
+        print("❌ No response from Arduino")
 
-    # Wait for Arduino response
-    start_time = time.time()
-    while time.time() - start_time < 10:
-        if ser.in_waiting > 0:
-            response = ser.readline().decode().strip()
-            if response:
-                print(f"Arduino → {response}")
-                if response.startswith("MATCH") or response == "NO_MATCH" or "Enrollment successful" in response:
-                    break
+sensor.close()
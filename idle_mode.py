@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Idle Mode for EVM
+Between voters the booth does not need to scan, poll or light the screen.
+voting6.py goes idle after EVM_IDLE_AFTER_S seconds on the fingerprint screen:
+the backlight is switched off, the Arduino gets SLEEP and every root.after loop
+stops. Wake sources write to a pipe that Tk watches as a file handler, so the
+idle booth runs no timers of its own:
+
+    WAKE from the Arduino (finger found by polling the sensor, or on its
+         touch output where a module has one and TOUCH_PIN is set)
+    a GPIO edge from a candidate button or a touch wire on EVM_TOUCH_GPIO
+    a tap on the blank screen
+
+    waker = Waker()
+    waker.attach(root, wake_up)            # wake_up(reason, since) runs in the Tk thread
+    sensor.on_queued = lambda line: waker.set("sensor")
+
+Run with: python3 idle_mode.py bench [--seconds 5]
+to compare CPU (and power, where the board reports it) idle and active, and to
+measure wake-to-ready latency with the simulated Arduino.
+"""
+
+import argparse  # Import argparse for the command line
+import glob  # Import glob to find backlight and power files
+import os  # Import os for the wake pipe
+import select  # Import select to wait on the wake pipe outside Tk
+import shutil  # Import shutil to find xset
+import subprocess  # Import subprocess for xset
+import threading  # Import threading for the simulated touch
+import time  # Import time for latency and CPU
+
+WAKE_BUDGET = 0.2  # Seconds from a wake event to a ready booth
+
+class Backlight:
+    """Display power: sysfs backlight (official touchscreen) or X DPMS."""
+
+    def __init__(self):
+        paths = glob.glob("/sys/class/backlight/*/bl_power")
+        self.path = paths[0] if paths else None
+
+    def off(self):
+        self._set("1", "off")
+
+    def on(self):
+        self._set("0", "on")
+
+    def _set(self, power, dpms):
+        if self.path:
+            try:
+                with open(self.path, "w") as f:  # Needs root or a udev rule
+                    f.write(power)
+                return
+            except OSError:
+                pass
+        if shutil.which("xset"):  # HDMI screens: DPMS through X, without waiting for it
+            subprocess.Popen(["xset", "dpms", "force", dpms], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+class Waker:
+    """Wakes the Tk thread from any thread through a pipe, without polling."""
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+        os.set_blocking(self._w, False)
+        self.reason = None  # First wake source since the last callback
+        self.at = None  # time.monotonic() of that wake
+
+    def set(self, reason):  # Safe from GPIO callbacks and the serial reader thread
+        if self.at is None:
+            self.reason, self.at = reason, time.monotonic()
+        try:
+            os.write(self._w, b"x")
+        except BlockingIOError:  # Pipe already full of wake-ups
+            pass
+
+    def take(self):  # (reason, since) and reset, or (None, None)
+        try:
+            while os.read(self._r, 64):
+                pass
+        except BlockingIOError:
+            pass
+        reason, at = self.reason, self.at
+        self.reason = self.at = None
+        return reason, at
+
+    def attach(self, root, callback):  # callback(reason, since) in the Tk thread
+        import tkinter  # Import tkinter for file handlers
+
+        def readable(fd, mask):
+            reason, at = self.take()
+            if at is not None:
+                callback(reason, at)
+        root.tk.createfilehandler(self._r, tkinter.READABLE, readable)
+
+    def wait(self, timeout=None):  # Outside Tk: block until set()
+        select.select([self._r], [], [], timeout)
+        return self.take()
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def power_watts():  # Board power if the kernel reports it, else None
+    for path in glob.glob("/sys/class/power_supply/*/power_now") + glob.glob("/sys/class/hwmon/hwmon*/power1_input"):
+        try:
+            with open(path) as f:
+                return int(f.read()) / 1e6  # Both are in microwatts
+        except (OSError, ValueError):
+            continue
+    return None
+
+def measure(seconds, run):  # CPU share and mean power while run(deadline) works
+    watts = []
+    stop = threading.Event()
+
+    def sample_power():
+        while not stop.wait(0.5):
+            w = power_watts()
+            if w is not None:
+                watts.append(w)
+    threading.Thread(target=sample_power, daemon=True).start()
+    start_cpu, start = time.process_time(), time.monotonic()
+    run(start + seconds)
+    cpu = (time.process_time() - start_cpu) / (time.monotonic() - start) * 100
+    stop.set()
+    return cpu, (sum(watts) / len(watts) if watts else None)
+
+def bench(seconds, wakes):
+    from arduino_sim import SimulatedArduino
+    from serial_session import SerialSession
+    sim = SimulatedArduino(enrolled=range(1, 10), scan_time=0.05)
+    sensor = SerialSession(ser=sim).start_reader()
+    sensor.wait_ready(on_line=None)
+
+    def active(deadline):  # voting6 on the fingerprint screen: CHECK again after every NO_MATCH, 100 ms polls
+        sensor.send("CHECK")
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            while (line := sensor.poll()) is not None:
+                if line == "NO_MATCH":
+                    sensor.send("CHECK")
+
+    waker = Waker()
+    sensor.on_queued = lambda line: line == "WAKE" and waker.set("sensor")
+
+    def idle(deadline):  # Display off, board asleep, nothing scheduled
+        sensor.request("SLEEP", done=lambda line: line == "SLEEPING")
+        waker.wait(deadline - time.monotonic())
+
+    results = {"active": measure(seconds, active), "idle": measure(seconds, idle)}
+    for name, (cpu, watts) in results.items():
+        power = f", {watts:.2f} W" if watts is not None else ""
+        print(f"{name:>6}: {cpu:5.1f}% CPU{power}")
+    if all(watts is None for _, watts in results.values()):
+        print("        (no power sensor on this board; use a USB power meter for watts)")
+
+    latencies = []
+    for i in range(wakes):  # Finger touches the sleeping sensor; ready once CHECK is sent
+        sensor.request("SLEEP", done=lambda line: line == "SLEEPING")
+        threading.Timer(0.05, sim.place_finger, args=(1 + i % 9,)).start()
+        reason, since = waker.wait(5)
+        sensor.send("CHECK")  # What voting6 does once the screen is back
+        latencies.append(time.monotonic() - since)
+        sensor.request("PING")  # Let the match arrive before the next round
+    sensor.close()
+    latencies.sort()
+    print(f"  wake: median {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms "
+          f"to a sent CHECK (budget {WAKE_BUDGET * 1000:.0f} ms, screen redraw not included)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the booth idle mode.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_bench = sub.add_parser("bench", help="CPU and power idle vs active, and wake latency")
+    p_bench.add_argument("--seconds", type=float, default=5)
+    p_bench.add_argument("--wakes", type=int, default=20)
+    args = parser.parse_args()
+    bench(args.seconds, args.wakes)
+
+if __name__ == "__main__":
+    main()
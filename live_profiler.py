@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Live Profiler for EVM
+Profiling controls that stay installed in the running booth. Nothing runs until
+a signal arrives, so there is no cost while voting:
+
+    kill -USR1 <pid>   start / stop the stack sampler (all threads, every 5 ms)
+    kill -USR2 <pid>   start / stop cProfile (the UI/event-loop thread)
+
+When a profile stops, files are written to profiles/ (<run> is the stop time
+with milliseconds and a per-process counter, so no run overwrites another):
+    <name>-<pid>-<run>-stacks.folded     folded stacks for flamegraph.pl or speedscope
+    <name>-<pid>-<run>-stacks.txt        per-function summary of the samples
+    <name>-<pid>-<run>-cprofile.prof     cProfile data for pstats / snakeviz
+    <name>-<pid>-<run>-cprofile.txt      pstats summary
+
+In the booth:  live_profiler.install("voting7")
+From a shell:  python3 live_profiler.py toggle <pid> [--cprofile]
+               python3 live_profiler.py summary profiles/voting7-1234-...-stacks.folded
+"""
+
+import argparse  # Import argparse for the command line
+import itertools  # Import itertools for the run counter
+import os  # Import os for pids and paths
+import signal  # Import signal for the controls
+import sys  # Import sys for thread frames
+import threading  # Import threading for the sampler thread
+import time  # Import time for file names and overhead
+from collections import Counter  # Import Counter for stack counts
+
+PROFILE_DIR = "profiles"  # Output directory
+
+def frame_label(code):  # "record_vote (voting7.py:312)"
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# -----------------------------
+# Sampling profiler
+# -----------------------------
+class StackSampler:
+    """Samples the stacks of every thread from a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()  # "thread;outer;...;inner" -> samples
+        self.samples = 0
+        self.cpu = 0.0  # CPU seconds used by the sampler itself
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        cpu_start = time.thread_time()
+        names, names_at = {}, 0.0
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            if now - names_at > 1.0:  # Thread names change rarely
+                names, names_at = {t.ident: t.name for t in threading.enumerate()}, now
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.cpu = time.thread_time() - cpu_start
+
+    def write(self, base):  # .folded and .txt
+        with open(base + ".folded", "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        elapsed = time.monotonic() - self.started
+        header = (f"Stack samples: {self.samples} in {elapsed:.1f} s every {self.interval * 1000:.0f} ms, "
+                  f"sampler CPU {self.cpu / elapsed * 100:.1f}%")
+        with open(base + ".txt", "w") as f:
+            f.write(summarize(self.counts, header))
+        return base + ".folded"
+
+def summarize(counts, header="", top=25):  # Per-function self and total samples
+    self_counts, total_counts = Counter(), Counter()
+    total = sum(counts.values())
+    for stack, count in counts.items():
+        frames = stack.split(";")[1:]  # Drop the thread name
+        if not frames:
+            continue
+        self_counts[frames[-1]] += count
+        for label in set(frames):  # Recursion counted once
+            total_counts[label] += count
+    lines = [header, ""] if header else []
+    lines.append(f"{'self %':>7} {'total %':>8}  function")
+    for label, count in self_counts.most_common(top):
+        lines.append(f"{count / total * 100:7.1f} {total_counts[label] / total * 100:8.1f}  {label}")
+    lines += ["", "By total:"]
+    for label, count in total_counts.most_common(top):
+        lines.append(f"{self_counts[label] / total * 100:7.1f} {count / total * 100:8.1f}  {label}")
+    return "\n".join(lines) + "\n"
+
+def read_folded(path):
+    counts = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            counts[stack] += int(count)
+    return counts
+
+# -----------------------------
+# Signal controls
+# -----------------------------
+class LiveProfiler:
+    """SIGUSR1 toggles the stack sampler, SIGUSR2 toggles cProfile."""
+
+    def __init__(self, name, out_dir=PROFILE_DIR, interval=0.005):
+        self.name = name
+        self.out_dir = out_dir
+        self.interval = interval
+        self.sampler = None
+        self.cprofile = None
+        self._runs = itertools.count(1)  # Tells apart runs stopped within the same millisecond
+
+    def _base(self, kind):  # profiles/<name>-<pid>-<YYYYmmdd-HHMMSS>-<ms>-<n>-<kind>
+        os.makedirs(self.out_dir, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now % 1 * 1000):03d}-{next(self._runs)}"
+        return os.path.join(self.out_dir, f"{self.name}-{os.getpid()}-{stamp}-{kind}")
+
+    def toggle_sampler(self, *_):
+        if self.sampler is None:
+            self.sampler = StackSampler(self.interval)
+            self.sampler.start()
+            print(f"🔬 Stack sampler started (kill -USR1 {os.getpid()} to stop)")
+            return
+        sampler, self.sampler = self.sampler, None
+        threading.Thread(target=self._finish_sampler, args=(sampler,), daemon=True).start()  # Keep the handler short
+
+    def _finish_sampler(self, sampler):
+        sampler.stop()
+        print(f"🔬 Stack profile written to {sampler.write(self._base('stacks'))}")
+
+    def toggle_cprofile(self, *_):
+        if self.cprofile is None:
+            import cProfile  # Import cProfile only when asked for
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()  # Profiles the thread that handles signals: the UI / event loop
+            print(f"🔬 cProfile started (kill -USR2 {os.getpid()} to stop)")
+            return
+        profile, self.cprofile = self.cprofile, None
+        profile.disable()
+        threading.Thread(target=self._finish_cprofile, args=(profile,), daemon=True).start()
+
+    def _finish_cprofile(self, profile):
+        import io  # Import io to capture the pstats text
+        import pstats  # Import pstats for the summary
+        base = self._base("cprofile")
+        profile.dump_stats(base + ".prof")
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(30)
+        with open(base + ".txt", "w") as f:
+            f.write(text.getvalue())
+        print(f"🔬 cProfile written to {base}.prof")
+
+def install(name, out_dir=PROFILE_DIR):  # Register the signal handlers (main thread only)
+    profiler = LiveProfiler(name, out_dir)
+    signal.signal(signal.SIGUSR1, profiler.toggle_sampler)
+    signal.signal(signal.SIGUSR2, profiler.toggle_cprofile)
+    return profiler
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Control and read live booth profiles.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_toggle = sub.add_parser("toggle", help="start or stop profiling a running booth")
+    p_toggle.add_argument("pid", type=int)
+    p_toggle.add_argument("--cprofile", action="store_true", help="cProfile instead of the stack sampler")
+    p_summary = sub.add_parser("summary", help="per-function summary of a .folded file")
+    p_summary.add_argument("folded")
+    p_summary.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    if args.cmd == "toggle":
+        os.kill(args.pid, signal.SIGUSR2 if args.cprofile else signal.SIGUSR1)
+    else:
+        print(summarize(read_folded(args.folded), top=args.top), end="")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Multi-Booth Vote Merge for EVM
+Merges the votes.csv files and journals of several booths into one canonical
+vote file and reports voters who voted more than once (in the same or another booth).
+
+The merge is an external sort keyed by (voter_id, timestamp):
+1. every input is cut into byte ranges that are sorted in parallel worker
+   processes and written to temporary run files (bounded memory per worker),
+2. the runs are k-way merged from disk, keeping the earliest vote of each voter.
+Memory use depends on --chunk-mb and --workers, not on the size of the archive.
+
+Run with: python3 merge_votes.py booth1/votes.csv booth2/votes.csv -o merged_votes.csv -c conflicts.csv
+"""
+
+import argparse  # Import argparse for the command line
+import csv  # Import csv for run and report files
+import heapq  # Import heapq for k-way merge
+import multiprocessing  # Import multiprocessing for parallel run sorting
+import os  # Import os for file sizes and paths
+import shutil  # Import shutil for temp directory cleanup
+import tempfile  # Import tempfile for run files
+import time  # Import time for timing the merge
+
+from vote_records import VoteRecord, booth_name, format_csv_line, line_parser
+
+MAX_FAN_IN = 64  # Maximum run files merged at once (open file limit on small systems)
+
+# -----------------------------
+# Phase 1: sort byte ranges into runs
+# -----------------------------
+def split_ranges(path, chunk_bytes):  # Cut a file into byte ranges
+    """Return (start, end) byte ranges of about chunk_bytes covering the file."""
+    size = os.path.getsize(path)
+    return [(start, min(start + chunk_bytes, size)) for start in range(0, size, chunk_bytes)] or [(0, 0)]
+
+def read_range(path, start, end, booth):  # Read the records of one byte range
+    """Yield records whose line starts inside [start, end)."""
+    parse = line_parser(path)
+    with open(path, "rb") as f:
+        if start > 0:  # Align to the next full line; the previous range owns the partial one
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            raw = f.readline()
+            if not raw:  # End of file
+                break
+            record = parse(raw.decode("utf-8", errors="replace"), booth)
+            if record is not None:
+                yield record
+
+def sort_key(record):  # Sort order of runs and merge
+    return (record.voter_id, record.timestamp)
+
+def write_run(records, run_path):  # Write sorted records to a run file
+    with open(run_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(records)
+
+def read_run(run_path):  # Stream records back from a run file
+    with open(run_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            yield VoteRecord(*row)
+
+def sort_range(task):  # Worker: sort one byte range into a run file
+    """Sort the records of one byte range and write them to a run file."""
+    path, start, end, booth, run_path = task
+    records = sorted(read_range(path, start, end, booth), key=sort_key)  # In-memory sort of one chunk
+    write_run(records, run_path)
+    return run_path, len(records)
+
+def merge_runs(task):  # Worker: merge a group of runs into one
+    """Merge several sorted run files into one run file and delete the inputs."""
+    run_paths, out_path = task
+    write_run(heapq.merge(*(read_run(p) for p in run_paths), key=sort_key), out_path)
+    for p in run_paths:
+        os.remove(p)
+    return out_path
+
+# -----------------------------
+# Phase 2: merge and deduplicate
+# -----------------------------
+def dedupe(merged, out, report):  # Keep the first vote per voter
+    """Write the canonical votes to out and repeated votes to report; return counters."""
+    stats = {"voters": 0, "duplicates": 0, "conflicts": 0}
+    kept = None
+    for record in merged:
+        if kept is None or record.voter_id != kept.voter_id:  # First (earliest) vote of a new voter
+            kept = record
+            out.write(format_csv_line(record))
+            stats["voters"] += 1
+        elif (record.candidate, record.timestamp) == (kept.candidate, kept.timestamp):  # Same vote seen twice
+            stats["duplicates"] += 1  # e.g. a booth's CSV and its journal both hold it
+        else:  # A second, different vote from the same voter
+            kind = "cross_booth" if record.booth != kept.booth else "repeat_vote"
+            report.writerow([record.voter_id, kind, kept.booth, kept.candidate, kept.timestamp,
+                             record.booth, record.candidate, record.timestamp])
+            stats["conflicts"] += 1
+    return stats
+
+def merge_files(inputs, output, conflicts, chunk_bytes, workers, tmp_dir=None):  # Whole merge
+    """Merge booth files into output and write the conflict report; return counters."""
+    work_dir = tempfile.mkdtemp(prefix="evm_merge_", dir=tmp_dir)  # Run files live here
+    try:
+        tasks = []
+        for path, booth in inputs:  # Cut every input into sortable ranges
+            for start, end in split_ranges(path, chunk_bytes):
+                tasks.append((path, start, end, booth, os.path.join(work_dir, f"run{len(tasks)}.csv")))
+
+        with multiprocessing.Pool(workers) as pool:
+            runs, total = [], 0
+            for run_path, count in pool.imap_unordered(sort_range, tasks):  # Parallel run generation
+                runs.append(run_path)
+                total += count
+            while len(runs) > MAX_FAN_IN:  # Intermediate passes keep open files bounded
+                groups = [runs[i:i + MAX_FAN_IN] for i in range(0, len(runs), MAX_FAN_IN)]
+                merge_tasks = [(g, os.path.join(work_dir, f"pass{len(runs)}_{i}.csv")) for i, g in enumerate(groups)]
+                runs = pool.map(merge_runs, merge_tasks)
+
+        with open(output, "w", encoding="utf-8") as out, open(conflicts, "w", newline="", encoding="utf-8") as rep:
+            report = csv.writer(rep)
+            report.writerow(["voter_id", "kind", "kept_booth", "kept_candidate", "kept_timestamp",
+                             "booth", "candidate", "timestamp"])
+            stats = dedupe(heapq.merge(*(read_run(p) for p in runs), key=sort_key), out, report)
+        stats["records"] = total
+        return stats
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)  # Always remove run files
+
+# -----------------------------
+# Command line
+# -----------------------------
+def parse_input(arg):  # Accept PATH or BOOTH=PATH
+    if "=" in arg and not os.path.exists(arg):
+        booth, path = arg.split("=", 1)
+        return path, booth
+    return arg, booth_name(arg)
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge booth vote files and report double votes.")
+    parser.add_argument("inputs", nargs="+", help="votes.csv or journal files, optionally as BOOTH=PATH")
+    parser.add_argument("-o", "--output", default="merged_votes.csv", help="canonical votes file")
+    parser.add_argument("-c", "--conflicts", default="conflicts.csv", help="conflict report file")
+    parser.add_argument("--chunk-mb", type=float, default=8, help="bytes sorted per worker task (MB)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="sort processes")
+    parser.add_argument("--tmp-dir", default=None, help="directory for run files (needs free space)")
+    args = parser.parse_args()
+
+    start = time.time()
+    stats = merge_files([parse_input(a) for a in args.inputs], args.output, args.conflicts,
+                        max(1, int(args.chunk_mb * 1024 * 1024)), max(1, args.workers), args.tmp_dir)
+    print(f"✅ Merged {stats['records']} votes from {len(args.inputs)} files in {time.time() - start:.2f}s")
+    print(f"   {stats['voters']} voters written to {args.output}")
+    print(f"   {stats['duplicates']} duplicate copies dropped")
+    if stats["conflicts"]:
+        print(f"❌ {stats['conflicts']} conflicting votes written to {args.conflicts}")
+    else:
+        print("✅ No voter voted more than once")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Multi-Sensor Controller for EVM
+Drives several Arduino + FPM10A units from one Raspberry Pi. Every unit found
+on /dev/ttyACM* (or /dev/ttyUSB* for CH340 boards) gets its own state machine,
+and all of them run as tasks on a single asyncio event loop. The loop sleeps in
+the kernel until any port has data, so ten idle sensors cost no more CPU than one.
+
+    controller = MultiSensorController(discover_ports())
+    await controller.connect()
+    await controller.run_stations(on_match)   # on_match(unit, fid) per booth
+
+Run with:
+    python3 multi_sensor.py list                     (handshake every port found)
+    python3 multi_sensor.py scan                     (print matches from all sensors)
+    python3 multi_sensor.py bench [--units 1 2 4 8]  (simulated units)
+"""
+
+import argparse  # Import argparse for the command line
+import asyncio  # Import asyncio for the shared event loop
+import glob  # Import glob for port discovery
+import time  # Import time for the benchmark
+from serial_session import BAUDRATE, COMMAND_DONE, COMMAND_TIMEOUTS, SensorError, command_name  # Shared protocol
+
+PORT_PATTERNS = ("/dev/ttyACM*", "/dev/ttyUSB*")  # Arduino Uno / CH340 clones
+MAX_TIMEOUTS = 3  # Consecutive unanswered commands before a unit is marked offline
+
+# Unit states
+CONNECTING, READY, SCANNING, ENROLLING, OFFLINE = "connecting", "ready", "scanning", "enrolling", "offline"
+
+def discover_ports(patterns=PORT_PATTERNS):  # Serial devices that may be sensor units
+    return sorted(port for pattern in patterns for port in glob.glob(pattern))
+
+class SensorUnit:
+    """One Arduino on the event loop: line reader, command/reply matching and state."""
+
+    def __init__(self, name, ser):
+        self.name = name  # Port path, shown in logs
+        self.ser = ser  # pyserial Serial with timeout=0, or SimulatedArduino
+        self.state = CONNECTING
+        self.lines = asyncio.Queue()
+        self.timeouts = 0  # Consecutive unanswered commands
+        self.matches = 0
+        self.attached = False  # Registered with the event loop
+        self._buf = b""
+
+    @classmethod
+    def open(cls, port):  # Non-blocking pyserial port (imported lazily)
+        import serial  # Import serial for Arduino communication
+        return cls(port, serial.Serial(port, BAUDRATE, timeout=0))
+
+    def attach(self, loop):  # Wake this unit when its port is readable
+        loop.add_reader(self.ser.fileno(), self._on_readable)
+        self.attached = True
+
+    def detach(self, loop):
+        if self.attached:
+            loop.remove_reader(self.ser.fileno())
+            self.attached = False
+
+    def _on_readable(self):  # Called by the loop; never blocks
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:  # Unplugged
+            self.lines.put_nowait(f"SERIAL_ERROR:{e}")
+            return
+        self._buf += data
+        while b"\n" in self._buf:
+            raw, self._buf = self._buf.split(b"\n", 1)
+            line = raw.decode(errors="ignore").strip()
+            if line:
+                self.lines.put_nowait(line)
+
+    def send(self, command):
+        self.ser.write(f"{command}\n".encode())
+
+    async def readline(self, timeout):  # Next line or None after timeout
+        try:
+            return await asyncio.wait_for(self.lines.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def request(self, command, timeout=None, done=None, on_line=None):  # Same contract as SerialSession.request
+        name = command_name(command)
+        timeout = COMMAND_TIMEOUTS.get(name, 10) if timeout is None else timeout
+        done = done or COMMAND_DONE.get(name, lambda line: True)
+        self.send(command)
+        deadline = time.monotonic() + timeout
+        while True:
+            line = await self.readline(deadline - time.monotonic())
+            if line is None:
+                self.timeouts += 1
+                if self.timeouts >= MAX_TIMEOUTS:
+                    self.state = OFFLINE
+                return None
+            self.timeouts = 0
+            if line.startswith("SERIAL_ERROR"):
+                self.state = OFFLINE
+                return None
+            if done(line):
+                return line
+            if on_line:
+                on_line(line)
+
+    async def wait_ready(self, timeout=10, ping_every=0.5):  # Same handshake as SerialSession.wait_ready
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            line = await self.readline(min(ping_every, deadline - time.monotonic()))
+            if line and "FINGERPRINT_READY" in line:
+                self.state = READY
+                return True
+            if line and "FINGERPRINT_ERROR" in line:
+                break
+            if line is None:
+                self.send("PING")
+        self.state = OFFLINE
+        raise SensorError(f"{self.name}: sensor not ready")
+
+    # -----------------------------
+    # Station behaviour
+    # -----------------------------
+    async def scan(self):  # READY -> SCANNING -> READY; fingerprint ID or None
+        self.state = SCANNING
+        reply = await self.request("CHECK")
+        if self.state == SCANNING:
+            self.state = READY
+        if reply and reply.startswith("MATCH:"):
+            self.matches += 1
+            return int(reply[6:])
+        return None
+
+    async def enroll(self, fid, on_line=None):  # READY -> ENROLLING -> READY; True on success
+        self.state = ENROLLING
+        reply = await self.request(f"ENROLL:{fid}", on_line=on_line)
+        if self.state == ENROLLING:
+            self.state = READY
+        return reply is not None and "Enrollment successful" in reply
+
+class MultiSensorController:
+    """Owns every SensorUnit and runs one task per unit on the current event loop."""
+
+    def __init__(self, units):
+        self.units = list(units)
+
+    async def connect(self):  # Handshake all units at once; units that fail stay OFFLINE
+        loop = asyncio.get_running_loop()
+        for unit in self.units:
+            unit.attach(loop)
+        results = await asyncio.gather(*(unit.wait_ready() for unit in self.units), return_exceptions=True)
+        for unit, result in zip(self.units, results):
+            if isinstance(result, Exception):
+                print(f"❌ {result}")
+                unit.detach(loop)
+        return [unit for unit in self.units if unit.state == READY]
+
+    async def _station(self, unit, on_match, stop):  # Voting station loop for one unit
+        while not stop.is_set() and unit.state != OFFLINE:
+            fid = await unit.scan()
+            if fid is not None:
+                await on_match(unit, fid)  # The booth decides what a match means
+        if unit.state == OFFLINE:
+            print(f"❌ {unit.name} went offline")
+
+    async def run_stations(self, on_match, stop=None):  # Scan on every ready unit until stop is set
+        stop = stop or asyncio.Event()
+        await asyncio.gather(*(self._station(unit, on_match, stop) for unit in self.units if unit.state == READY))
+
+    def close(self):
+        loop = asyncio.get_running_loop()
+        for unit in self.units:
+            unit.detach(loop)
+            unit.ser.close()
+
+# -----------------------------
+# Command line
+# -----------------------------
+async def bench(counts, seconds):  # Aggregate CHECK throughput of simulated units
+    from arduino_sim import SimulatedArduino
+    for count in counts:
+        sims = [SimulatedArduino(enrolled=range(1, 101)) for _ in range(count)]
+        controller = MultiSensorController(SensorUnit(f"sim{i}", sim) for i, sim in enumerate(sims))
+        await controller.connect()
+        stop = asyncio.Event()
+
+        async def on_match(unit, fid):  # Next voter steps up right away
+            unit.ser.place_finger(fid % 100 + 1)
+
+        for sim in sims:
+            sim.place_finger(1)
+        start_cpu, start = time.process_time(), time.monotonic()
+        asyncio.get_running_loop().call_later(seconds, stop.set)
+        await controller.run_stations(on_match, stop)
+        elapsed = time.monotonic() - start
+        cpu = (time.process_time() - start_cpu) / elapsed * 100
+        matches = sum(unit.matches for unit in controller.units)
+        print(f"{count:2d} units: {matches / elapsed:7.1f} scans/s total, "
+              f"{matches / elapsed / count:5.1f} per unit, {cpu:4.1f}% CPU")
+        controller.close()
+
+async def scan_all(ports):  # Print matches from every sensor (parallel desks)
+    controller = MultiSensorController(SensorUnit.open(port) for port in ports)
+    ready = await controller.connect()
+    print(f"✅ {len(ready)} sensors ready: {', '.join(unit.name for unit in ready)}")
+
+    async def on_match(unit, fid):
+        print(f"{unit.name} → MATCH:{fid}")
+
+    try:
+        await controller.run_stations(on_match)
+    finally:
+        controller.close()
+
+async def list_units(ports):  # Handshake and report every port
+    controller = MultiSensorController(SensorUnit.open(port) for port in ports)
+    await controller.connect()
+    for unit in controller.units:
+        print(f"{unit.name}: {unit.state}")
+    controller.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive several fingerprint sensor units from one Pi.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="find and handshake sensor units")
+    sub.add_parser("scan", help="print matches from every unit")
+    p_bench = sub.add_parser("bench", help="aggregate throughput with simulated units")
+    p_bench.add_argument("--units", type=int, nargs="+", default=[1, 2, 4, 8])
+    p_bench.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        asyncio.run(bench(args.units, args.seconds))
+        return
+    ports = discover_ports()
+    if not ports:
+        print("❌ No /dev/ttyACM* or /dev/ttyUSB* devices found")
+        return
+    try:
+        asyncio.run(scan_all(ports) if args.cmd == "scan" else list_units(ports))
+    except KeyboardInterrupt:
+        print("\nExiting program...")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Vote Reconciliation for EVM
+Checks that every vote record_vote() wrote to votes.csv also reached the
+Firebase vote shards (see vote_store.py), re-pushes the missing ones and flags remote-only votes.
+Only this booth's shards (vote_shards/<hour>/<booth>, EVM_BOOTH or --booth) are
+compared: other booths' votes are never downloaded or reported.
+
+Votes are grouped into hour buckets. Each bucket is summarised by its vote
+count and the XOR of the vote digests (order independent), and the buckets form
+a small Merkle tree (root -> day -> hour). The tree last confirmed present in
+Firebase is cached in reconcile_state.json, so a later run only descends into
+days/hours whose local hash changed and downloads just those hour shards, a
+page at a time. Settled history is therefore never transferred again.
+
+Run with: python3 reconcile_votes.py votes.csv [--dry-run] [--full] [--booth NAME]
+"""
+
+import argparse  # Import argparse for the command line
+import hashlib  # Import hashlib for bucket and tree hashes
+import json  # Import json for the state file
+import os  # Import os for file checks
+import time  # Import time for timing
+
+import requests  # Import requests for Firebase API
+
+from vote_records import VoteRecord, format_csv_line, iter_records, record_digest
+from vote_store import BOOTH, HOUR_CHARS, VoteStore, firebase_key
+
+# -----------------------------
+# Firebase setup
+# -----------------------------
+DB_URL = "https://e-vm-f7bdf-default-rtdb.firebaseio.com"  # Firebase database URL
+STATE_FILE = "reconcile_state.json"  # Last verified remote tree
+BUCKET_CHARS = HOUR_CHARS  # "YYYY-MM-DDTHH" -> one bucket per hour, the same as a vote shard
+DAY_CHARS = 10  # "YYYY-MM-DD" -> one tree node per day
+SETTLE_SECONDS = 2 * 3600  # Buckets younger than this are always re-checked
+
+# -----------------------------
+# Bucket summaries and Merkle tree
+# -----------------------------
+def bucket_of(timestamp):  # Hour bucket of an ISO timestamp
+    return timestamp[:BUCKET_CHARS]
+
+def leaf_hash(count, xor):  # Hash of one hour bucket
+    return hashlib.sha256(f"{count}:{xor:064x}".encode()).hexdigest()
+
+def summarize(records):  # Build hour bucket summaries
+    """Return {bucket: [count, xor_of_digests]} for an iterable of VoteRecords."""
+    buckets = {}
+    for record in records:
+        entry = buckets.setdefault(bucket_of(record.timestamp), [0, 0])
+        entry[0] += 1  # Vote count
+        entry[1] ^= int.from_bytes(record_digest(record), "big")  # Order independent set hash
+    return buckets
+
+def build_tree(buckets):  # Merkle tree root -> day -> hour
+    """Return {"root": hash, "days": {day: hash}, "hours": {bucket: hash}}."""
+    hours = {b: leaf_hash(c, x) for b, (c, x) in buckets.items()}
+    days = {}
+    for bucket in sorted(hours):  # Day node hashes its hours in order
+        days.setdefault(bucket[:DAY_CHARS], hashlib.sha256()).update(f"{bucket}={hours[bucket]};".encode())
+    days = {d: h.hexdigest() for d, h in days.items()}
+    root = hashlib.sha256("".join(f"{d}={days[d]};" for d in sorted(days)).encode()).hexdigest()
+    return {"root": root, "days": days, "hours": hours}
+
+def changed_buckets(local, cached, now_bucket, full=False):  # Merkle descent
+    """Return the local hour buckets whose hash differs from the last verified remote tree."""
+    settled = lambda b: b < now_bucket  # noqa: E731 - buckets still filling are never trusted
+    if not full and cached and cached["root"] == local["root"] and all(map(settled, local["hours"])):
+        return []  # Whole election identical to the verified state
+    todo = []
+    for day, day_hash in local["days"].items():
+        if not full and cached and cached["days"].get(day) == day_hash:
+            if all(settled(b) for b in local["hours"] if b.startswith(day)):
+                continue  # Entire day verified before
+        for bucket, hour_hash in local["hours"].items():
+            if bucket.startswith(day):
+                if full or not cached or cached["hours"].get(bucket) != hour_hash or not settled(bucket):
+                    todo.append(bucket)
+    return sorted(todo)
+
+# -----------------------------
+# Remote side
+# -----------------------------
+def remote_vote(key, val):  # Firebase vote -> VoteRecord
+    return VoteRecord(str(val.get("voter_id")), key, val.get("candidate", ""), val.get("timestamp", ""), "firebase")
+
+def fetch_bucket(store, bucket):  # Download one hour of votes
+    """Return the Firebase votes of this booth's shard for the hour bucket."""
+    return [remote_vote(k, v) for k, v in store.shard_votes(firebase_key(bucket), firebase_key(store.booth))]
+
+def fetch_all(store):  # Download every vote of this booth (used with --full), shard by shard
+    booth = firebase_key(store.booth)
+    return [remote_vote(k, v) for hour, shard_booth in store.shards() if shard_booth == booth
+            for k, v in store.shard_votes(hour, booth)]
+
+def repush(store, record):  # Push a missing vote with its original timestamp
+    return store.push(record.candidate, record.voter_id, record.timestamp)
+
+# -----------------------------
+# Reconciliation
+# -----------------------------
+def diff_records(local, remote):  # Exact set difference of two vote lists
+    """Return (missing_remote, extra_remote, skewed) lists of VoteRecords."""
+    local_by = {record_digest(r): r for r in local}
+    remote_by = {record_digest(r): r for r in remote}
+    missing = [r for d, r in local_by.items() if d not in remote_by]
+    extra = [r for d, r in remote_by.items() if d not in local_by]
+    # Booths before the shared-timestamp fix stamped CSV and Firebase separately;
+    # pair those up by (voter, candidate) instead of reporting them twice.
+    extra_by = {(r.voter_id, r.candidate): r for r in extra}
+    skewed = [(r, extra_by.pop((r.voter_id, r.candidate))) for r in missing if (r.voter_id, r.candidate) in extra_by]
+    paired = {id(local_r) for local_r, _ in skewed}
+    return [r for r in missing if id(r) not in paired], list(extra_by.values()), skewed
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def save_state(path, tree):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(tree, f)
+    os.replace(tmp, path)  # Atomic replace
+
+def reconcile(csv_path, state_path=STATE_FILE, full=False, dry_run=False, report_path="reconcile_report.csv",
+              booth=BOOTH):
+    """Compare votes.csv with Firebase, re-push missing votes and write a report; return counters."""
+    start = time.time()
+    local_tree = build_tree(summarize(iter_records(csv_path)))  # Pass 1: digests only, no records kept
+    cached = load_state(state_path)
+    now_bucket = bucket_of(time.strftime("%Y-%m-%dT%H", time.gmtime(time.time() - SETTLE_SECONDS)))
+    todo = set(changed_buckets(local_tree, cached, now_bucket, full))
+    stats = {"buckets": len(local_tree["hours"]), "checked": len(todo), "missing": 0, "extra": 0,
+             "skewed": 0, "repushed": 0, "root": local_tree["root"]}
+
+    store = VoteStore(requests.Session(), DB_URL, booth=booth, timeout=30)  # One keep-alive connection for all requests
+    if full:  # Only a full run can see hours that exist remotely but not locally
+        local, remote = list(iter_records(csv_path)), fetch_all(store)
+    else:  # Pass 2: load just the changed buckets on both sides
+        local = [r for r in iter_records(csv_path) if bucket_of(r.timestamp) in todo] if todo else []
+        remote = [r for bucket in sorted(todo) for r in fetch_bucket(store, bucket)]
+    missing, extra, skewed = diff_records(local, remote)
+
+    with open(report_path, "w") as rep:
+        rep.write("status,voter_id,name_or_key,candidate,timestamp\n")
+        for r in missing:
+            pushed = not dry_run and repush(store, r)
+            stats["repushed"] += pushed
+            rep.write(("repushed," if pushed else "missing_remote,") + format_csv_line(r))
+        for r in extra:
+            rep.write("remote_only," + format_csv_line(r))  # In this booth's shards but not in votes.csv
+        for local_r, remote_r in skewed:
+            rep.write("timestamp_skew," + format_csv_line(local_r))
+    stats.update(missing=len(missing), extra=len(extra), skewed=len(skewed))
+
+    if not dry_run and len(missing) == stats["repushed"]:  # Remote now equals local for checked buckets
+        save_state(state_path, local_tree)
+    stats["seconds"] = time.time() - start
+    return stats
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile votes.csv with the Firebase vote shards.")
+    parser.add_argument("csv", nargs="?", default="votes.csv", help="local votes file")
+    parser.add_argument("--state", default=STATE_FILE, help="cached verified remote tree")
+    parser.add_argument("--report", default="reconcile_report.csv", help="difference report")
+    parser.add_argument("--full", action="store_true", help="ignore the cache and download every vote")
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not re-push")
+    parser.add_argument("--booth", default=BOOTH, help="booth that wrote the votes file (default: EVM_BOOTH or hostname)")
+    args = parser.parse_args()
+
+    stats = reconcile(args.csv, args.state, args.full, args.dry_run, args.report, args.booth)
+    print(f"Merkle root {stats['root'][:16]}… over {stats['buckets']} hour buckets")
+    print(f"Checked {stats['checked']} changed buckets in {stats['seconds']:.2f}s")
+    if stats["missing"] or stats["extra"] or stats["skewed"]:
+        print(f"❌ {stats['missing']} missing in Firebase ({stats['repushed']} re-pushed), "
+              f"{stats['extra']} only in Firebase, {stats['skewed']} with timestamp skew — see {args.report}")
+    else:
+        print("✅ votes.csv and Firebase agree")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Serial Session Manager for EVM
+One place for talking to the Arduino instead of a `while True: if ser.in_waiting`
+loop in every script. Reads block in the kernel with a deadline, so waiting for
+the sensor costs no CPU.
+
+CLI tools use request():
+    sensor = SerialSession()
+    sensor.open()
+    sensor.wait_ready()
+    reply = sensor.request("CHECK")            # "MATCH:5", "NO_MATCH" or None on timeout
+
+The GUI starts a reader thread and polls from root.after callbacks:
+    sensor.start_reader()
+    line = sensor.poll()                        # never blocks
+
+The booth uses ReconnectingSession, which survives a cable wiggle or an
+Arduino reset: the board is found again by its USB serial number, the PING
+handshake is redone and the command that was in progress is sent again.
+
+Run with: python3 serial_session.py cpu [--port /dev/ttyACM0] [--seconds 5]
+to compare CPU use of the old busy-wait against a blocking wait, or
+python3 serial_session.py reconnect [--port sim] [--cycles 20]
+to measure how long the link takes to recover.
+"""
+
+import argparse  # Import argparse for the CPU measurement CLI
+import os  # Import os for device paths
+import queue  # Import queue for lines from the reader thread
+import threading  # Import threading for the reader thread
+import time  # Import time for deadlines
+from collections import deque  # Import deque for lines read during a reconnect
+
+DEFAULT_PORT = "/dev/ttyACM0"  # Arduino on the Raspberry Pi
+BAUDRATE = 9600  # Must match Serial.begin() in embedded.ino
+READ_SLICE = 0.2  # Longest single blocking read, keeps close() and deadlines responsive
+RECONNECT_POLL = 0.05  # How often to look for the board after it disappears
+PING_EVERY = 0.25  # PING interval during the reconnect handshake
+RECOVERY_BUDGET = 1.0  # Seconds from the board reappearing to a ready sensor
+
+# Per-command timeouts (seconds) and the lines that end each command
+COMMAND_TIMEOUTS = {"CHECK": 10, "ENROLL": 30, "DELETE_ALL": 10, "PING": 3, "LIST": 10, "DUMP": 5, "INDEX": 5}
+COMMAND_DONE = {
+    "CHECK": lambda line: line.startswith("MATCH") or line == "NO_MATCH",
+    "ENROLL": lambda line: "Enrollment successful" in line or "Failed" in line or line.startswith("ERROR"),
+    "DELETE_ALL": lambda line: line in ("ALL_DELETED", "DELETE_FAILED"),
+    "PING": lambda line: "FINGERPRINT_READY" in line,
+    "LIST": lambda line: line.startswith("SLOTS:"),
+    "DUMP": lambda line: line.startswith(("TEMPLATE:", "DUMP_FAILED")),
+    "INDEX": lambda line: line.startswith(("INDEX:", "INDEX_FAILED")),
+}
+
+RESUMABLE = {"CHECK", "ENROLL", "DELETE_ALL", "LIST", "DUMP", "INDEX"}  # Sent again after a reconnect
+
+class SensorError(RuntimeError):
+    """Raised when the Arduino reports FINGERPRINT_ERROR or never becomes ready."""
+
+def command_name(command):  # "ENROLL:5" -> "ENROLL"
+    return command.split(":", 1)[0]
+
+class SerialSession:
+    """Blocking, deadline-driven line I/O with the Arduino."""
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=BAUDRATE, ser=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.ser = ser  # Already opened port or SimulatedArduino (tests, benchmarks)
+        self.lines = queue.Queue()  # Filled by the reader thread
+        self._reader = None
+        self._partial = b""  # Start of a line cut off by a read timeout
+        self._write_lock = threading.Lock()
+        self.on_queued = None  # Called from the reader thread with each line (wakes an idle GUI)
+
+    # -----------------------------
+    # Connection
+    # -----------------------------
+    def open(self):  # Open the port (pyserial imported here so tools start fast)
+        if self.ser is None:
+            import serial  # Import serial for Arduino communication
+            self.ser = serial.Serial(self.port, self.baudrate, timeout=READ_SLICE)
+        return self
+
+    def wait_ready(self, timeout=10, ping_every=0.5, on_line=print):  # Startup handshake
+        """Wait for FINGERPRINT_READY, sending PING if the board did not reset on open."""
+        deadline = time.monotonic() + timeout
+        last_ping = time.monotonic()
+        while time.monotonic() < deadline:
+            line = self.readline(min(ping_every, deadline - time.monotonic()))
+            if line and on_line:
+                on_line(line)
+            if line and "FINGERPRINT_READY" in line:
+                return True
+            if line and "FINGERPRINT_ERROR" in line:
+                raise SensorError("Sensor error")
+            if time.monotonic() - last_ping >= ping_every:  # Nothing yet: ask directly
+                self.send("PING")
+                last_ping = time.monotonic()
+        raise SensorError("No FINGERPRINT_READY from Arduino")
+
+    def close(self):
+        reader, self._reader = self._reader, None
+        if self.ser is not None:
+            self.ser.close()
+        if reader is not None:
+            reader.join(timeout=2 * READ_SLICE)
+
+    # -----------------------------
+    # Line I/O
+    # -----------------------------
+    def send(self, command):  # Write one command line
+        with self._write_lock:  # GUI and workers may both send
+            self.ser.write(f"{command}\n".encode())
+
+    def _read_port(self, timeout):  # One blocking read from the port
+        slice_ = READ_SLICE if timeout >= READ_SLICE else max(0.01, round(timeout, 2))
+        if self.ser.timeout != slice_:  # pyserial reconfigures the tty on every change
+            self.ser.timeout = slice_
+        raw = self._partial + self.ser.readline()
+        if raw and not raw.endswith(b"\n"):  # Timed out mid-line: keep it for the next read
+            self._partial = raw
+            return None
+        self._partial = b""
+        return raw.decode(errors="ignore").strip() if raw else None
+
+    def readline(self, timeout):  # Next non-empty line or None after timeout
+        """Block until a line arrives or the timeout (seconds) expires."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if self._reader is not None:  # Reader thread owns the port
+                try:
+                    return self.lines.get(timeout=remaining)
+                except queue.Empty:
+                    return None
+            line = self._read_port(remaining)
+            if line:
+                return line
+
+    def request(self, command, timeout=None, done=None, on_line=None):  # Command + matched reply
+        """Send a command and return the line that completes it, or None on timeout.
+
+        Lines that do not complete the command (progress messages such as
+        "Remove finger") are passed to on_line.
+        """
+        name = command_name(command)
+        timeout = COMMAND_TIMEOUTS.get(name, 10) if timeout is None else timeout
+        done = done or COMMAND_DONE.get(name, lambda line: True)
+        self.send(command)
+        deadline = time.monotonic() + timeout
+        while True:
+            line = self.readline(deadline - time.monotonic())
+            if line is None:
+                return None  # Timed out
+            if done(line):
+                return line
+            if on_line:
+                on_line(line)
+
+    # -----------------------------
+    # GUI support
+    # -----------------------------
+    def start_reader(self):  # Move port reads to a thread that blocks in the kernel
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_loop, name="serial-reader", daemon=True)
+            self._reader.start()
+        return self
+
+    def _read_loop(self):
+        me = threading.current_thread()
+        while self._reader is me:
+            try:
+                line = self._read_port(READ_SLICE)
+            except Exception as e:  # Port closed or unplugged
+                self.lines.put(f"SERIAL_ERROR:{e}")
+                return
+            if line:
+                self.lines.put(line)
+                if self.on_queued:
+                    self.on_queued(line)
+
+    def poll(self):  # Non-blocking: next line or None (for root.after callbacks)
+        try:
+            return self.lines.get_nowait()
+        except queue.Empty:
+            return None
+
+# -----------------------------
+# Hot reconnect
+# -----------------------------
+def usb_serial_number(device):  # USB serial number behind a tty, None if unknown
+    from serial.tools import list_ports  # Import list_ports for USB details
+    real = os.path.realpath(device)  # /dev/serial/by-id/... links to /dev/ttyACM0
+    for info in list_ports.comports():
+        if info.device in (device, real):
+            return info.serial_number
+    return None
+
+def find_port(serial_number):  # Current device node of a board, None while unplugged
+    from serial.tools import list_ports  # Import list_ports for USB details
+    for info in list_ports.comports():
+        if info.serial_number == serial_number:
+            return info.device
+    return None
+
+class ReconnectingSession(SerialSession):
+    """SerialSession that recovers from unplugs and Arduino resets.
+
+    A failed read or write closes the port and polls for the board by USB
+    serial number (it may come back as /dev/ttyACM1), redoes the PING handshake
+    and re-sends the command that was still waiting for a reply. An unprompted
+    FINGERPRINT_READY means the board reset on its own; that command is re-sent
+    as well.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=BAUDRATE, serial_number=None, opener=None, on_event=print):
+        super().__init__(port, baudrate)
+        self.serial_number = serial_number  # Learned from the port on first open if not given
+        self.opener = opener or self._open_usb  # Returns an open port or raises OSError
+        self.on_event = on_event or (lambda message: None)
+        self.pending = None  # Resumable command still waiting for its reply
+        self.recoveries = []  # Seconds from the board reappearing to ready, per reconnect
+        self._held = deque()  # Lines read during the handshake, delivered afterwards
+        self._pinged = 0.0  # Last PING sent; the READY that answers it is not a reset
+        self._recovering = False
+        self._closed = False
+
+    def _open_usb(self):
+        import serial  # Import serial for Arduino communication
+        device = find_port(self.serial_number) if self.serial_number else self.port
+        if device is None:
+            raise OSError(f"No board with USB serial {self.serial_number}")
+        ser = serial.Serial()
+        ser.port, ser.baudrate, ser.timeout = device, self.baudrate, READ_SLICE
+        ser.dtr = False  # pyserial does not pulse DTR again after open, so a powered board keeps running
+        ser.open()
+        if self.serial_number is None:
+            self.serial_number = usb_serial_number(device)
+        self.port = device
+        return ser
+
+    def open(self):
+        if self.ser is None:
+            self.ser = self.opener()
+        return self
+
+    def close(self):
+        self._closed = True
+        super().close()
+
+    def send(self, command):
+        name = command_name(command)
+        if name in RESUMABLE:
+            self.pending = command
+        elif name == "PING":
+            self._pinged = time.monotonic()
+        if self._recovering:
+            return  # Sent by _recover() once the board answers
+        try:
+            super().send(command)
+        except OSError as e:
+            if self._reader is None:  # No reader thread to notice: recover here
+                self._recover(e)
+
+    def _read_port(self, timeout):
+        if self._held:
+            return self._held.popleft()
+        try:
+            line = super()._read_port(timeout)
+        except OSError as e:
+            if self._closed:
+                raise
+            self._recover(e)
+            return self._held.popleft() if self._held else None
+        if line:
+            self._track(line)
+        return line
+
+    def _track(self, line):  # Clear the pending command, or resend it after a reset
+        if self.pending and COMMAND_DONE[command_name(self.pending)](line):
+            self.pending = None
+        elif "FINGERPRINT_READY" in line and self.pending and time.monotonic() - self._pinged > 1.0:
+            self.on_event(f"🔁 Arduino restarted, sending {self.pending} again")
+            super().send(self.pending)
+
+    def _recover(self, error):
+        self._recovering = True
+        lost = time.monotonic()
+        self.on_event(f"🔌 Sensor link lost ({error}), reconnecting...")
+        try:
+            self.ser.close()
+        except OSError:
+            pass
+        self._partial = b""
+        while not self._closed:
+            ser = None
+            try:
+                ser = self.opener()
+                found = time.monotonic()
+                self.ser = ser
+                self._handshake()
+                break
+            except (OSError, SensorError):
+                if ser is not None:
+                    ser.close()
+                time.sleep(RECONNECT_POLL)
+        else:
+            return
+        elapsed = time.monotonic() - found
+        self.recoveries.append(elapsed)
+        mark = "✅" if elapsed <= RECOVERY_BUDGET else "⚠️"
+        self.on_event(f"{mark} Sensor back on {self.port} in {elapsed * 1000:.0f} ms "
+                      f"({time.monotonic() - lost:.1f} s offline)")
+        for line in self._held:  # A reply that arrived during the handshake
+            self._track(line)
+        self._recovering = False
+        if self.pending:
+            super().send(self.pending)  # Resume the scan that was in progress
+
+    def _handshake(self, timeout=3.0):  # PING until FINGERPRINT_READY, reading the port directly
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if time.monotonic() - self._pinged >= PING_EVERY:
+                super().send("PING")
+                self._pinged = time.monotonic()
+            line = SerialSession._read_port(self, 0.05)
+            if line and "FINGERPRINT_READY" in line:
+                return
+            if line and "FINGERPRINT_ERROR" in line:
+                raise SensorError("Sensor error")
+            if line:
+                self._held.append(line)
+        raise SensorError("No FINGERPRINT_READY after reconnect")
+
+def bench_reconnect(cycles, outage, boot):  # Unplug the simulated board during CHECKs
+    from arduino_sim import SimulatedArduino
+    board = {"present": True, "sim": None}
+
+    def opener():
+        if not board["present"]:
+            raise OSError("No such device")
+        board["sim"] = SimulatedArduino(enrolled=range(1, 10), scan_time=0.3, ready_delay=boot)
+        board["sim"].place_finger(5)  # The voter keeps the finger on the sensor
+        return board["sim"]
+
+    session = ReconnectingSession(opener=opener, on_event=None).open()
+    session.wait_ready(on_line=None)
+    session.start_reader()
+    resumed = 0
+    for _ in range(cycles):
+        session.send("CHECK")
+        time.sleep(0.1)  # Scan in progress
+        board["present"] = False
+        board["sim"].unplug()
+        threading.Timer(outage, board.update, kwargs={"present": True}).start()
+        line = session.readline(outage + 5)
+        if line and "FINGERPRINT_READY" in line:  # Boot message of the new board
+            line = session.readline(5)
+        resumed += line == "MATCH:5"
+    session.close()
+    times = sorted(session.recoveries)
+    print(f"Reconnects: {len(times)}/{cycles}, scans resumed: {resumed}/{cycles}")
+    print(f"Recovery after replug: median {times[len(times) // 2] * 1000:.0f} ms, "
+          f"max {times[-1] * 1000:.0f} ms (budget {RECOVERY_BUDGET * 1000:.0f} ms)")
+
+def watch_reconnect(port):  # Real board: report recoveries while the cable is pulled by hand
+    session = ReconnectingSession(port).open()
+    session.wait_ready()
+    session.start_reader()
+    print(f"Watching {session.port} (USB serial {session.serial_number}); unplug and replug the Arduino, Ctrl+C to stop")
+    try:
+        while True:
+            session.send("PING")
+            line = session.readline(1.0)
+            if line and "FINGERPRINT_READY" not in line:
+                print(f"Arduino → {line}")
+    except KeyboardInterrupt:
+        pass
+    session.close()
+    if session.recoveries:
+        print(f"Worst recovery: {max(session.recoveries) * 1000:.0f} ms over {len(session.recoveries)} reconnects")
+
+# -----------------------------
+# CPU measurement
+# -----------------------------
+def measure_wait(ser, seconds, busy):  # CPU share while waiting for a reply that never comes
+    start_cpu, start = time.process_time(), time.monotonic()
+    if busy:  # The old pattern: spin on in_waiting
+        while time.monotonic() - start < seconds:
+            if ser.in_waiting > 0:
+                ser.readline()
+    else:
+        session = SerialSession(ser=ser)
+        session.readline(seconds)
+    return (time.process_time() - start_cpu) / (time.monotonic() - start) * 100
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CPU use of serial waits.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_cpu = sub.add_parser("cpu", help="busy-wait vs blocking wait")
+    p_cpu.add_argument("--port", default="sim", help="serial port, or 'sim' for the simulated Arduino")
+    p_cpu.add_argument("--seconds", type=float, default=3)
+    p_rec = sub.add_parser("reconnect", help="measure recovery after unplugging the Arduino")
+    p_rec.add_argument("--port", default="sim", help="serial port to watch, or 'sim' for simulated unplugs")
+    p_rec.add_argument("--cycles", type=int, default=20)
+    p_rec.add_argument("--outage", type=float, default=0.3, help="seconds the simulated cable stays out")
+    p_rec.add_argument("--boot", type=float, default=0.2, help="seconds the simulated board takes to boot")
+    args = parser.parse_args()
+
+    if args.cmd == "reconnect":
+        if args.port == "sim":
+            bench_reconnect(args.cycles, args.outage, args.boot)
+        else:
+            watch_reconnect(args.port)
+        return
+
+    if args.port == "sim":
+        from arduino_sim import SimulatedArduino
+        ser = SimulatedArduino()
+    else:
+        ser = SerialSession(args.port).open().ser
+    time.sleep(0.1)
+    ser.reset_input_buffer()  # Drop the boot message so both runs wait on an idle line
+    busy = measure_wait(ser, args.seconds, busy=True)
+    blocking = measure_wait(ser, args.seconds, busy=False)
+    print(f"Busy-wait on in_waiting: {busy:5.1f}% CPU")
+    print(f"Blocking read with deadline: {blocking:5.1f}% CPU")
+    ser.close()
+
+if __name__ == "__main__":
+    main()
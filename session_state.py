@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Voter Session Checkpoint for EVM
+Where the booth is in the voter flow, kept in a tiny JSON file that is
+replaced atomically at every step (write a temp file, fsync, rename, fsync the
+directory). A power cut leaves either the old or the new state, never a mix,
+so on boot the booth can pick up the exact step it was in.
+
+    checkpoint = SessionCheckpoint("booth_state.json")
+    checkpoint.save("recognized", voter_id="5", name="Alice")
+    step, state = checkpoint.load()     # ("idle", {}) when there is nothing to resume
+
+Steps: idle -> recognized -> recording -> idle. A "recording" state is saved
+before any vote file is written, with the file sizes at that moment, so a
+half-written vote can be finished or cut off again (see resume_session() in
+voting6.py).
+
+Run with:
+    python3 session_state.py show [booth_state.json]
+    python3 session_state.py bench [--saves 200]
+"""
+
+import argparse  # Import argparse for the command line
+import json  # Import json for the state file
+import os  # Import os for fsync, rename and truncation
+import time  # Import time for state age and timing
+
+STATE_FILE = "booth_state.json"  # Next to votes.csv
+
+class SessionCheckpoint:
+    """Atomically replaced record of the current voter-flow step."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._dir = os.path.dirname(os.path.abspath(path))
+
+    def save(self, step, **fields):  # Durable before it returns
+        record = {"step": step, "t": time.time()}
+        record.update(fields)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)  # Atomic: readers see the old or the new file
+        fd = os.open(self._dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)  # Make the rename itself survive a power cut
+        finally:
+            os.close(fd)
+
+    def load(self):  # (step, fields); fields include "t", the wall time of the save
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return "idle", {}
+        except ValueError:  # Only possible if the file was edited by hand
+            print(f"⚠️ Unreadable {self.path}, starting idle")
+            return "idle", {}
+        return record.pop("step", "idle"), record
+
+# -----------------------------
+# Journal helpers
+# -----------------------------
+def file_offset(path):  # Current size, 0 if the file does not exist yet
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+def truncate_to(path, offset):  # Cut off whatever was appended after offset
+    if file_offset(path) > offset:
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+    return False
+
+def has_line(path, line, offset=0):  # Was this exact line appended after offset?
+    if file_offset(path) <= offset:
+        return False
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return line.encode("utf-8") in f.read()
+
+# -----------------------------
+# Command line
+# -----------------------------
+def bench(saves):  # Cost of one checkpoint on this storage
+    import tempfile
+    checkpoint = SessionCheckpoint(os.path.join(tempfile.mkdtemp(dir="."), STATE_FILE))
+    times = []
+    for i in range(saves):
+        start = time.perf_counter()
+        checkpoint.save("recording", voter_id=str(i), name="Voter", candidate="Alice",
+                        timestamp="2026-10-19T08:00:00", chain_size=i, csv_offset=40 * i)
+        times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    checkpoint.load()
+    loaded = time.perf_counter() - start
+    times.sort()
+    print(f"save(): median {times[len(times) // 2] * 1000:.2f} ms, max {times[-1] * 1000:.2f} ms ({saves} saves)")
+    print(f"load(): {loaded * 1000:.2f} ms")
+    os.remove(checkpoint.path)
+    os.rmdir(os.path.dirname(checkpoint.path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or benchmark the booth session checkpoint.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_show = sub.add_parser("show", help="print the saved step")
+    p_show.add_argument("file", nargs="?", default=STATE_FILE)
+    p_bench = sub.add_parser("bench", help="measure checkpoint latency in the current directory")
+    p_bench.add_argument("--saves", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.saves)
+        return
+    step, state = SessionCheckpoint(args.file).load()
+    age = f", saved {time.time() - state.pop('t'):.0f} s ago" if "t" in state else ""
+    print(f"Step: {step}{age}")
+    for key, value in state.items():
+        print(f"  {key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+"""
+Session Trace for EVM
+Records everything that crosses the booth's boundary (Arduino serial lines,
+button edges, touch choices, buzzer commands, Firebase requests and
+responses) with timestamps, and replays a recording through the same booth
+code with the simulated Arduino, mock GPIO pins and canned Firebase answers.
+
+    EVM_TRACE=election.trace.gz python3 voting6.py       # record a real session
+
+A trace is one JSON array per line, [ms, kind, ...], gzip-compressed when the
+name ends in .gz. Firebase bodies that extend the previous body of the same
+request (votes.json grows by one vote per voter) are stored as a delta. The
+header records the booth name (vote_store.BOOTH), and a replay runs under it.
+
+Replay is lock-step: recorded inputs (rx, btn, tap, resp, open, unplug) are
+fed in with their recorded gaps divided by --speed, and every recorded output
+(tx, http) must be produced by the booth before the trace moves on. Repeated
+CHECK/NO_MATCH polls may differ in number, because they depend on timing.
+Firebase bodies are compared without the wall time: the timestamp field, the
+<hour> and <booth> segments of vote_shards/ and vote_index/ paths, the
+timestamp part of vote keys and the hour, booth and key of voted/<id>. Any
+other difference stops the replay with exit code 1, so a trace doubles as a
+regression test. The booth's own timers (dwell screens, idle mode) are scaled
+by the same speed (100x at --speed max).
+
+A trace is secret-ballot material: every MATCH:<id> is followed by the button
+or tap the voter chose, so it says who voted for whom, like votes.csv. Keep it
+under the same lock and delete it once it has served its purpose. Recording is
+refused while ballot encryption is on (ballot_key.pub.json present), because
+that booth otherwise keeps no link between voter and choice.
+
+Run with:
+    python3 session_trace.py replay election.trace.gz [--speed 1|100|max] [--out replay.trace.gz]
+    python3 session_trace.py stats election.trace.gz [replay.trace.gz]    # booth reaction times, side by side
+    python3 session_trace.py show election.trace.gz [--limit 50]
+(replay needs Xvfb unless --display points at a running X server)
+"""
+
+import argparse  # Import argparse for the command line
+import atexit  # Import atexit to flush the trace on exit
+import gzip  # Import gzip for compact trace files
+import json  # Import json for the line format
+import os  # Import os for the environment and files
+import queue  # Import queue for replayed responses and Tk calls
+import re  # Import re for URL labels
+import sys  # Import sys for the script name
+import threading  # Import threading for the replay driver
+import time  # Import time for timestamps
+from collections import deque  # Import deque for outputs waiting to be matched
+from urllib.parse import urlsplit  # Import urlsplit for URL labels
+from arduino_sim import SimulatedArduino  # Import simulated Arduino for replayed serial lines
+from ballot_crypto import PUBLIC_KEY_FILE  # Import key file name; no recording on encrypted booths
+from idle_mode import Waker  # Import waker to run replayed touches in the Tk thread
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+INPUTS = {"open", "unplug", "rx", "btn", "tap", "resp"}  # World -> booth, injected on replay
+OUTPUTS = {"tx", "http"}  # Booth -> world, must match on replay (one ordered channel each)
+NOTES = {"buzz"}  # Booth -> world, compared as a sequence at the end (timers make the order loose)
+TIMERS = {"EVM_DWELL_RECOGNIZED_MS": 2500, "EVM_DWELL_THANKS_MS": 3000,  # voting6.py defaults, scaled on replay
+          "EVM_DWELL_ALREADY_VOTED_MS": 3000, "EVM_IDLE_AFTER_S": 60}
+MAX_SPEED_TIMERS = 100  # At --speed max the booth's own timers run this much faster
+BUTTON_HOLD = 0.15  # Shortest replayed press, longer than voting6's 100 ms button poll
+OUTPUT_WAIT = 10  # Seconds the booth gets for an output, on top of the recorded gap
+DELTA_MIN = 64  # Shortest shared prefix worth storing as a delta
+
+# -----------------------------
+# Trace file
+# -----------------------------
+class TraceWriter:
+    """Appends [ms, kind, ...] lines from any thread; flushed every second and on exit."""
+
+    def __init__(self, path):
+        self.f = gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8")
+        self.t0 = time.monotonic()
+        self.lock = threading.Lock()
+        self.flushed = self.t0
+        atexit.register(self.close)
+
+    def log(self, kind, *data, at=None):
+        at = time.monotonic() if at is None else at
+        line = json.dumps([round((at - self.t0) * 1000, 1), kind, *data], ensure_ascii=False, separators=(",", ":"))
+        with self.lock:
+            if self.f.closed:
+                return
+            self.f.write(line + "\n")
+            if at - self.flushed > 1.0:
+                self.f.flush()
+                self.flushed = at
+
+    def close(self):
+        with self.lock:
+            if not self.f.closed:
+                self.f.close()
+
+def read_trace(path):  # [[ms, kind, ...], ...] with response deltas expanded
+    opener = gzip.open if path.endswith(".gz") else open
+    events, last, bodies = [], None, {}
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                event = json.loads(line)
+                if event[1] == "http":
+                    last = (event[2], event[3])
+                elif event[1] == "resp" and last is not None:
+                    if isinstance(event[3], dict):  # {"keep": n, "add": text} against the previous body of this request
+                        event[3] = bodies.get(last, "")[:event[3]["keep"]] + event[3]["add"]
+                    bodies[last] = event[3]
+                events.append(event)
+        except (ValueError, EOFError):  # Trace cut off by a power loss: keep what was flushed
+            pass
+    return events
+
+def describe(event):  # Short text for reports
+    kind, data = event[1], event[2:]
+    if kind == "http":
+        body = f" {json.dumps(normalize(data[2]), ensure_ascii=False)[:80]}" if data[2] is not None else ""
+        return f"http {data[0]} {urlsplit(data[1]).path}{body}"
+    if kind == "resp":
+        return f"resp {data[0]} ({len(data[1] or '')} bytes)"
+    return " ".join([kind] + [str(d) for d in data])
+
+VOTE_KEY = re.compile(r"^\d{4}-\d\d-\d\dT\d\d-\d\d-\d\d(_\d+)?_")  # "<timestamp>_" of vote_store.vote_key()
+
+def normalize_path(path):  # vote_shards/2026-10-19T08/booth1/2026-10-19T08-..._5 -> vote_shards/<hour>/<booth>/<ts>_5
+    parts = path.split("/")
+    if parts[0] in ("vote_shards", "vote_index") and len(parts) >= 3:
+        parts[1:3] = ["<hour>", "<booth>"]
+        if len(parts) > 3:
+            parts[3] = VOTE_KEY.sub("<ts>_", parts[3])
+    return "/".join(parts)
+
+def normalize(body):  # Vote bodies carry the wall time and the booth name, which differ on replay
+    if isinstance(body, list):
+        return [normalize(v) for v in body]
+    if not isinstance(body, dict):
+        return body
+    out = {}
+    for k, v in body.items():
+        if k == "timestamp":
+            continue
+        if k in ("hour", "booth"):  # voted/<id> marker and vote records
+            v = f"<{k}>"
+        elif k == "key" and isinstance(v, str):
+            v = VOTE_KEY.sub("<ts>_", v)
+        out[normalize_path(k)] = normalize(v)
+    return out
+
+def request_body(request):  # JSON body of a requests.PreparedRequest, or None
+    if not request.body:
+        return None
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        return request.body.decode(errors="replace") if isinstance(request.body, bytes) else str(request.body)
+
+# -----------------------------
+# Recording
+# -----------------------------
+class TracingPort:
+    """Wraps an open serial port and traces every line written and read."""
+
+    def __init__(self, ser, log):
+        self.__dict__.update(ser=ser, log=log, partial=b"")
+
+    def __getattr__(self, name):  # in_waiting, is_open, fileno, ...
+        return getattr(self.ser, name)
+
+    def __setattr__(self, name, value):  # timeout
+        setattr(self.ser, name, value)
+
+    def write(self, data):
+        for line in data.decode(errors="ignore").splitlines():
+            if line.strip():
+                self.log("tx", line.strip())
+        try:
+            return self.ser.write(data)
+        except OSError as e:
+            self.log("unplug", str(e))
+            raise
+
+    def readline(self):
+        try:
+            raw = self.ser.readline()
+        except OSError as e:
+            self.log("unplug", str(e))
+            raise
+        data = self.partial + raw  # SerialSession keeps its own copy of a cut-off line
+        while b"\n" in data:
+            line, data = data.split(b"\n", 1)
+            if line.strip():
+                self.log("rx", line.decode(errors="ignore").strip())
+        self.__dict__["partial"] = data
+        return raw
+
+class TracingAdapter:
+    """requests transport adapter that traces each request and its response."""
+
+    def __init__(self, inner, log):
+        self.inner = inner  # The session's HTTPAdapter
+        self.log = log
+        self.bodies = {}  # (method, URL) -> last response body, for deltas
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self.lock:  # Keeps each request next to its response in the trace
+            self.log("http", request.method, request.url, request_body(request))
+            try:
+                response = self.inner.send(request, **kwargs)
+            except Exception as e:
+                self.log("resp", None, str(e))
+                raise
+            key = (request.method, request.url)
+            text, last = response.text, self.bodies.get(key, "")
+            keep = len(os.path.commonprefix([last, text]))
+            self.bodies[key] = text
+            self.log("resp", response.status_code, {"keep": keep, "add": text[keep:]} if keep >= DELTA_MIN else text)
+            return response
+
+    def close(self):
+        self.inner.close()
+
+class Recorder:
+    """Trace hooks for a live booth (EVM_TRACE=path)."""
+
+    def __init__(self, path):
+        from vote_store import BOOTH  # Import the shard name this booth writes votes under
+        self.writer = TraceWriter(path)
+        config = {k: v for k, v in os.environ.items() if k.startswith("EVM_") and k != "EVM_TRACE"}
+        self.writer.log("start", {"script": os.path.basename(sys.argv[0]), "env": config, "booth": BOOTH})
+        print(f"📼 Recording session trace to {path}")
+
+    def log(self, kind, *data):
+        self.writer.log(kind, *data)
+
+    def serial(self, session):  # ReconnectingSession: trace every port it opens
+        opener = session.opener
+
+        def open_traced():
+            port = opener()
+            self.log("open", getattr(port, "port", None))
+            return TracingPort(port, self.log)
+        session.opener = open_traced
+
+    def http(self, session):  # requests.Session used for Firebase
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, TracingAdapter(session.get_adapter(prefix), self.log))
+
+    def tk(self, root, ballot_view):  # Only the replayer needs the window
+        pass
+
+# -----------------------------
+# Replay
+# -----------------------------
+class ReplayArduino(SimulatedArduino):
+    """Simulated port whose replies come from the trace instead of simulated firmware."""
+
+    def __init__(self, replayer):
+        super().__init__(ready_delay=None)  # The recorded FINGERPRINT_READY is replayed instead
+        self.replayer = replayer
+
+    def _handle(self, command):
+        self.commands.append(command)
+        self.replayer.log("tx", command)
+
+class ReplayAdapter:
+    """requests transport adapter that answers from the trace."""
+
+    def __init__(self, replayer):
+        self.replayer = replayer
+
+    def send(self, request, **kwargs):
+        import requests  # Import requests for the response type (already loaded by the booth)
+        self.replayer.log("http", request.method, request.url, request_body(request))
+        status, text = self.replayer.responses.get()
+        if status is None:
+            raise requests.ConnectionError(text)
+        response = requests.models.Response()
+        response.status_code, response._content, response.encoding = status, text.encode(), "utf-8"
+        response.url, response.request = request.url, request
+        return response
+
+    def close(self):
+        pass
+
+class Replayer:
+    """Feeds a trace to a booth running in this process and checks its outputs."""
+
+    def __init__(self, path, speed=1.0, out=None):
+        self.events = read_trace(path)
+        self.header = self.events[0][2] if self.events and self.events[0][1] == "start" else {}
+        self.speed = speed
+        self.writer = TraceWriter(out) if out else None
+        self.t0 = time.monotonic()
+        self.record = []  # This run as trace events, for reaction times
+        self._cond = threading.Condition()
+        self.observed = deque()  # (monotonic, kind, data) outputs not matched yet
+        self.notes = []  # Buzzer commands of this run
+        self.opens = self.opened = 0  # Board appearances replayed / taken by the booth
+        self.port = None  # Current ReplayArduino
+        self.responses = queue.Queue()  # (status, text) for ReplayAdapter
+        self.root = self.view = None
+        self.calls = queue.Queue()  # Functions for the Tk thread
+        self.waker = None
+        self.pins = {}  # Button name -> GPIO for replayed edges
+        self.pressed_at = {}
+        self.last_pair = None  # (tx data, [(delay, reply), ...]) of the last matched command
+        self.elastic = 0  # Polls added or dropped to follow the booth's timing
+        self.skipped = 0  # Inputs without a replay target (keypad keys)
+        self.failure = None
+        self.stopping = False
+        self.done = threading.Event()
+
+    # Hooks called by the booth (same as Recorder)
+    def log(self, kind, *data):
+        if kind in INPUTS:  # A replayed tap reaching record_vote(); already recorded when injected
+            return
+        at = time.monotonic()
+        self._record(kind, data, at)
+        if kind in NOTES:
+            self.notes.append([kind, *data])
+            return
+        with self._cond:
+            self.observed.append((at, kind, list(data)))
+            self._cond.notify_all()
+
+    def serial(self, session):
+        session.opener = self._open_port
+
+    def http(self, session):
+        for prefix in ("https://", "http://"):
+            session.mount(prefix, ReplayAdapter(self))
+
+    def tk(self, root, ballot_view):  # ballot_view() returns the shown BallotView or None
+        self.root, self.view = root, ballot_view
+        self.waker = Waker()
+        self.waker.attach(root, lambda reason, since: self._run_calls())
+
+    def _open_port(self):  # Blocks until the trace plugs the board in
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.opens > self.opened or self.stopping, OUTPUT_WAIT):
+                raise OSError("No board in the trace yet")
+            if self.stopping:
+                raise OSError("Replay finished")
+            self.opened += 1
+            self.port = ReplayArduino(self)
+            self._cond.notify_all()
+            return self.port
+
+    def _record(self, kind, data, at):
+        self.record.append([round((at - self.t0) * 1000, 1), kind, *data])
+        if self.writer:
+            self.writer.log(kind, *data, at=at)
+
+    def _run_calls(self):  # Tk thread
+        while True:
+            try:
+                self.calls.get_nowait()()
+            except queue.Empty:
+                return
+
+    def _in_tk(self, fn):
+        self.calls.put(fn)
+        self.waker.set("replay")
+
+    # Driver thread
+    def run(self):
+        try:
+            self._drive()
+        except Exception as e:  # Report instead of hanging the booth
+            self.failure = self.failure or f"replay error: {e!r}"
+        finally:
+            self._finish()
+
+    def _drive(self):
+        events, i, at = self.events, 0, self.t0
+        while i < len(events) and self.failure is None and not self.stopping:
+            event = events[i]
+            gap = (event[0] - (events[i - 1][0] if i else 0)) / 1000
+            if event[1] in OUTPUTS:
+                i, at = self._expect(i, gap)
+            elif event[1] in INPUTS:
+                at = self._wait_until(at + gap / self.speed, event)
+                self._inject(event[1], event[2:])
+                i += 1
+            else:  # start header, buzzer notes
+                i += 1
+
+    def _wait_until(self, target, event):
+        if event[1] == "btn" and not event[3]:  # Release: hold long enough for the booth to poll the button
+            target = max(target, self.pressed_at.get(event[2], 0) + BUTTON_HOLD)
+        delay = target - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return time.monotonic()
+
+    def _inject(self, kind, data):
+        at = time.monotonic()
+        if kind == "open":
+            with self._cond:
+                self.opens += 1
+                self._cond.notify_all()
+        elif kind == "rx":
+            self._wait_port().emit(data[0])
+        elif kind == "unplug":
+            port, self.port = self._wait_port(), None
+            port.unplug()
+        elif kind == "resp":
+            self.responses.put(tuple(data))
+        elif kind == "btn":
+            pin = self.pins.get(data[0])
+            if pin is None:  # Keypad key or unknown button
+                self.skipped += 1
+                return
+            from gpiozero import Device  # Import gpiozero for the mock pins the booth is using
+            self.pressed_at[data[0]] = at
+            Device.pin_factory.pin(pin).drive_low() if data[1] else Device.pin_factory.pin(pin).drive_high()
+        elif kind == "tap":
+            self._in_tk(lambda: self._tap(data[0], time.monotonic() + OUTPUT_WAIT))
+        self._record(kind, data, at)
+
+    def _tap(self, name, deadline):  # Tk thread: select once the ballot is on screen
+        view = self.view()
+        if view is not None:
+            view.select(name)
+        elif time.monotonic() < deadline:
+            self.root.after(10, self._tap, name, deadline)
+
+    def _wait_port(self):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.port is not None or self.stopping, OUTPUT_WAIT):
+                raise RuntimeError("booth never opened the serial port")
+            return self.port
+
+    def _take(self, kind, timeout):  # Oldest unmatched output of one channel
+        with self._cond:
+            found = self._cond.wait_for(lambda: self.stopping or any(o[1] == kind for o in self.observed), timeout)
+            if not found or self.stopping:
+                return None
+            for output in self.observed:
+                if output[1] == kind:
+                    self.observed.remove(output)
+                    return output
+
+    def _replies(self, i):  # [(delay s, line), ...] recorded right after command i
+        replies, j = [], i + 1
+        while j < len(self.events) and self.events[j][1] == "rx":
+            replies.append(((self.events[j][0] - self.events[i][0]) / 1000, self.events[j][2]))
+            j += 1
+        return replies
+
+    def _expect(self, i, gap):  # Wait for recorded output i; returns (next index, time seen)
+        events, event = self.events, self.events[i]
+        kind, data = event[1], event[2:]
+        timeout = OUTPUT_WAIT + (2 * gap / self.speed if self.speed != float("inf") else 0)
+        while True:
+            output = self._take(kind, timeout)
+            if output is None:
+                self.failure = self.failure or f"event {i}: booth never sent {describe(event)}"
+                return i + 1, time.monotonic()
+            at, got = output[0], output[2]
+            if same(kind, data, got):
+                if kind == "tx":
+                    self.last_pair = (data, self._replies(i))
+                return i + 1, at
+            if kind == "tx" and self.last_pair and got == self.last_pair[0]:  # Booth polled once more than recorded
+                self.elastic += 1
+                start = time.monotonic()
+                for delay, line in self.last_pair[1]:
+                    time.sleep(max(0.0, start + delay / self.speed - time.monotonic()))
+                    self._wait_port().emit(line)
+                    self._record("rx", [line], time.monotonic())
+                continue
+            if kind == "tx" and self.last_pair:  # Recorded polls the booth did not repeat
+                j = i
+                while (j < len(events) and events[j][1] == "tx" and events[j][2:] == self.last_pair[0]
+                       and [r for _, r in self._replies(j)] == [r for _, r in self.last_pair[1]]):
+                    j += 1 + len(self._replies(j))
+                if j != i and j < len(events) and events[j][1] == "tx" and same(kind, events[j][2:], got):
+                    self.elastic += 1
+                    self.last_pair = (got, self._replies(j))
+                    return j + 1, at
+            self.failure = f"event {i}: expected {describe(event)}, booth sent {describe([0, kind, *got])}"
+            return i + 1, at
+
+    def _finish(self):
+        expected = [e[1:] for e in self.events if e[1] in NOTES]
+        deadline = time.monotonic() + 3.0  # Buzzer timers may still be running
+        while len(self.notes) < len(expected) and time.monotonic() < deadline and self.failure is None:
+            time.sleep(0.05)
+        if self.failure is None and self.notes != expected:
+            self.failure = f"buzzer: expected {len(expected)} commands, booth sent {len(self.notes)}"
+        with self._cond:
+            self.stopping = True
+            self._cond.notify_all()
+        self.responses.put((None, "replay finished"))
+        if self.root is not None:
+            self._in_tk(self.root.quit)
+        self.done.set()
+
+    def report(self):
+        recorded = self.events[-1][0] / 1000 if self.events else 0
+        replayed = time.monotonic() - self.t0
+        speed = "max" if self.speed == float("inf") else f"{self.speed:g}x"
+        print(f"▶️ Replayed {len(self.events)} events in {replayed:.1f} s (recorded {recorded:.1f} s, speed {speed})")
+        if self.elastic:
+            print(f"   {self.elastic} CHECK polls added or dropped to follow the booth's timing")
+        if self.skipped:
+            print(f"   {self.skipped} inputs skipped (keypad keys have no mock pin)")
+        print_reactions([("recorded", reactions(self.events)), ("replay", reactions(self.record))])
+        if self.failure:
+            print(f"❌ Diverged: {self.failure}")
+        else:
+            print("✅ Booth produced the recorded outputs")
+
+def same(kind, expected, got):  # Does an output match the recorded one?
+    if kind != "http":
+        return list(expected) == list(got)
+    return (expected[0] == got[0] and urlsplit(expected[1]).path == urlsplit(got[1]).path
+            and normalize(expected[2]) == normalize(got[2]))
+
+_active = None  # Recorder or Replayer for this process
+
+def active():  # Trace hooks for voting6.py: replayer, recorder for EVM_TRACE, or None
+    global _active
+    if _active is None and os.environ.get("EVM_TRACE"):
+        if os.path.exists(PUBLIC_KEY_FILE):  # A trace would pair every voter with their choice
+            print("❌ EVM_TRACE ignored: ballot encryption is on and a trace would reveal every vote")
+            return None
+        _active = Recorder(os.environ["EVM_TRACE"])
+    return _active
+
+def replay(path, speed, out=None, display=None, script="voting6.py"):  # Run the booth under a trace
+    import runpy  # Import runpy to start the booth script in this process
+    import shutil  # Import shutil for the ballot files
+    import subprocess  # Import subprocess for Xvfb
+    import tempfile  # Import tempfile for the working directory
+    global _active
+    replayer = Replayer(path, speed, out and os.path.abspath(out))
+    env = dict(replayer.header.get("env", {}))
+    scale = speed if speed != float("inf") else MAX_SPEED_TIMERS
+    for name, default in TIMERS.items():  # Dwell screens and idle mode at the replay speed
+        value = float(env.get(name, default)) / scale
+        env[name] = str(round(value)) if name.endswith("_MS") else f"{value:g}"
+    env.pop("EVM_TRACE", None)
+    if replayer.header.get("booth"):  # Same shard name as the recording machine, whatever this hostname is
+        env.setdefault("EVM_BOOTH", replayer.header["booth"])
+    os.environ.update(env, GPIOZERO_PIN_FACTORY="mock")  # Buttons and buzzer on gpiozero mock pins
+
+    with open(os.path.join(REPO, "candidates.json")) as f:
+        candidates = json.load(f)
+    replayer.pins = {c["name"]: c["gpio"] for c in candidates if c.get("gpio") is not None}
+    if env.get("EVM_TOUCH_GPIO"):
+        replayer.pins["touch"] = int(env["EVM_TOUCH_GPIO"])
+    work = tempfile.mkdtemp(prefix="evm-replay-")  # votes.csv, vote log and state file go here
+    shutil.copy(os.path.join(REPO, "candidates.json"), work)
+    for name in [c.get("image") for c in candidates]:  # Never the ballot key: traces come from plaintext booths
+        if name and os.path.exists(os.path.join(REPO, name)):
+            shutil.copy(os.path.join(REPO, name), work)
+
+    xvfb = None
+    if display:
+        os.environ["DISPLAY"] = display
+    elif not os.environ.get("DISPLAY"):
+        xvfb = subprocess.Popen(["Xvfb", ":99", "-screen", "0", "800x500x24", "-ac", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.environ["DISPLAY"] = ":99"
+        time.sleep(1.0)
+    _active = replayer
+    driver = threading.Thread(target=replayer.run, name="replay", daemon=True)
+    driver.start()
+    os.chdir(work)
+    sys.path.insert(0, REPO)
+    try:
+        runpy.run_path(os.path.join(REPO, script), run_name="__main__")  # Returns when the replay quits Tk
+    except SystemExit:
+        pass
+    finally:
+        if not replayer.done.is_set():  # Booth ended on its own
+            replayer.failure = replayer.failure or "booth exited before the end of the trace"
+            replayer._finish()
+        if xvfb:
+            xvfb.terminate()
+        if replayer.writer:
+            replayer.writer.close()
+    replayer.report()
+    print(f"Work directory: {work}")
+    return replayer.failure is None
+
+# -----------------------------
+# Reaction times
+# -----------------------------
+def label(event):  # Output grouped for reaction times: "tx CHECK", "http GET /voters/<id>.json"
+    if event[1] == "http":
+        return f"http {event[2]} " + re.sub(r"/\d+(?=[./]|$)", "/<id>", urlsplit(event[3]).path)
+    return f"tx {event[2].split(':', 1)[0]}"
+
+def reactions(events):  # Label -> [ms from the last input to the booth's output]
+    found, last_input = {}, None
+    for event in events:
+        if event[1] in INPUTS:
+            last_input = event[0]
+        elif event[1] in OUTPUTS and last_input is not None:
+            found.setdefault(label(event), []).append(event[0] - last_input)
+    return found
+
+def print_reactions(runs):  # [(name, reactions), ...] side by side
+    def summary(values):
+        if not values:
+            return "-"
+        values = sorted(values)
+        return f"n={len(values)} {values[len(values) // 2]:.0f}/{values[int(len(values) * 0.95)]:.0f}/{values[-1]:.0f}"
+    print("   booth reaction, ms p50/p95/max: " + " | ".join(name for name, _ in runs))
+    for key in sorted(set().union(*(r for _, r in runs))):
+        print(f"     {key:<28} " + " | ".join(f"{summary(r.get(key, [])):<24}" for _, r in runs))
+
+# -----------------------------
+# Command line
+# -----------------------------
+def parse_speed(text):
+    return float("inf") if text == "max" else float(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay and inspect booth session traces.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_replay = sub.add_parser("replay", help="run voting6.py against a recorded trace")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--speed", type=parse_speed, default=1.0, help="1, 100, ... or max")
+    p_replay.add_argument("--out", help="write this run as a trace too (for stats)")
+    p_replay.add_argument("--display", help="use this X display instead of starting Xvfb")
+    p_stats = sub.add_parser("stats", help="booth reaction times of one or more traces")
+    p_stats.add_argument("traces", nargs="+")
+    p_show = sub.add_parser("show", help="print a trace")
+    p_show.add_argument("trace")
+    p_show.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.cmd == "replay":
+        raise SystemExit(0 if replay(args.trace, args.speed, args.out, args.display) else 1)
+    if args.cmd == "stats":
+        runs = []
+        for path in args.traces:
+            events = read_trace(path)
+            print(f"{path}: {len(events)} events over {events[-1][0] / 1000 if events else 0:.1f} s")
+            runs.append((os.path.basename(path), reactions(events)))
+        print_reactions(runs)
+        return
+    for event in read_trace(args.trace)[:args.limit]:
+        print(f"{event[0] / 1000:10.3f}  {describe(event)}")
+
+if __name__ == "__main__":
+    main()
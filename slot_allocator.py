@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Fingerprint Slot Allocator for EVM
+Hands out free sensor slots for enrollment, so the operator never types an ID.
+One INDEX command returns the sensor's occupied-slot bitmap (embedded.ino reads
+the FPM10A index table) and one shallow GET returns the voter IDs in Firebase.
+A slot is free only when both sides say it is empty, so an allocation can never
+overwrite a template or a voter record. Slots used on one side only are
+reported:
+
+    orphan templates   on the sensor, no voter in Firebase (the save failed)
+    missing templates  voter in Firebase, no template (restore with template_backup.py)
+
+The bitmap is cached: allocate() pops the lowest free slot without talking to
+the sensor, and confirm()/release() keep the cache current as enrollments
+succeed or fail. When ENROLL times out the firmware may still store the
+template, so settle() keeps the slot reserved until an INDEX read shows whether
+it did (a failed read leaves it reserved until the next refresh()). The voter
+record is claimed with a conditional PUT (Firebase ETag, if-match) before the
+finger is enrolled, so two enrollment stations cannot take the same ID.
+
+    allocator = SlotAllocator(sensor, requests.Session())
+    allocator.refresh()
+    fid = allocator.claim_next("Alice")     # voters/<fid> now exists
+    ... ENROLL:<fid> ... allocator.confirm(fid), allocator.release(fid) or allocator.settle(fid)
+
+Run with: python3 slot_allocator.py [--port /dev/ttyACM0 | --port sim]   # slot report
+"""
+
+import argparse  # Import argparse for the command line
+import heapq  # Import heapq for lowest-free-slot order
+import os  # Import os for the database URL
+from serial_session import SerialSession, SensorError  # Import blocking serial session for Arduino
+
+DB_URL = os.environ.get("EVM_DB_URL", "https://e-vm-f7bdf-default-rtdb.firebaseio.com")  # Firebase database URL
+VOTERS_NODE = "voters"  # Node for storing voter information
+
+def parse_index(reply):  # "INDEX:<capacity>:<hex>" -> (capacity, {occupied slots})
+    _, capacity, hexbits = reply.split(":")
+    capacity, bits = int(capacity), bytes.fromhex(hexbits)
+    return capacity, {8 * i + b for i, byte in enumerate(bits) for b in range(8) if byte >> b & 1 and 8 * i + b < capacity}
+
+class SlotAllocator:
+    """Free enrollment slots, agreed between the sensor's index table and Firebase."""
+
+    def __init__(self, sensor, session, url=DB_URL):
+        self.sensor = sensor
+        self.session = session
+        self.url = url
+        self.capacity = 0
+        self.on_sensor = set()  # Slots holding a template
+        self.in_firebase = set()  # Voter IDs with a record
+        self.claimed = set()  # Records this allocator created and may delete again
+        self.reserved = set()  # Handed out, enrollment not finished
+        self.unsettled = set()  # Enrollment timed out; the next INDEX read tells whether it was stored
+        self.free = []  # Heap of free slots
+
+    # -- reading both sides --
+    def read_index(self, timeout=None):  # (capacity, occupied slots) from one INDEX command
+        reply = self.sensor.request("INDEX", timeout=timeout)
+        if reply is None or not reply.startswith("INDEX:"):
+            raise SensorError(f"No index table from the sensor ({reply or 'timeout'})")
+        return parse_index(reply)
+
+    def read_voters(self):  # Voter IDs in Firebase, keys only
+        res = self.session.get(f"{self.url}/{VOTERS_NODE}.json", params={"shallow": "true"}, timeout=10)
+        res.raise_for_status()
+        data = res.json() or {}
+        if isinstance(data, list):  # Firebase returns a list for small numeric keys
+            return {fid for fid, voter in enumerate(data) if voter}
+        return {int(fid) for fid in data if fid.isdigit()}
+
+    def refresh(self, timeout=None):
+        """Reload both sides and rebuild the free list; returns the number of free slots."""
+        self.capacity, self.on_sensor = self.read_index(timeout)
+        self.in_firebase = self.read_voters()
+        for fid in sorted(self.unsettled):  # Timed-out enrollments: the index table says how they ended
+            self.confirm(fid) if fid in self.on_sensor else self.release(fid)
+        self.unsettled.clear()
+        used = self.on_sensor | self.in_firebase | self.reserved
+        self.free = [fid for fid in range(1, self.capacity) if fid not in used]  # Slot 0 is never enrolled
+        heapq.heapify(self.free)
+        return len(self.free)
+
+    def orphans(self):  # Templates without a voter
+        return sorted(self.on_sensor - self.in_firebase - self.reserved)
+
+    def missing(self):  # Voters without a template
+        return sorted(self.in_firebase - self.on_sensor - self.reserved)
+
+    def problem(self, fid):  # Why a hand-picked ID must not be enrolled, or None
+        if not 0 < fid < self.capacity:
+            return f"outside the sensor's 1-{self.capacity - 1}"
+        if fid in self.on_sensor:
+            return "already holds a template"
+        if fid in self.in_firebase:
+            return "already belongs to a voter in Firebase"
+        if fid in self.reserved:
+            return "is being enrolled"
+        return None
+
+    # -- allocation --
+    def reserve(self, fid):  # Hand-picked slot (ENROLL:<id>); returns the problem or None
+        problem = self.problem(fid)
+        if problem is None:
+            self.reserved.add(fid)
+        return problem
+
+    def allocate(self):  # Lowest free slot from the cache, or None when the sensor is full
+        while self.free:
+            fid = heapq.heappop(self.free)
+            if self.problem(fid) is None:
+                self.reserved.add(fid)
+                return fid
+        return None
+
+    def claim(self, fid, name):  # Create voters/<fid> only if it does not exist yet
+        """Conditional PUT; returns False when another station already took the ID."""
+        url = f"{self.url}/{VOTERS_NODE}/{fid}.json"
+        res = self.session.get(url, headers={"X-Firebase-ETag": "true"}, timeout=10)
+        res.raise_for_status()
+        if res.json() is None:
+            res = self.session.put(url, json={"name": name}, headers={"if-match": res.headers.get("ETag", "")},
+                                   timeout=10)
+            if res.status_code == 200:
+                self.in_firebase.add(fid)
+                self.claimed.add(fid)
+                return True
+            if res.status_code != 412:  # 412: written by someone else in between
+                res.raise_for_status()
+        self.in_firebase.add(fid)  # Taken elsewhere; never hand it out again
+        self.reserved.discard(fid)
+        return False
+
+    def claim_next(self, name):  # Allocate and claim; returns the slot or None when full
+        while (fid := self.allocate()) is not None:
+            if self.claim(fid, name):
+                return fid
+        return None
+
+    def confirm(self, fid):  # Template stored at fid
+        self.reserved.discard(fid)
+        self.claimed.discard(fid)
+        self.on_sensor.add(fid)
+
+    def release(self, fid):  # Enrollment failed: drop our record and free the slot again
+        self.reserved.discard(fid)
+        if fid in self.claimed:
+            self.session.delete(f"{self.url}/{VOTERS_NODE}/{fid}.json", timeout=10)
+            self.claimed.discard(fid)
+            self.in_firebase.discard(fid)
+        if self.problem(fid) is None:
+            heapq.heappush(self.free, fid)
+
+    def settle(self, fid, timeout=30):  # ENROLL timed out: the firmware may still be storing the template
+        """Keep fid reserved until INDEX answers (after the enrollment ends); True if the template was stored."""
+        self.unsettled.add(fid)
+        self.refresh(timeout)  # Raises on failure; fid then stays reserved until the next refresh()
+        return fid in self.on_sensor
+
+    def reset(self):  # After DELETE_ALL wiped the sensor and the voters node
+        self.on_sensor.clear()
+        self.unsettled.clear()
+        self.in_firebase.clear()
+        self.claimed.clear()
+        self.reserved.clear()
+        self.free = list(range(1, self.capacity))
+
+def print_report(allocator):  # Slot summary after refresh()
+    print(f"📋 {len(allocator.on_sensor)} templates on the sensor, {len(allocator.in_firebase)} voters in Firebase, "
+          f"{len(allocator.free)} of {allocator.capacity - 1} slots free")
+    if allocator.orphans():
+        print(f"⚠️  Templates without a voter: {', '.join(map(str, allocator.orphans()))}")
+    if allocator.missing():
+        print(f"⚠️  Voters without a template: {', '.join(map(str, allocator.missing()))} (template_backup.py restore)")
+    if allocator.free:
+        print(f"✅ Next enrollment gets ID {min(allocator.free)}")
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Report free and inconsistent fingerprint slots.")
+    parser.add_argument("--port", default="/dev/ttyACM0", help="Arduino port, or 'sim'")
+    parser.add_argument("--url", default=DB_URL, help="Firebase database URL")
+    args = parser.parse_args()
+
+    import requests  # Import requests for Firebase API
+    if args.port == "sim":
+        from arduino_sim import SimulatedArduino  # Import simulated Arduino
+        sensor = SerialSession(ser=SimulatedArduino(enrolled=range(1, 21)))
+    else:
+        sensor = SerialSession(args.port).open()
+    sensor.wait_ready()
+    allocator = SlotAllocator(sensor, requests.Session(), args.url)
+    allocator.refresh()
+    print_report(allocator)
+    sensor.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Soak Test for the EVM booth
+Runs the booth in this process under Xvfb with the simulated Arduino and a
+local stand-in for Firebase, then pushes thousands of voters through the real
+GUI: finger on the sensor, ballot drawn, a card tapped, vote recorded, back to
+the start screen.
+
+    --booth voting6   the production booth (default). It is started with runpy,
+                      like a session_trace.py replay, and gets the simulated
+                      Arduino, the local Firebase and its window through the
+                      same hooks. The driver runs from Tk timers, because
+                      voting6.py owns the main loop.
+    --booth voting7   imported as a module and driven from its asyncio loop
+
+The nine simulated fingers stand for new voters every time, so voting7's
+record of local voters is cleared before each finger. Every --sample voters it
+records:
+
+    RSS, tracemalloc total, Tk widgets, Tk images, open fds, sockets, threads,
+    seconds per voter
+
+After a warm-up the growth per voter is fitted with least squares. The run
+fails (exit code 1) if any count that should be flat keeps growing, or if
+memory grows faster than --max-bytes-per-voter. The top allocators by growth
+since the warm-up are printed, and all samples are written to a CSV file.
+
+Run with: python3 soak_test.py [--booth voting6|voting7] [--voters 10000] [--sample 250] [--display :99]
+(needs Xvfb unless --display points at a running X server)
+"""
+
+import argparse  # Import argparse for the command line
+import asyncio  # Import asyncio to run voting7 and the driver together
+import contextlib  # Import contextlib for quiet output
+import csv  # Import csv for the samples file
+import json  # Import json for the fake Firebase
+import os  # Import os for fds and the working directory
+import random  # Import random for voters and choices
+import shutil  # Import shutil for copying the ballot files
+import subprocess  # Import subprocess for Xvfb
+import sys  # Import sys for the import path
+import tempfile  # Import tempfile for the working directory
+import threading  # Import threading for the fake Firebase
+import time  # Import time for cycle timing
+import tracemalloc  # Import tracemalloc for Python allocations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Import http.server for the fake Firebase
+from urllib.parse import urlsplit  # Import urlsplit to redirect voting6's Firebase URL
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+FLAT = ("widgets", "images", "fds", "sockets", "threads")  # Must not grow at all after warm-up
+
+# -----------------------------
+# Local stand-in for Firebase
+# -----------------------------
+class FakeFirebase(BaseHTTPRequestHandler):
+    """Answers the booth's REST calls; votes are counted but never reported back."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, like Firebase
+    votes = 0
+
+    def _reply(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/voters.json":
+            self._reply({str(i): {"name": f"Voter {i}"} for i in range(1, 10)})
+        elif path.startswith("/voters/"):
+            self._reply({"name": "Voter"})
+        else:
+            self._reply(None)  # No voted/<id> marker: every cycle reaches the ballot
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        FakeFirebase.votes += 1
+        self._reply({"name": f"-soak{FakeFirebase.votes}"})
+
+    do_PUT = do_PATCH = do_POST
+
+    def log_message(self, *args):
+        pass
+
+# -----------------------------
+# Measurements
+# -----------------------------
+def rss_kb():  # Resident set size of this process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+def fd_counts():  # (open fds, sockets)
+    fds = os.listdir("/proc/self/fd")
+    sockets = 0
+    for fd in fds:
+        try:
+            sockets += os.readlink(f"/proc/self/fd/{fd}").startswith("socket:")
+        except OSError:  # Closed while listing
+            pass
+    return len(fds), sockets
+
+def sample(root, voters, cycle_s):
+    fds, sockets = fd_counts()
+    return {
+        "voters": voters,
+        "rss_kb": rss_kb(),
+        "traced_kb": tracemalloc.get_traced_memory()[0] // 1024,
+        "widgets": count_widgets(root),
+        "images": len(root.tk.call("image", "names")),  # Leaked PhotoImages stay registered here
+        "fds": fds,
+        "sockets": sockets,
+        "threads": threading.active_count(),
+        "cycle_ms": round(cycle_s * 1000, 1),
+    }
+
+def slope(points):  # Least-squares growth per voter
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    var = sum((x - mx) ** 2 for x, _ in points)
+    return sum((x - mx) * (y - my) for x, y in points) / var if var else 0.0
+
+# -----------------------------
+# Booths
+# -----------------------------
+class Voting7Target:
+    """voting7.py imported as a module."""
+
+    def __init__(self, booth):
+        self.booth = booth
+        self.root = booth.display.root
+
+    def ready(self):
+        return self.booth.scan_task is not None
+
+    def place_finger(self, fid):
+        self.booth.voted_here.clear()  # A new voter, whichever of the nine fingers is used
+        self.booth.sensor.ser.place_finger(fid)
+
+    def ballot_view(self):
+        return self.booth.ballot_view
+
+    def votes(self):
+        return self.booth.chain.size
+
+def local_adapter(base_url):  # Sends voting6's hard-wired Firebase URL to the local stand-in
+    from requests.adapters import HTTPAdapter  # Import HTTPAdapter for the redirect
+
+    class LocalAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+            return super().send(request, **kwargs)
+    return LocalAdapter()
+
+class Voting6Target:
+    """voting6.py run with runpy; it calls these hooks like it calls a session_trace.py replayer."""
+
+    def __init__(self, base_url):
+        from arduino_sim import SimulatedArduino  # Import simulated Arduino for the sensor
+        self.board = SimulatedArduino(enrolled=range(1, 10))
+        self.base_url = base_url
+        self.root = None
+        self.ballot_view = lambda: None
+        self.on_window = None  # Called once the window exists
+
+    # Hooks called by voting6.py
+    def log(self, kind, *data):
+        pass
+
+    def serial(self, session):
+        session.opener = lambda: self.board
+
+    def http(self, session):
+        session.mount("https://", local_adapter(self.base_url))
+
+    def tk(self, root, ballot_view):
+        self.root, self.ballot_view = root, ballot_view
+        self.on_window()
+
+    # Driver side
+    def ready(self):
+        return True  # The first finger waits in the simulator until voting6 sends CHECK
+
+    def place_finger(self, fid):
+        self.board.place_finger(fid)
+
+    def votes(self):
+        return os.path.getsize("votes.csv") if os.path.exists("votes.csv") else 0
+
+# -----------------------------
+# Driver
+# -----------------------------
+def voter_steps(target, args, samples, log):  # Yields (condition, timeout, what) to wait for; returns the snapshot
+    yield target.ready, 30, "booth startup"
+    warmup_snapshot = None
+    start = time.monotonic()
+    for voter in range(1, args.voters + 1):
+        votes_before = target.votes()
+        target.place_finger(random.randint(1, 9))  # Voter puts a finger on the sensor
+        yield (lambda: target.ballot_view() is not None), 30 if voter == 1 else 10, f"ballot (voter {voter})"
+        view = target.ballot_view()
+        cards = [card for card in view.cards if card[0].winfo_manager()]  # Cards shown on this page
+        picture = random.choice(cards)[1]
+        yield picture.winfo_ismapped, 5, f"ballot drawn (voter {voter})"
+        picture.event_generate("<Button-1>")  # Tap a candidate picture
+        yield (lambda: target.votes() > votes_before and target.ballot_view() is None), 10, f"vote (voter {voter})"
+        if voter % args.sample == 0:
+            s = sample(target.root, voter, (time.monotonic() - start) / args.sample)
+            samples.append(s)
+            log(" ".join(f"{k}={v}" for k, v in s.items()))
+            start = time.monotonic()
+            if warmup_snapshot is None and voter >= args.voters * args.warmup:
+                warmup_snapshot = tracemalloc.take_snapshot()
+    return warmup_snapshot
+
+async def wait_for(condition, timeout, what):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for {what}")
+        await asyncio.sleep(0.005)
+
+async def drive(steps):  # voting7: wait for each step on the booth's event loop
+    try:
+        while True:
+            await wait_for(*next(steps))
+    except StopIteration as e:
+        return e.value
+
+def drive_tk(root, steps, finish):  # voting6: the same steps from Tk timers; finish(snapshot, error)
+    waiting = [None]  # (condition, deadline, what)
+
+    def tick():
+        try:
+            while waiting[0] is None or waiting[0][0]():
+                condition, timeout, what = next(steps)
+                waiting[0] = (condition, time.monotonic() + timeout, what)
+            if time.monotonic() > waiting[0][1]:
+                raise TimeoutError(f"Timed out waiting for {waiting[0][2]}")
+            root.after(5, tick)
+        except StopIteration as e:
+            finish(e.value, None)
+        except Exception as e:  # Reported by run_voting6()
+            finish(None, e)
+    root.after(0, tick)
+
+def run_voting7(args, samples, log):
+    async def run():
+        stop = asyncio.Event()
+        booth_task = asyncio.ensure_future(booth.main(stop))
+        try:
+            return await drive(voter_steps(Voting7Target(booth), args, samples, log))
+        finally:
+            stop.set()
+            await booth_task
+
+    import voting7 as booth  # Creates the window and opens the logs in the work dir
+    return asyncio.run(run())
+
+def run_voting6(base_url, args, samples, log):
+    import runpy  # Import runpy to start voting6.py in this process
+    import session_trace  # Import session_trace, whose hooks voting6.py looks up at startup
+    target, outcome = Voting6Target(base_url), {}
+
+    def finish(snapshot, error):
+        outcome.update(snapshot=snapshot, error=error)
+        target.root.quit()  # voting6.py closes its logs and returns
+    target.on_window = lambda: drive_tk(target.root, voter_steps(target, args, samples, log), finish)
+    session_trace._active = target
+    try:
+        runpy.run_path(os.path.join(REPO, "voting6.py"), run_name="__main__")
+    except SystemExit:
+        pass
+    if not outcome:
+        raise TimeoutError("voting6.py exited before the last voter")
+    if outcome["error"]:
+        raise outcome["error"]
+    return outcome["snapshot"]
+
+def evaluate(samples, args):  # List of failures
+    after = [s for s in samples if s["voters"] >= args.voters * args.warmup]
+    failures = []
+    if len(after) < 3:
+        return ["Too few samples after warm-up; lower --sample"]
+    base = after[0]
+    for key in FLAT:
+        if max(s[key] for s in after) > base[key] + args.tolerance:
+            failures.append(f"{key} grew from {base[key]} to {after[-1][key]}")
+    for key in ("rss_kb", "traced_kb"):
+        per_voter = slope([(s["voters"], s[key] * 1024) for s in after])
+        print(f"{key[:-3]:>7}: {per_voter:+.0f} bytes per voter "
+              f"({base[key]} → {after[-1][key]} kB)")
+        if per_voter > args.max_bytes_per_voter:
+            failures.append(f"{key[:-3]} grows {per_voter:.0f} bytes per voter (limit {args.max_bytes_per_voter})")
+    print(f"  cycle: {base['cycle_ms']} → {after[-1]['cycle_ms']} ms per voter")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the booth GUI with simulated voters.")
+    parser.add_argument("--booth", choices=("voting6", "voting7"), default="voting6", help="booth script to soak")
+    parser.add_argument("--voters", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=250, help="voters between samples")
+    parser.add_argument("--warmup", type=float, default=0.1, help="share of the run ignored for growth")
+    parser.add_argument("--max-bytes-per-voter", type=int, default=512,
+                        help="allowed memory growth (the Merkle log keeps about 150 bytes per vote)")
+    parser.add_argument("--tolerance", type=int, default=2, help="allowed jitter in widget/fd/thread counts")
+    parser.add_argument("--display", help="use this X display instead of starting Xvfb")
+    parser.add_argument("--csv", default="soak_samples.csv")
+    parser.add_argument("--verbose", action="store_true", help="show the booth's own output")
+    args = parser.parse_args()
+
+    xvfb = None
+    if args.display:
+        os.environ["DISPLAY"] = args.display
+    else:
+        xvfb = subprocess.Popen(["Xvfb", ":99", "-screen", "0", "800x500x24", "-ac", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.environ["DISPLAY"] = ":99"
+        time.sleep(1.0)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFirebase)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    csv_path = os.path.abspath(args.csv)
+    work = tempfile.mkdtemp(prefix="evm-soak-")  # votes.csv, vote log and event log go here
+    shutil.copy(os.path.join(REPO, "candidates.json"), work)
+    with open(os.path.join(REPO, "candidates.json")) as f:
+        for c in json.load(f):
+            if c.get("image") and os.path.exists(os.path.join(REPO, c["image"])):
+                shutil.copy(os.path.join(REPO, c["image"]), work)
+    os.chdir(work)
+    os.environ.update(EVM_SENSOR_PORT="sim", EVM_UI="tk", EVM_DB_URL=f"http://127.0.0.1:{server.server_port}",
+                      EVM_DWELL_RECOGNIZED_MS="0", EVM_DWELL_THANKS_MS="0", EVM_DWELL_ALREADY_VOTED_MS="0",
+                      EVM_IDLE_AFTER_S="3600", GPIOZERO_PIN_FACTORY="mock")  # voting6: no idle mode, mock pins
+    sys.path.insert(0, REPO)
+
+    tracemalloc.start(10)
+    samples = []
+    quiet = open(os.devnull, "w")
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(quiet)
+
+    def log(text):
+        print(text, file=sys.__stdout__, flush=True)
+
+    try:
+        with output:
+            if args.booth == "voting6":
+                warmup_snapshot = run_voting6(f"http://127.0.0.1:{server.server_port}", args, samples, log)
+            else:
+                warmup_snapshot = run_voting7(args, samples, log)
+        ok = True
+    except TimeoutError as e:
+        log(f"❌ {e}")
+        warmup_snapshot, ok = None, False
+    finally:
+        server.shutdown()
+        if xvfb:
+            xvfb.terminate()
+
+    if samples:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0]))
+            writer.writeheader()
+            writer.writerows(samples)
+        print(f"Samples written to {csv_path}")
+    failures = evaluate(samples, args) if ok else ["Run did not finish"]
+    if warmup_snapshot:
+        print("Top allocators since warm-up:")
+        for stat in tracemalloc.take_snapshot().compare_to(warmup_snapshot, "lineno")[:10]:
+            print(f"  {stat}")
+    print(f"Work directory: {work}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print(f"✅ {args.voters} voters, no unbounded growth")
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Startup Profiler for EVM
+Records when each startup phase of the booth begins and ends (also from worker
+threads) and prints a timeline ending at the first interactive screen.
+Times are measured from process start (taken from /proc when available), so
+the interpreter start-up and imports are included.
+"""
+
+import os  # Import os for the process start time
+import threading  # Import threading for a lock around marks
+import time  # Import time for clocks
+
+def process_start():  # Wall-clock time the process was started
+    """Return the process start time (epoch seconds), falling back to now."""
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])  # Field 22: starttime in clock ticks
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):  # Not Linux
+        return time.time()
+
+class StartupProfiler:
+    """Collects (phase, start, end) spans relative to process start."""
+
+    def __init__(self):
+        self.t0 = process_start()  # Reference point for all spans
+        self.spans = []  # (name, start, end, thread name)
+        self.lock = threading.Lock()
+        self.reported = False
+
+    def now(self):  # Seconds since process start
+        return time.time() - self.t0
+
+    def phase(self, name):  # Context manager timing one phase
+        return _Phase(self, name)
+
+    def mark(self, name):  # Zero-length event, e.g. "first interactive screen"
+        t = self.now()
+        with self.lock:
+            self.spans.append((name, t, t, threading.current_thread().name))
+        return t
+
+    def report(self, target_name="first interactive screen"):  # Print the timeline once
+        if self.reported:
+            return
+        self.reported = True
+        print("Startup timeline (s since process start):")
+        for name, start, end, thread in sorted(self.spans, key=lambda s: s[1]):
+            length = f"{(end - start) * 1000:7.1f} ms" if end > start else "          "
+            print(f"  {start:6.3f} → {end:6.3f} {length}  {name} [{thread}]")
+        targets = [s[1] for s in self.spans if s[0] == target_name]
+        if targets:
+            print(f"⏱️ Time to {target_name}: {targets[0]:.3f}s")
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler, self.name = profiler, name
+
+    def __enter__(self):
+        self.start = self.profiler.now()
+        return self
+
+    def __exit__(self, *exc):
+        end = self.profiler.now()
+        with self.profiler.lock:
+            self.profiler.spans.append((self.name, self.start, end, threading.current_thread().name))
+        return False
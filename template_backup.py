@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Fingerprint Template Backup for EVM
+Copies enrolled fingerprint templates off the FPM10A and back onto a sensor, so
+a failed sensor or a second booth can be provisioned without re-enrolling every
+voter through finger3.py. Slot numbers are kept, so the voter IDs in Firebase
+stay valid.
+
+Templates travel over the Arduino link as one hex line each with a CRC-16
+(DUMP:<id> / LOAD:<id>:<crc> in embedded.ino) and are kept in a compact binary
+archive: 516 bytes per voter plus a SHA-256 of the whole file.
+
+Run with:
+    python3 template_backup.py backup  [--port /dev/ttyACM0] [-o templates.evmt]
+    python3 template_backup.py restore [--port /dev/ttyACM0] [-i templates.evmt] [--wipe]
+    python3 template_backup.py show    [-i templates.evmt]
+(--port sim uses the simulated Arduino)
+"""
+
+import argparse  # Import argparse for the command line
+import binascii  # Import binascii for CRC-16
+import hashlib  # Import hashlib for the archive digest
+import os  # Import os for atomic replace
+import struct  # Import struct for the binary archive
+import time  # Import time for transfer rates
+from serial_session import SerialSession, SensorError  # Import blocking serial session for Arduino
+
+ARCHIVE_FILE = "templates.evmt"  # Default template archive
+MAGIC = b"EVMT"  # Archive signature
+VERSION = 1
+TEMPLATE_SIZE = 512  # Bytes in one FPM10A template (TEMPLATE_SIZE in embedded.ino)
+RETRIES = 3  # Attempts per template before giving up on it
+
+def crc16(data):  # CRC-16/CCITT-FALSE, matches crc16() in embedded.ino
+    return binascii.crc_hqx(data, 0xFFFF)
+
+# -----------------------------
+# Archive
+# -----------------------------
+def write_archive(path, templates):  # {slot: bytes} -> file (written atomically)
+    body = bytearray(MAGIC + struct.pack(">BH", VERSION, len(templates)))
+    for fid in sorted(templates):
+        data = templates[fid]
+        body += struct.pack(">HH", fid, crc16(data)) + data
+    body += hashlib.sha256(body).digest()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read_archive(path):  # File -> {slot: bytes}, verifying digest and checksums
+    with open(path, "rb") as f:
+        blob = f.read()
+    body, digest = blob[:-32], blob[-32:]
+    if body[:4] != MAGIC or hashlib.sha256(body).digest() != digest:
+        raise ValueError(f"{path}: not a template archive or corrupted")
+    version, count = struct.unpack_from(">BH", body, 4)
+    if version != VERSION:
+        raise ValueError(f"{path}: unsupported archive version {version}")
+    templates, offset = {}, 7
+    for _ in range(count):
+        fid, crc = struct.unpack_from(">HH", body, offset)
+        data = body[offset + 4:offset + 4 + TEMPLATE_SIZE]
+        if len(data) != TEMPLATE_SIZE or crc16(data) != crc:
+            raise ValueError(f"{path}: template {fid} is damaged")
+        templates[fid] = data
+        offset += 4 + TEMPLATE_SIZE
+    return templates
+
+# -----------------------------
+# Sensor transfers
+# -----------------------------
+def list_slots(sensor):  # Occupied template slots
+    reply = sensor.request("LIST")
+    if reply is None:
+        raise SensorError("No answer to LIST")
+    return [int(x) for x in reply[6:].split(",") if x]
+
+def dump_template(sensor, fid):  # Download one template, or None
+    for _ in range(RETRIES):
+        reply = sensor.request(f"DUMP:{fid}")
+        if reply is None or not reply.startswith("TEMPLATE:"):
+            continue
+        _, rid, crc, hexdata = reply.split(":")
+        data = bytes.fromhex(hexdata) if len(hexdata) == 2 * TEMPLATE_SIZE else b""
+        if int(rid) == fid and data and crc16(data) == int(crc, 16):  # Line arrived intact
+            return data
+    return None
+
+def load_template(sensor, fid, data):  # Upload one template; True on success
+    for _ in range(RETRIES):
+        reply = sensor.request(f"LOAD:{fid}:{crc16(data):04X}", timeout=5,
+                               done=lambda line: line == "READY_LOAD" or line.startswith("LOAD_FAILED"))
+        if reply != "READY_LOAD":
+            continue
+        reply = sensor.request(data.hex().upper(), timeout=10,
+                               done=lambda line: line.startswith(("LOADED", "LOAD_FAILED")))
+        if reply == f"LOADED:{fid}":
+            return True
+    return False
+
+def backup(sensor, path):
+    slots = list_slots(sensor)
+    print(f"📋 {len(slots)} templates on the sensor")
+    templates, failed = {}, []
+    start = time.monotonic()
+    for i, fid in enumerate(slots, 1):
+        data = dump_template(sensor, fid)
+        if data is None:
+            failed.append(fid)
+        else:
+            templates[fid] = data
+        print(f"\r⬇️  {i}/{len(slots)}", end="", flush=True)
+    elapsed = time.monotonic() - start
+    print()
+    write_archive(path, templates)
+    print(f"✅ Saved {len(templates)} templates to {path} ({os.path.getsize(path)} bytes) "
+          f"in {elapsed:.1f} s ({elapsed / max(len(slots), 1):.2f} s per template)")
+    if failed:
+        print(f"❌ Could not read slots: {', '.join(map(str, failed))}")
+    return not failed
+
+def restore(sensor, path, wipe=False):
+    templates = read_archive(path)
+    if wipe:
+        if sensor.request("DELETE_ALL") != "ALL_DELETED":
+            raise SensorError("DELETE_ALL failed")
+        print("🗑️  Sensor library cleared")
+    failed = []
+    start = time.monotonic()
+    for i, fid in enumerate(sorted(templates), 1):
+        if not load_template(sensor, fid, templates[fid]):
+            failed.append(fid)
+        print(f"\r⬆️  {i}/{len(templates)}", end="", flush=True)
+    elapsed = time.monotonic() - start
+    print()
+    print(f"✅ Loaded {len(templates) - len(failed)} templates in {elapsed:.1f} s "
+          f"({elapsed / max(len(templates), 1):.2f} s per template)")
+    if failed:
+        print(f"❌ Could not write slots: {', '.join(map(str, failed))}")
+    return not failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up and restore FPM10A fingerprint templates.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_backup = sub.add_parser("backup", help="download all templates into an archive")
+    p_backup.add_argument("-o", "--output", default=ARCHIVE_FILE)
+    p_restore = sub.add_parser("restore", help="upload an archive onto a sensor")
+    p_restore.add_argument("-i", "--input", default=ARCHIVE_FILE)
+    p_restore.add_argument("--wipe", action="store_true", help="DELETE_ALL before loading")
+    p_show = sub.add_parser("show", help="verify an archive and list its slots")
+    p_show.add_argument("-i", "--input", default=ARCHIVE_FILE)
+    for p in (p_backup, p_restore):
+        p.add_argument("--port", default="/dev/ttyACM0", help="serial port, or 'sim' for the simulated Arduino")
+    args = parser.parse_args()
+
+    if args.cmd == "show":
+        templates = read_archive(args.input)
+        print(f"✅ {args.input}: {len(templates)} templates, slots {', '.join(map(str, sorted(templates)))}")
+        return
+
+    if args.port == "sim":
+        from arduino_sim import SimulatedArduino
+        sensor = SerialSession(ser=SimulatedArduino(enrolled=range(1, 21) if args.cmd == "backup" else ()))
+    else:
+        sensor = SerialSession(args.port).open()
+    try:
+        sensor.wait_ready(on_line=None)
+        ok = backup(sensor, args.output) if args.cmd == "backup" else restore(sensor, args.input, args.wipe)
+    except SensorError as e:
+        print(f"❌ {e}")
+        ok = False
+    finally:
+        sensor.close()
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Regression tests for session_trace.py: a replayed vote must match the recorded
+one although its time, hour shard and booth name differ.
+
+Run with: python3 -m unittest test_session_trace   (or python3 -m pytest test_session_trace.py)
+"""
+
+import json  # Import json for the trace lines
+import os  # Import os for paths
+import tempfile  # Import tempfile for a scratch trace
+import unittest  # Import unittest for the test cases
+
+from session_trace import Replayer, same
+from vote_store import vote_update
+
+URL = "https://example.firebaseio.com/.json"
+RECORDED = vote_update("Alice", "5", "2025-10-19T10:00:00.123456", booth="booth-a")
+
+class ReplayVoteTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "vote.trace")
+        with open(self.path, "w") as f:
+            for event in ([0, "start", {"script": "voting6.py", "env": {}, "booth": "booth-a"}],
+                          [10, "http", "PATCH", URL, RECORDED],
+                          [20, "resp", 200, "{}"]):
+                f.write(json.dumps(event) + "\n")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def replay_patch(self, body):  # Failure text of matching one booth PATCH against the trace, or None
+        replayer = Replayer(self.path, speed=float("inf"))
+        self.assertEqual(replayer.header["booth"], "booth-a")
+        replayer.log("http", "PATCH", URL, body)
+        replayer._expect(1, 0)
+        return replayer.failure
+
+    def test_vote_at_another_time_and_booth_matches(self):
+        body = vote_update("Alice", "5", "2026-10-19T18:42:07", booth="replay-host")  # No microseconds
+        self.assertTrue(same("http", ["PATCH", URL, RECORDED], ["PATCH", URL, body]))
+        self.assertIsNone(self.replay_patch(body))
+
+    def test_different_vote_diverges(self):
+        self.assertIsNotNone(self.replay_patch(vote_update("Bob", "5", "2026-10-19T18:42:07.5", booth="booth-a")))
+        self.assertIsNotNone(self.replay_patch(vote_update("Alice", "6", "2026-10-19T18:42:07.5", booth="booth-a")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Regression tests for vote_chain.py torn-write recovery.
+
+Run with: python3 -m unittest test_vote_chain   (or python3 -m pytest test_vote_chain.py)
+"""
+
+import os  # Import os for paths
+import tempfile  # Import tempfile for a scratch log
+import unittest  # Import unittest for the test cases
+
+from vote_chain import VoteChain, verify_log
+
+class TornWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "vote_chain.jsonl")
+        chain = VoteChain(self.path, fsync=False)
+        chain.append("1", "Voter 1", "Alice", "2025-10-19T10:00:00")
+        chain.append("2", "Voter 2", "Bob", "2025-10-19T10:01:00")
+        chain.close()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def cut(self, nbytes):  # Drop the last nbytes of the log, like a power cut
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - nbytes)
+
+    def reload_append_reload(self):
+        chain = VoteChain(self.path, fsync=False)
+        chain.append("3", "Voter 3", "Charlie", "2025-10-19T10:02:00")
+        chain.close()
+        chain = VoteChain(self.path, fsync=False)  # Raised "corrupt entry" before the fix
+        chain.close()
+        return chain.size
+
+    def test_missing_final_newline_keeps_the_vote(self):
+        self.cut(1)
+        self.assertEqual(self.reload_append_reload(), 3)
+        self.assertTrue(verify_log(self.path)[0])
+
+    def test_partial_final_line_is_dropped(self):
+        self.cut(10)
+        self.assertEqual(self.reload_append_reload(), 2)
+        self.assertTrue(verify_log(self.path)[0])
+
+if __name__ == "__main__":
+    unittest.main()
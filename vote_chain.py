@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Tamper-Evident Vote Log for EVM
+Every vote recorded by the booth is appended to vote_chain.jsonl. Each entry
+carries the hash of the previous entry, so editing or removing any vote breaks
+the chain from that point on. On top of the chain an append-only Merkle tree
+(RFC 6962 layout) gives the current root after every vote and O(log n)
+inclusion proofs for single votes.
+
+The log is local to the booth: wiping the Firebase nodes (DELETE_ALL in
+finger3.py) does not touch it, and the journal lines can be read by
+merge_votes.py like any other booth journal.
+
+Run with:
+  python3 vote_chain.py verify [vote_chain.jsonl] [--root HEX]
+  python3 vote_chain.py root [vote_chain.jsonl]
+  python3 vote_chain.py prove SEQ [vote_chain.jsonl]
+"""
+
+import argparse  # Import argparse for the verifier CLI
+import hashlib  # Import hashlib for chain and tree hashes
+import json  # Import json for log entries
+import os  # Import os for fsync and truncation
+import sys  # Import sys for exit codes
+import time  # Import time for verifier timing
+
+CHAIN_FILE = "vote_chain.jsonl"  # Default log next to votes.csv
+GENESIS = "0" * 64  # prev hash of the first entry
+VOTE_FIELDS = ("seq", "voter_id", "name", "candidate", "timestamp")  # Hashed fields, in order
+
+# -----------------------------
+# Hashing
+# -----------------------------
+def entry_hash(prev, entry):  # Chain hash of one entry
+    """Hash of the previous entry hash and this entry's vote fields."""
+    body = json.dumps([entry.get(k) for k in VOTE_FIELDS], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{prev}|{body}".encode("utf-8")).hexdigest()
+
+def leaf_node(data):  # RFC 6962 leaf hash
+    return hashlib.sha256(b"\x00" + data).digest()
+
+def inner_node(left, right):  # RFC 6962 interior node hash
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+# -----------------------------
+# Incremental Merkle tree
+# -----------------------------
+class MerkleLog:
+    """Append-only Merkle tree keeping every complete subtree hash.
+
+    levels[h][i] is the hash of the complete subtree covering leaves
+    [i * 2**h, (i + 1) * 2**h). Appending a leaf completes on average one
+    subtree, so updates are O(1) amortized; the root folds the O(log n) peaks.
+    """
+
+    def __init__(self):
+        self.levels = [[]]  # levels[0] are the leaf hashes
+        self._root = None  # Cached root, cleared on append
+
+    @property
+    def size(self):
+        return len(self.levels[0])
+
+    def append(self, data):  # Add one leaf
+        node = leaf_node(data)
+        self.levels[0].append(node)
+        h = 0
+        while len(self.levels[h]) % 2 == 0:  # A pair completed a bigger subtree
+            if h + 1 == len(self.levels):
+                self.levels.append([])
+            node = inner_node(self.levels[h][-2], node)
+            self.levels[h + 1].append(node)
+            h += 1
+        self._root = None
+
+    def _range_hash(self, start, end):  # Hash of leaves [start, end)
+        """MTH of an arbitrary leaf range, built from stored complete subtrees."""
+        n = end - start
+        if n == 1:
+            return self.levels[0][start]
+        if n & (n - 1) == 0 and start % n == 0:  # Complete aligned subtree is stored
+            return self.levels[n.bit_length() - 1][start // n]
+        k = 1 << ((n - 1).bit_length() - 1)  # Largest power of two smaller than n
+        return inner_node(self._range_hash(start, start + k), self._range_hash(start + k, end))
+
+    def root(self):  # Current tree head
+        if self.size == 0:
+            return hashlib.sha256(b"").digest()
+        if self._root is None:
+            self._root = self._range_hash(0, self.size)
+        return self._root
+
+    def proof(self, index, size=None):  # Inclusion proof for a leaf
+        """Return the audit path (list of hashes) of leaf index in the tree of the given size."""
+        size = self.size if size is None else size
+        if not 0 <= index < size <= self.size:
+            raise IndexError(f"leaf {index} not in tree of size {size}")
+        path, start, end = [], 0, size
+        while end - start > 1:  # Walk down, collecting the sibling subtree at each split
+            k = 1 << ((end - start - 1).bit_length() - 1)
+            if index < start + k:
+                path.append(self._range_hash(start + k, end))
+                end = start + k
+            else:
+                path.append(self._range_hash(start, start + k))
+                start += k
+        return path[::-1]  # Bottom-up order
+
+def verify_proof(leaf, index, size, path, root):  # Check an inclusion proof
+    """Return True if path proves that leaf (a leaf hash) is leaf index of the tree with this root."""
+    if index >= size:
+        return False
+    fn, sn, node = index, size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            node = inner_node(sibling, node)
+            while not fn & 1 and fn:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            node = inner_node(node, sibling)
+        fn, sn = fn >> 1, sn >> 1
+    return sn == 0 and node == root
+
+# -----------------------------
+# Hash-chained log
+# -----------------------------
+class VoteChain:
+    """Append-only vote log with a hash chain and an incremental Merkle root."""
+
+    def __init__(self, path=CHAIN_FILE, fsync=True):
+        self.path = path
+        self.fsync = fsync  # Flush each vote to the SD card before returning
+        self.tree = MerkleLog()
+        self.head = GENESIS  # Hash of the last entry
+        if os.path.exists(path):
+            self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):  # Rebuild head and tree from the existing log
+        good = 0  # Byte offset after the last valid line
+        unterminated = False  # Last entry is complete but lost its newline
+        with open(self.path, "rb") as f:
+            for raw in f:
+                torn = not raw.endswith(b"\n")  # Only the last line can be unterminated
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    if not torn:  # A complete but unreadable line is tampering, not a power cut
+                        raise ValueError(f"{self.path}: corrupt entry after seq {self.size - 1}; run vote_chain.py verify")
+                    break  # Torn write from a power cut: only the unterminated last line is affected
+                if torn and (entry.get("seq") != self.size or entry.get("prev") != self.head
+                             or entry_hash(self.head, entry) != entry.get("hash")):
+                    break  # Parses, but is not the next link of the chain: drop it like any torn line
+                self.head = entry["hash"]
+                self.tree.append(bytes.fromhex(entry["hash"]))
+                good += len(raw)
+                unterminated = torn
+        if unterminated:  # Vote was fully written (and may be a commit point); only the newline is missing
+            print(f"⚠️ Terminating last entry of {self.path}")
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+        elif good != os.path.getsize(self.path):  # Drop the partial line so appends stay parseable
+            print(f"⚠️ Truncating torn entry at end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+
+    @property
+    def size(self):
+        return self.tree.size
+
+    def append(self, voter_id, name, candidate, timestamp):  # Record one vote
+        """Append a vote and return the written entry, including its chain hash."""
+        entry = {"seq": self.size, "voter_id": str(voter_id), "name": name,
+                 "candidate": candidate, "timestamp": timestamp, "prev": self.head}
+        entry["hash"] = entry_hash(self.head, entry)
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.head = entry["hash"]
+        self.tree.append(bytes.fromhex(entry["hash"]))
+        return entry
+
+    def root(self):  # Hex Merkle root of all votes so far
+        return self.tree.root().hex()
+
+    def close(self):
+        self._file.close()
+
+def verify_log(path):  # Full offline check of a log
+    """Return (ok, count, root_hex, error) after re-checking every chain link."""
+    prev, tree = GENESIS, MerkleLog()
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return False, tree.size, tree.root().hex(), f"line {lineno}: not valid JSON"
+            if entry.get("seq") != tree.size:
+                return False, tree.size, tree.root().hex(), f"line {lineno}: expected seq {tree.size}, found {entry.get('seq')}"
+            if entry.get("prev") != prev:
+                return False, tree.size, tree.root().hex(), f"line {lineno}: chain broken (prev hash mismatch)"
+            if entry_hash(prev, entry) != entry.get("hash"):
+                return False, tree.size, tree.root().hex(), f"line {lineno}: entry was modified (hash mismatch)"
+            prev = entry["hash"]
+            tree.append(bytes.fromhex(prev))
+    return True, tree.size, tree.root().hex(), None
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Verify and inspect the tamper-evident vote log.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_verify = sub.add_parser("verify", help="check the whole chain and Merkle root")
+    p_verify.add_argument("log", nargs="?", default=CHAIN_FILE)
+    p_verify.add_argument("--root", help="expected Merkle root (e.g. published at poll close)")
+    p_root = sub.add_parser("root", help="print size and Merkle root")
+    p_root.add_argument("log", nargs="?", default=CHAIN_FILE)
+    p_prove = sub.add_parser("prove", help="print an inclusion proof for one vote")
+    p_prove.add_argument("seq", type=int)
+    p_prove.add_argument("log", nargs="?", default=CHAIN_FILE)
+    args = parser.parse_args()
+
+    if args.cmd == "verify":
+        start = time.time()
+        ok, count, root, error = verify_log(args.log)
+        elapsed = time.time() - start
+        if not ok:
+            print(f"❌ {error} (first {count} votes intact)")
+            sys.exit(1)
+        if args.root and args.root != root:
+            print(f"❌ Root mismatch: log has {root}, expected {args.root}")
+            sys.exit(1)
+        print(f"✅ {count} votes verified in {elapsed:.2f}s, Merkle root {root}")
+        return
+
+    chain = VoteChain(args.log, fsync=False)
+    if args.cmd == "root":
+        print(f"{chain.size} votes, Merkle root {chain.root()}")
+    else:
+        if not 0 <= args.seq < chain.size:
+            print(f"❌ No vote with seq {args.seq}")
+            sys.exit(1)
+        leaf = chain.tree.levels[0][args.seq]
+        path = chain.tree.proof(args.seq)
+        print(json.dumps({"seq": args.seq, "size": chain.size, "root": chain.root(),
+                          "leaf_hash": leaf.hex(), "path": [h.hex() for h in path]}, indent=2))
+    chain.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Vote Export for EVM
+Archives the Firebase vote shards (see vote_store.py) to a local directory for
+analytics, without one giant GET /votes.json:
+
+    export/<hour>/<booth>.jsonl    one {"key", "candidate", "voter_id", "timestamp", "booth"} per line
+    export/cursor.json             {"<hour>/<booth>": [last_key, votes, file_offset]}
+
+Shards are fetched concurrently over one pooled keep-alive session. Each shard
+is paged with orderBy="$key", startAt and limitToFirst and every page is
+appended to the shard's file as it arrives, so memory holds one page per
+worker. The cursor is saved after every page; an interrupted export resumes
+from it (rows written after the saved offset are cut off first).
+
+Vote keys start with the timestamp, so a shard's cursor also marks time: a
+later run asks each shard only for keys after its cursor and skips exported
+shards older than SETTLE_HOURS. Votes re-pushed late into an old shard are
+found by --recheck, which compares shallow key counts and exports changed
+shards again from scratch.
+
+Run with: python3 vote_export.py [--workers 8] [export [DIR] [--recheck]]
+          python3 vote_export.py [--workers 8] bench    # paged export vs one GET: time and peak RSS
+"""
+
+import argparse  # Import argparse for the command line
+import json  # Import json for vote lines and the cursor file
+import os  # Import os for paths and atomic replace
+import shutil  # Import shutil to clear bench output
+import subprocess  # Import subprocess to bench each method in its own process
+import sys  # Import sys for the interpreter path
+import tempfile  # Import tempfile for bench output
+import threading  # Import threading for the cursor lock
+import time  # Import time for timing and the settle window
+from concurrent.futures import ThreadPoolExecutor  # Import executor for concurrent shards
+
+from session_state import file_offset, truncate_to  # Import append-and-truncate helpers
+from vote_store import DB_URL, PAGE_SIZE, VoteStore, shard_path
+
+CURSOR_FILE = "cursor.json"  # Inside the export directory
+SETTLE_HOURS = 2  # Exported shards older than this are not asked for new votes
+WORKERS = 8  # Shards fetched at the same time
+
+def pooled_session(workers):  # One keep-alive connection per worker, shared by all threads
+    import requests  # Import requests for Firebase API
+    from requests.adapters import HTTPAdapter  # Import HTTPAdapter for the connection pool
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class Exporter:
+    """Incremental, resumable export of every vote shard to JSON-lines files."""
+
+    def __init__(self, store, out_dir, workers=WORKERS):
+        self.store = store
+        self.out_dir = out_dir
+        self.workers = workers
+        self.cursor_path = os.path.join(out_dir, CURSOR_FILE)
+        self.lock = threading.Lock()  # Guards self.cursors and the cursor file
+        self.cursors = {}
+        if os.path.exists(self.cursor_path):
+            with open(self.cursor_path) as f:
+                self.cursors = json.load(f)
+
+    def _save_cursors(self):  # Caller holds self.lock
+        tmp = self.cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.cursors, f)
+        os.replace(tmp, self.cursor_path)  # Atomic replace
+
+    def todo(self, recheck=False):  # (hour, booth, restart) of every shard that may have new votes
+        settled = time.strftime("%Y-%m-%dT%H", time.gmtime(time.time() - SETTLE_HOURS * 3600))
+        for hour, booth in self.store.shards():
+            cursor = self.cursors.get(f"{hour}/{booth}")
+            if cursor is None or hour >= settled:
+                yield hour, booth, False
+            elif recheck and self.store.count(hour, booth) != cursor[1]:  # Late votes landed in an old shard
+                yield hour, booth, True
+
+    def export_shard(self, hour, booth, restart=False):  # Runs in a worker thread; returns votes written
+        name = f"{hour}/{booth}"
+        path = os.path.join(self.out_dir, hour, f"{booth}.jsonl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.lock:
+            last_key, count, offset = [None, 0, 0] if restart else self.cursors.get(name, [None, 0, 0])
+        if restart and os.path.exists(path):
+            os.remove(path)
+        truncate_to(path, offset)  # Rows after the last saved cursor are fetched again
+        written = 0
+        with open(path, "a") as f:
+            for page in self.store.pages(shard_path(hour, booth), self.store.page_size, start=last_key):
+                keys = [k for k in sorted(page) if k != last_key and isinstance(page[k], dict)]
+                if not keys:
+                    continue
+                f.write("".join(json.dumps({"key": k, **page[k]}) + "\n" for k in keys))
+                f.flush()
+                last_key, count, written = keys[-1], count + len(keys), written + len(keys)
+                with self.lock:
+                    self.cursors[name] = [last_key, count, file_offset(path)]
+                    self._save_cursors()
+        return written
+
+    def run(self, recheck=False):
+        """Export every shard with new votes; returns (votes, shards, seconds)."""
+        start = time.time()
+        todo = list(self.todo(recheck))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export") as pool:
+            votes = sum(pool.map(lambda shard: self.export_shard(*shard), todo))
+        return votes, len(todo), time.time() - start
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def peak_rss_kb():  # Peak resident set size of this process
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+def single_get(url, out_dir):  # The old way: one GET of every vote, then write it out
+    import requests  # Import requests for Firebase API
+    res = requests.get(f"{url}/vote_shards.json", timeout=600)
+    res.raise_for_status()
+    votes = 0
+    with open(os.path.join(out_dir, "votes.jsonl"), "w") as f:
+        for hour, booths in (res.json() or {}).items():
+            for booth, shard in booths.items():
+                for key, vote in shard.items():
+                    f.write(json.dumps({"key": key, **vote}) + "\n")
+                    votes += 1
+    return votes
+
+def bench_one(method, url, workers, page_size):  # Runs in a fresh process per method
+    out_dir = tempfile.mkdtemp(prefix="evm-export-")
+    start = time.perf_counter()
+    if method == "single":
+        votes = single_get(url, out_dir)
+    else:
+        store = VoteStore(pooled_session(workers), url, page_size=page_size, timeout=60)
+        votes = Exporter(store, out_dir, workers).run()[0]
+    seconds = time.perf_counter() - start
+    shutil.rmtree(out_dir)
+    print(f"{method:>6}: {votes} votes in {seconds:6.2f}s, {votes / max(seconds, 1e-9):8.0f} votes/s, "
+          f"peak RSS {peak_rss_kb() / 1024:6.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental export of the Firebase vote shards.")
+    parser.add_argument("--url", default=DB_URL, help="Firebase database URL")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="shards fetched at the same time")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help="votes per request")
+    sub = parser.add_subparsers(dest="cmd")
+    p_export = sub.add_parser("export", help="export new votes (default)")
+    p_export.add_argument("out", nargs="?", default="export", help="export directory")
+    p_export.add_argument("--recheck", action="store_true", help="also look for late votes in old shards")
+    sub.add_parser("bench", help="paged export vs a single GET, each in its own process")
+    p_one = sub.add_parser("bench-one")
+    p_one.add_argument("method", choices=["single", "paged"])
+    args = parser.parse_args()
+
+    if args.cmd == "bench-one":
+        bench_one(args.method, args.url, args.workers, args.page_size)
+        return
+    if args.cmd == "bench":
+        for method in ("single", "paged"):  # Separate processes so peak RSS is not shared
+            cmd = [sys.executable, os.path.abspath(__file__), "--url", args.url, "--workers", str(args.workers),
+                   "--page-size", str(args.page_size), "bench-one", method]
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode:
+                print(f"{method:>6}: failed ({result.stderr.strip().splitlines()[-1] if result.stderr.strip() else '?'})")
+            else:
+                print(result.stdout, end="")
+        return
+
+    out = getattr(args, "out", "export")
+    os.makedirs(out, exist_ok=True)
+    store = VoteStore(pooled_session(args.workers), args.url, page_size=args.page_size, timeout=60)
+    votes, shards, seconds = Exporter(store, out, args.workers).run(getattr(args, "recheck", False))
+    print(f"✅ {votes} votes written from {shards} shards in {seconds:.1f}s → {out}/")
+
+if __name__ == "__main__":
+    main()
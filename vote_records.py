@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Vote Record Helpers for EVM
+Shared parsing for the vote files written by the booth:
+- votes.csv lines written by record_vote() in voting6.py
+  (voter_id,name,candidate,timestamp)
+- JSON-lines booth journals (one {"voter_id", "name", "candidate", "timestamp"} object per line)
+Older booths wrote candidate-only lines (see display.py); those carry no voter
+and are skipped by the tools that need a voter_id.
+"""
+
+import hashlib  # Import hashlib for vote digests
+import json  # Import json for journal lines
+import os  # Import os for path handling
+from collections import namedtuple  # Import namedtuple for light records
+
+# One vote as recorded by a booth
+VoteRecord = namedtuple("VoteRecord", ["voter_id", "name", "candidate", "timestamp", "booth"])
+
+JOURNAL_EXTENSIONS = (".jsonl", ".journal")  # Files treated as JSON-lines journals
+
+# -----------------------------
+# Parsing
+# -----------------------------
+def parse_csv_line(line, booth=""):  # Parse one votes.csv line
+    """Return a VoteRecord for a votes.csv line, or None for legacy/blank lines."""
+    fields = line.rstrip("\r\n").split(",")  # record_vote() writes plain comma separated values
+    if len(fields) < 4:  # Candidate-only legacy line or blank line
+        return None
+    voter_id = fields[0].strip()  # First field is the fingerprint ID
+    if not voter_id or voter_id == "None":  # Vote without a matched voter
+        return None
+    name = ",".join(fields[1:-2])  # Names are not quoted, so rejoin any commas inside them
+    return VoteRecord(voter_id, name, fields[-2], fields[-1].strip(), booth)
+
+def parse_journal_line(line, booth=""):  # Parse one journal line
+    """Return a VoteRecord for a JSON-lines journal entry, or None if it is not a vote."""
+    line = line.strip()
+    if not line:  # Skip blank lines
+        return None
+    try:
+        entry = json.loads(line)  # Decode JSON object
+    except ValueError:  # Torn write at the end of a journal
+        return None
+    if not isinstance(entry, dict) or not entry.get("voter_id"):  # Not a vote entry
+        return None
+    return VoteRecord(str(entry["voter_id"]), entry.get("name", ""), entry.get("candidate", ""),
+                      entry.get("timestamp", ""), entry.get("booth") or booth)
+
+def line_parser(path):  # Pick the parser for a file
+    """Return the line parser matching the file type of path."""
+    if path.endswith(JOURNAL_EXTENSIONS):  # Journal file
+        return parse_journal_line
+    return parse_csv_line  # Default to votes.csv format
+
+def booth_name(path):  # Derive a booth label from a file path
+    """Use the parent directory name (booth1/votes.csv -> booth1), else the file stem."""
+    parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return parent if stem in ("votes", "journal") and parent else stem
+
+def iter_records(path, booth=None):  # Stream all votes from a file
+    """Yield VoteRecord objects from a votes.csv or journal file, skipping non-votes."""
+    booth = booth or booth_name(path)  # Default booth label
+    parse = line_parser(path)  # Choose parser
+    with open(path, "r", encoding="utf-8", errors="replace") as f:  # Tolerate bad bytes from SD cards
+        for line in f:
+            record = parse(line, booth)
+            if record is not None:
+                yield record
+
+# -----------------------------
+# Formatting and hashing
+# -----------------------------
+def format_csv_line(record):  # Format a record the way record_vote() does
+    """Return the votes.csv line for a record (without booth)."""
+    return f"{record.voter_id},{record.name},{record.candidate},{record.timestamp}\n"
+
+def record_digest(record):  # Stable identity of a vote
+    """SHA-256 digest of the fields that identify a vote (voter, candidate, time)."""
+    key = f"{record.voter_id}|{record.candidate}|{record.timestamp}".encode("utf-8")
+    return hashlib.sha256(key).digest()
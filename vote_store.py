@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Sharded Vote Storage for EVM
+Votes used to go into one flat /votes list that every reader downloaded in
+full. They are now bucketed by hour and booth, and no response grows with the
+size of the election:
+
+    vote_shards/<hour>/<booth>/<vote_key>   {"candidate", "voter_id", "timestamp", "booth"}
+    vote_index/<hour>/<booth>               true, one entry per non-empty shard
+    voted/<voter_id>                        {"hour", "booth", "key"}, the repeat-voter check
+
+<hour> is the UTC timestamp cut to "YYYY-MM-DDTHH" (the reconcile_votes.py
+bucket) and <vote_key> is <timestamp>_<voter>, so a repeated upload rewrites the
+same vote instead of adding a second one. Each vote is written with one
+multi-path PATCH, so the shard, the index and the voter marker change together.
+
+Readers page with orderBy="$key", startAt and limitToFirst: the index
+INDEX_PAGE hours at a time and each shard PAGE_SIZE votes at a time. Counting
+uses shallow=true, which returns keys only.
+
+Firebase needs no extra .indexOn rules for "$key" queries. Booths still running
+voting2-5.py write the old /votes node; migrate folds it in and can be re-run.
+
+Run with: python3 vote_store.py migrate [--dry-run]
+          python3 vote_store.py stats
+          python3 vote_store.py voted VOTER_ID
+"""
+
+import argparse  # Import argparse for the command line
+import os  # Import os for the booth name
+import re  # Import re for Firebase key cleanup
+import socket  # Import socket for the default booth name
+import time  # Import time for timing
+
+DB_URL = os.environ.get("EVM_DB_URL", "https://e-vm-f7bdf-default-rtdb.firebaseio.com")  # Firebase database URL
+BOOTH = os.environ.get("EVM_BOOTH") or socket.gethostname()  # Shard name of this booth
+HOUR_CHARS = 13  # "YYYY-MM-DDTHH" -> one shard per booth and hour
+PAGE_SIZE = 500  # Votes per shard page
+INDEX_PAGE = 200  # Hours per index page
+LEGACY_NODE = "votes"  # Flat node written before sharding
+
+def firebase_key(text):  # Firebase keys may not contain . $ # [ ] /
+    return re.sub(r"[.$#\[\]/]", "_", str(text)) or "_"
+
+def vote_key(voter_id, timestamp):  # Firebase key of a vote; same vote, same key
+    """Timestamp first, so "$key" order within a shard is time order (vote_export.py cursors)."""
+    return f"{timestamp}_{voter_id}".replace(".", "_").replace(":", "-")
+
+def hour_of(timestamp):  # Shard hour of an ISO timestamp
+    return firebase_key(timestamp[:HOUR_CHARS]) if timestamp else "unknown"
+
+def shard_path(hour, booth):
+    return f"vote_shards/{hour}/{booth}"
+
+def voted_path(voter_id):
+    return f"voted/{firebase_key(voter_id)}"
+
+def vote_update(candidate, voter_id, timestamp, booth=BOOTH, key=None):  # Body of the multi-path PATCH
+    """Return {path: value} that stores one vote in its shard, the index and the voter marker."""
+    hour, booth = hour_of(timestamp), firebase_key(booth)
+    key = key or vote_key(voter_id, timestamp)
+    vote = {"candidate": candidate, "voter_id": voter_id, "timestamp": timestamp, "booth": booth}
+    return {
+        f"{shard_path(hour, booth)}/{key}": vote,
+        f"vote_index/{hour}/{booth}": True,
+        voted_path(voter_id): {"hour": hour, "booth": booth, "key": key},
+    }
+
+def key_query(start=None, limit=PAGE_SIZE, end=None):  # orderBy="$key" page parameters
+    params = {"orderBy": '"$key"', "limitToFirst": limit}
+    if start is not None:
+        params["startAt"] = f'"{start}"'
+    if end is not None:
+        params["endAt"] = f'"{end}"'
+    return params
+
+class VoteStore:
+    """Sharded vote reads and writes over a requests.Session (or anything with get/patch)."""
+
+    def __init__(self, session, url=DB_URL, booth=BOOTH, page_size=PAGE_SIZE, timeout=5):
+        self.session = session
+        self.url = url
+        self.booth = booth
+        self.page_size = page_size
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        res = self.session.get(f"{self.url}/{path}.json", params=params or None, timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()
+
+    # -- writes --
+    def push(self, candidate, voter_id, timestamp, booth=None, key=None):  # One atomic multi-path update
+        """Store one vote; returns True on success. Repeating it rewrites the same vote."""
+        body = vote_update(candidate, voter_id, timestamp, booth or self.booth, key)
+        res = self.session.patch(f"{self.url}/.json", json=body, timeout=self.timeout)
+        return res.status_code == 200
+
+    # -- reads --
+    def has_voted(self, voter_id):  # One tiny GET instead of the whole vote list
+        return self._get(voted_path(voter_id)) is not None
+
+    def pages(self, path, page_size, start=None, end=None):  # Yield dict pages of a node in key order
+        """Page through a node with orderBy="$key"; startAt is inclusive, so each cursor row is dropped."""
+        cursor = start
+        while True:
+            page = self._get(path, **key_query(cursor, page_size + (cursor != start), end)) or {}
+            rows = {k: v for k, v in page.items() if cursor == start or k != cursor}
+            if rows:
+                yield rows
+            if len(page) < page_size + (cursor != start):
+                return
+            cursor = max(page)  # Firebase returns the page in key order, but the JSON object does not keep it
+
+    def shards(self, start_hour=None, end_hour=None):  # Yield (hour, booth) from the index
+        for page in self.pages("vote_index", INDEX_PAGE, start_hour, end_hour):
+            for hour in sorted(page):
+                for booth in sorted(page[hour] or {}):
+                    yield hour, booth
+
+    def shard_votes(self, hour, booth):  # Yield (key, vote) of one shard, PAGE_SIZE per request
+        for page in self.pages(shard_path(hour, booth), self.page_size):
+            for key in sorted(page):
+                if isinstance(page[key], dict):
+                    yield key, page[key]
+
+    def votes(self, start_hour=None, end_hour=None):  # Yield (key, vote) across every shard in hour order
+        for hour, booth in self.shards(start_hour, end_hour):
+            yield from self.shard_votes(hour, booth)
+
+    def count(self, hour, booth):  # Votes in a shard without downloading them
+        return len(self._get(shard_path(hour, booth), shallow="true") or {})
+
+    # -- migration --
+    def legacy_votes(self):  # Yield (key, vote) of the old flat node, paged
+        for page in self.pages(LEGACY_NODE, self.page_size):
+            for key in sorted(page):
+                if isinstance(page[key], dict):
+                    yield key, page[key]
+
+    def migrate(self, dry_run=False, progress=None):
+        """Copy every legacy vote into its shard under its original key; returns (copied, failed)."""
+        copied = failed = 0
+        for key, vote in self.legacy_votes():
+            booth = vote.get("booth") or "legacy"  # Flat votes never recorded a booth
+            if not dry_run and not self.push(vote.get("candidate", ""), str(vote.get("voter_id")),
+                                             vote.get("timestamp", ""), booth, key):
+                failed += 1
+                continue
+            copied += 1
+            if progress and copied % 1000 == 0:
+                progress(copied)
+        return copied, failed
+
+# -----------------------------
+# Command line
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Sharded Firebase vote storage.")
+    parser.add_argument("--url", default=DB_URL, help="Firebase database URL")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_migrate = sub.add_parser("migrate", help="copy the flat /votes node into hour/booth shards")
+    p_migrate.add_argument("--dry-run", action="store_true", help="count only, write nothing")
+    sub.add_parser("stats", help="votes per shard (shallow reads only)")
+    p_voted = sub.add_parser("voted", help="has this voter voted?")
+    p_voted.add_argument("voter_id")
+    args = parser.parse_args()
+
+    import requests  # Import requests for Firebase API
+    store = VoteStore(requests.Session(), args.url, timeout=30)
+    start = time.time()
+    if args.cmd == "migrate":
+        copied, failed = store.migrate(args.dry_run, progress=lambda n: print(f"  {n} votes…"))
+        verb = "would copy" if args.dry_run else "copied"
+        print(f"✅ {verb} {copied} votes in {time.time() - start:.1f}s" + (f", ❌ {failed} failed" if failed else ""))
+    elif args.cmd == "stats":
+        total = largest = shards = 0
+        for hour, booth in store.shards():
+            n = store.count(hour, booth)
+            print(f"{hour}  {booth:<16} {n:6d}")
+            total, largest, shards = total + n, max(largest, n), shards + 1
+        print(f"{total} votes in {shards} shards, largest {largest} "
+              f"(pages of {store.page_size}, {time.time() - start:.1f}s)")
+    elif args.cmd == "voted":
+        print("✅ has voted" if store.has_voted(args.voter_id) else "❌ has not voted")
+
+if __name__ == "__main__":
+    main()
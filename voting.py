@@ -1,26 +1,20 @@
 from tkinter import *
 from PIL import Image, ImageTk
 from gpiozero import Button
-import serial
-import time
+from serial_session import SerialSession, SensorError
 
 # -----------------------------
 # Serial setup (Arduino + fingerprint)
 # -----------------------------
-ser = serial.Serial('/dev/ttyACM0', 9600, timeout=2)
-time.sleep(2)
+sensor = SerialSession('/dev/ttyACM0').open()
 
 # Wait for sensor ready
-while True:
-    if ser.in_waiting > 0:
-        msg = ser.readline().decode().strip()
-        print(msg)
-        if "FINGERPRINT_READY" in msg:
-            print("✅ Sensor ready!")
-            break
-        elif "FINGERPRINT_ERROR" in msg:
-            print("❌ Sensor error")
-            exit()
+try:
+    sensor.wait_ready()
+    print("✅ Sensor ready!")
+except SensorError as e:
+    print(f"❌ {e}")
+    exit()
 
 # -----------------------------
 # Candidate setup
@@ -65,21 +59,20 @@ def show_fingerprint_screen():
 # Wait for fingerprint match
 # -----------------------------
 def wait_for_fingerprint():
-    ser.write(b'CHECK\n')
+    sensor.send('CHECK')
     while True:
-        # Read Arduino responses
-        if ser.in_waiting > 0:
-            response = ser.readline().decode().strip()
-            if response:
-                print(f"Arduino → {response}")
-                if response.startswith("MATCH"):
-                    voter_id = response.split(":")[1]
-                    print(f"Fingerprint matched: {voter_id}")
-                    show_candidates_screen()
-                    return
-                elif response == "NO_MATCH":
-                    print("Fingerprint not recognized. Try again.")
-                    ser.write(b'CHECK\n')
+        # Read Arduino responses (blocks up to 50ms, then lets Tk redraw)
+        response = sensor.readline(0.05)
+        if response:
+            print(f"Arduino → {response}")
+            if response.startswith("MATCH"):
+                voter_id = response.split(":")[1]
+                print(f"Fingerprint matched: {voter_id}")
+                show_candidates_screen()
+                return
+            elif response == "NO_MATCH":
+                print("Fingerprint not recognized. Try again.")
+                sensor.send('CHECK')
         root.update()
 
 # -----------------------------
@@ -1,18 +1,41 @@
 #!/usr/bin/env python3  # Shebang for running as executable
-from tkinter import *  # Import Tkinter for GUI
-from tkinter import ttk  # Import ttk for styled widgets
-from PIL import Image, ImageTk  # Import PIL for image handling
-from gpiozero import Button, Buzzer  # Import gpiozero for GPIO control
-import serial  # Import serial for Arduino communication
+"""
+Voting booth on one Tk main loop (sensor polling, GPIO buttons, Firebase).
+The screens are drawn through the Tk backend of booth_display.py, the same
+screens voting7.py shows. Its timers and idle wake-up run on that Tk window,
+so voting6.py needs an X session. The framebuffer and SDL backends
+(EVM_UI=fb / sdl) need voting7.py's pumped loop; run voting7.py for a booth
+without X.
+
+Run with: python3 voting6.py
+"""
+from startup_profiler import StartupProfiler  # Import startup profiler first so imports are timed
+profiler = StartupProfiler()  # Timeline from process start to first interactive screen
+from tkinter import *  # Import Tkinter for the idle screen
 import time  # Import time for delays
-import requests  # Import requests for Firebase API
 from datetime import datetime  # Import datetime for timestamps
 import os  # Import os for environment variables
 import signal  # Import signal for signal handling
+from concurrent.futures import ThreadPoolExecutor  # Import executor for parallel startup
+from serial_session import ReconnectingSession  # Import self-healing serial session for Arduino
+from ballot_ui import ThumbnailCache, load_candidates  # Import candidate list and image cache
+from booth_display import open_display  # Import the booth screens (Tk backend)
+from button_matrix import KEYPAD_FILE, load_keypad  # Import matrix-scanned button bank
+# PIL, pyserial, requests and gpiozero are imported lazily by the startup workers below
+from vote_chain import VoteChain  # Import hash-chained vote log
+import live_profiler  # Import on-demand profiler (SIGUSR1 / SIGUSR2)
+from event_log import EventLog  # Import structured event log
+from session_state import SessionCheckpoint, file_offset, has_line, truncate_to  # Import power-loss-safe session state
+from idle_mode import Backlight, Waker  # Import screen blanking and poll-free wake-up
+import session_trace  # Import serial/GPIO/HTTP session recorder (EVM_TRACE) and replayer
+from vote_store import VoteStore  # Import sharded Firebase vote storage
+import json  # Import json for encrypted ballot lines
+from ballot_crypto import (PUBLIC_KEY_FILE, RandomnessPool, ballot_to_json,  # Import optional ballot encryption
+                           commit_ballot, discard_ballot, encrypt_choice, load_key, stage_ballot)
 
 # Set environment variables for GUI display on Raspberry Pi
-os.environ['DISPLAY'] = ':0'  # Set display to :0
-os.environ['XAUTHORITY'] = '/home/pi/.Xauthority'  # Set X authority file
+os.environ.setdefault('DISPLAY', ':0')  # Set display to :0 (session_trace.py replays under Xvfb)
+os.environ.setdefault('XAUTHORITY', '/home/pi/.Xauthority')  # Set X authority file
 
 # Signal handler for Ctrl+C
 def signal_handler(sig, frame):  # Function to handle Ctrl+C
@@ -20,240 +43,483 @@ def signal_handler(sig, frame):  # Function to handle Ctrl+C
     root.quit()  # Quit the Tkinter mainloop cleanly
 
 signal.signal(signal.SIGINT, signal_handler)  # Register signal handler for SIGINT (Ctrl+C)
+live_profiler.install("voting6")  # kill -USR1 / -USR2 <pid> to profile the live booth
+events = EventLog("booth_events.jsonl")  # Structured copy of the console messages, query with event_log.py
+trace = session_trace.active()  # Records the session when EVM_TRACE is set (secret-ballot material, refused with ballot encryption); None otherwise
 
 # -----------------------------
 # Firebase setup
 # -----------------------------
 DB_URL = "https://e-vm-f7bdf-default-rtdb.firebaseio.com"  # Firebase database URL
 
-def push_vote(candidate_name, voter_id=None):  # Function to push vote to Firebase
-    payload = {  # Prepare vote data
-        "candidate": candidate_name,  # Candidate name
-        "voter_id": voter_id,  # Voter ID
-        "timestamp": datetime.utcnow().isoformat()  # UTC timestamp
-    }
+def push_vote(candidate_name, voter_id=None, timestamp=None):  # Function to push vote to Firebase
+    """Push a vote; returns True on success. Failed pushes are repaired by reconcile_votes.py."""
     try:
-        response = requests.post(f"{DB_URL}/votes.json", json=payload)  # POST to votes endpoint
-        if response.status_code == 200:  # Check success
+        if store.push(candidate_name, voter_id, timestamp or datetime.utcnow().isoformat()):  # Shard, index and voter marker
             print(f"✅ Vote for {candidate_name} pushed to Firebase")  # Success message
-        else:
-            print(f"❌ Failed to push vote: {response.text}")  # Error message
+            events.log("vote_pushed", voter_id=voter_id, timestamp=timestamp)
+            return True
+        print("❌ Failed to push vote")  # Error message
+        events.log("push_failed", voter_id=voter_id, timestamp=timestamp, error="rejected")
     except Exception as e:  # Handle exceptions
         print(f"❌ Exception while pushing vote: {e}")  # Exception message
+        events.log("push_failed", voter_id=voter_id, timestamp=timestamp, error=str(e))
+    return False
+
+roster = {}  # Voter ID -> name, preloaded at startup
+http = None  # requests.Session for Firebase (keep-alive), created by load_roster()
+store = None  # VoteStore over that session
+
+def load_roster():  # Startup worker: import requests and preload voter names
+    global http, store  # Session used by the Firebase functions
+    with profiler.phase("import requests"):
+        import requests  # Import requests for Firebase API
+    http = requests.Session()
+    if trace:
+        trace.http(http)  # Trace requests and responses
+    store = VoteStore(http, DB_URL)
+    with profiler.phase("roster preload"):
+        try:
+            res = http.get(f"{DB_URL}/voters.json", timeout=5)  # GET all voters once
+            data = res.json() if res.status_code == 200 else None  # Decode roster
+            if isinstance(data, list):  # Firebase returns a list for small numeric keys
+                data = {str(i): v for i, v in enumerate(data) if v}
+            for fid, voter in (data or {}).items():  # Keep only the names
+                roster[str(fid)] = voter.get("name", "Unknown Voter")
+            print(f"✅ Roster preloaded ({len(roster)} voters)")  # Confirmation
+            events.log("roster_loaded", voters=len(roster))
+        except Exception as e:  # Booth still works online-only
+            print(f"❌ Roster preload failed: {e}")  # Exception message
+            events.log("roster_failed", error=str(e))
 
 def get_voter_name(voter_id):  # Function to get voter name from Firebase
+    if str(voter_id) in roster:  # Preloaded at startup, no request needed
+        return roster[str(voter_id)]
     try:
-        res = requests.get(f"{DB_URL}/voters/{voter_id}.json")  # GET voter data
+        res = http.get(f"{DB_URL}/voters/{voter_id}.json")  # GET voter data
         if res.status_code == 200 and res.json():  # Check success and data
             return res.json().get("name", "Unknown Voter")  # Return name or default
         else:
             return "Unknown Voter"  # Default if not found
     except Exception as e:  # Handle exceptions
         print(f"❌ Failed to fetch voter name: {e}")  # Exception message
+        events.log("lookup_failed", voter_id=voter_id, error=str(e))
         return "Unknown Voter"  # Default
 
 def has_already_voted(voter_id):  # Function to check if voter already voted
     """Check if voter already cast a vote."""
     try:
-        res = requests.get(f"{DB_URL}/votes.json")  # GET all votes
-        if res.status_code == 200 and res.json():  # Check success and data
-            for key, val in res.json().items():  # Iterate through votes
-                if val.get("voter_id") == str(voter_id):  # Check if voter_id matches
-                    return True  # Already voted
-        return False  # Not voted
+        return store.has_voted(voter_id)  # GET voted/<id>, not every vote
     except Exception as e:  # Handle exceptions
         print(f"❌ Error checking previous votes: {e}")  # Exception message
+        events.log("vote_check_failed", voter_id=voter_id, error=str(e))
         return False  # Assume not voted
 
+# -----------------------------
+# Tamper-evident vote log
+# -----------------------------
+chain = VoteChain("vote_chain.jsonl")  # Hash-chained copy of every vote, checked with vote_chain.py verify
+checkpoint = SessionCheckpoint("booth_state.json")  # Voter-flow step, replaced atomically so a reboot can resume it
+SESSION_TIMEOUT_S = int(os.environ.get("EVM_SESSION_TIMEOUT_S", 300))  # Older open ballots are not resumed
+
 # -----------------------------
 # Serial setup
 # -----------------------------
-ser = serial.Serial('/dev/ttyACM0', 9600, timeout=2)  # Open serial to Arduino
-time.sleep(2)  # Wait for connection
-
-while True:  # Wait for sensor ready
-    if ser.in_waiting > 0:  # Check for data
-        msg = ser.readline().decode().strip()  # Read message
-        print(msg)  # Print message
-        if "FINGERPRINT_READY" in msg:  # If ready
-            print("✅ Sensor ready!")  # Confirmation
-            break  # Exit loop
-        elif "FINGERPRINT_ERROR" in msg:  # If error
-            print("❌ Sensor error")  # Error
-            exit()  # Exit
+sensor = ReconnectingSession('/dev/ttyACM0')  # Opened by connect_sensor(); finds the board again by USB serial after an unplug
+if trace:
+    trace.serial(sensor)  # Trace every line to and from the Arduino
+
+def connect_sensor():  # Startup worker: open serial and wait for the sensor
+    with profiler.phase("open serial"):
+        sensor.open()  # Open serial to Arduino (imports pyserial)
+    with profiler.phase("sensor handshake"):
+        sensor.wait_ready()  # Blocking reads, PING if READY was missed; raises SensorError
+        print("✅ Sensor ready!")  # Confirmation
+        events.log("sensor_ready", port=sensor.port)
+    sensor.start_reader()  # From now on lines arrive through sensor.poll()
 
 # -----------------------------
 # Candidate setup
 # -----------------------------
-candidates = [  # List of candidates with details
-    {"name": "Alice", "image": "candidate_alice.jpg", "gpio": 17},  # Alice details, Physical Pin 11
-    {"name": "Bob", "image": "candidate_bob.jpg", "gpio": 27},    # Bob details, Physical Pin 13
-    {"name": "Charlie", "image": "candidate_charlie.jpg", "gpio": 22} # Charlie details, Physical Pin 15
-]
+candidates = load_candidates("candidates.json")  # Name, image and optional GPIO pin of every candidate
+
+# -----------------------------
+# Ballot encryption (enabled when ballot_key.pub.json is present)
+# -----------------------------
+ballot_pool = None  # Precomputed randomness, None when encryption is off
+if os.path.exists(PUBLIC_KEY_FILE):  # Key created offline with ballot_crypto.py keygen
+    ballot_key = load_key(PUBLIC_KEY_FILE)  # Load election public key
+    if ballot_key["candidates"] != [c["name"] for c in candidates]:  # Ballot order must match the key
+        print("❌ Candidates do not match ballot_key.pub.json")  # Error message
+        exit()  # Exit
+    ballot_pool = RandomnessPool(ballot_key, capacity=len(candidates) * 20)  # Pairs for 20 voters
+    print("🔒 Ballot encryption enabled")  # Confirmation
 
 # -----------------------------
 # GPIO Buttons and Buzzer
 # -----------------------------
-try:
-    buttons = {c["name"]: Button(c["gpio"], pull_up=True, bounce_time=0.2) for c in candidates}  # Setup buttons
-    buzzer = Buzzer(18, active_high=False, initial_value=False)  # Setup buzzer on GPIO 18, active low, Physical Pin 12
-except Exception as e:  # Handle GPIO errors
-    print("❌ GPIO setup failed. Run with sudo")  # Error message
-    print(e)  # Print exception
-    exit()  # Exit
+buttons, buzzer = {}, None  # Created by setup_gpio() during startup
+touch_input = None  # Sensor touch output on EVM_TOUCH_GPIO, wakes the idle booth
+TOUCH_GPIO = os.environ.get("EVM_TOUCH_GPIO")  # Sensor touch output wired to the Pi (optional); read before startup_pool runs setup_gpio()
+IDLE_AFTER_MS = int(float(os.environ.get("EVM_IDLE_AFTER_S", 60)) * 1000)  # Fingerprint screen with nobody at the booth
+waker = Waker()  # GPIO callbacks and the serial reader wake Tk through a pipe; button_edge() may run before the window exists
+sleeping = False  # Idle: check_response() has stopped and the Arduino is asleep
+
+def setup_gpio():  # Startup worker: import gpiozero and claim the pins
+    global buttons, buzzer, touch_input
+    with profiler.phase("import gpiozero"):
+        from gpiozero import Button, Buzzer  # Import gpiozero for GPIO control
+    with profiler.phase("GPIO setup"):
+        try:
+            buttons = {c["name"]: Button(c["gpio"], pull_up=True, bounce_time=0.2)  # Setup buttons
+                       for c in candidates if c.get("gpio") is not None}  # Others are chosen by touch
+            if os.path.exists(KEYPAD_FILE):  # Large ballots: key matrix or I2C expander
+                keypad = load_keypad(KEYPAD_FILE)
+                buttons.update({c["name"]: keypad.key(*c["key"])  # Same is_pressed interface as Button
+                                for c in candidates if c.get("key") is not None})
+            buzzer = Buzzer(18, active_high=False, initial_value=False)  # Setup buzzer on GPIO 18, active low, Physical Pin 12
+            for name, btn in buttons.items():  # Edge interrupts, no polling while idle
+                btn.when_pressed = lambda n=name: button_edge(n, True)
+                btn.when_released = lambda n=name: button_edge(n, False)
+            if TOUCH_GPIO:
+                touch_input = Button(int(TOUCH_GPIO), pull_up=True)
+                touch_input.when_pressed = lambda: button_edge("touch", True)
+                touch_input.when_released = lambda: button_edge("touch", False)
+        except Exception as e:  # Handle GPIO errors
+            raise RuntimeError(f"GPIO setup failed. Run with sudo ({e})")
+
+def button_edge(name, pressed):  # gpiozero thread: trace the edge and wake an idle booth
+    if trace:
+        trace.log("btn", name, int(pressed))
+    if pressed and sleeping:
+        waker.set("touch" if name == "touch" else "button")
+
+def buzz(on):  # Switch the buzzer (traced)
+    if trace:
+        trace.log("buzz", int(on))
+    buzzer.on() if on else buzzer.off()
+
+# -----------------------------
+# Candidate images
+# -----------------------------
+thumbnails = ThumbnailCache()  # Decoded candidate images, filled in the background
+BALLOT_ROWS, BALLOT_COLS = 2, 4  # Cards per ballot page
+
+def prerender_assets():  # Startup worker: import PIL and decode the first ballot page
+    with profiler.phase("pre-render images"):
+        first_page = [c.get("image") for c in candidates[:BALLOT_ROWS * BALLOT_COLS]]
+        thumbnails.prefetch(first_page)  # Later pages are prefetched while voting
+        for path in first_page:
+            future = thumbnails.pending.get(path)
+            if future is not None and future.exception():  # Missing images are not fatal
+                print(f"Error loading {path}: {future.exception()}")  # Log error
+
+# Start the slow parts before the window exists; they only touch Tk once finished
+startup_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup")  # Parallel startup
+startup = {  # Startup tasks by name
+    "sensor": startup_pool.submit(connect_sensor),
+    "gpio": startup_pool.submit(setup_gpio),
+    "assets": startup_pool.submit(prerender_assets),
+    "roster": startup_pool.submit(load_roster),
+}
 
 # -----------------------------
 # Tkinter setup
 # -----------------------------
-root = Tk()  # Create main window
-root.title("Electronic Voting Machine")  # Set title
-root.configure(bg="#F4F7FA")  # Set background color
+display = open_display("tk")  # 800x500 window with the booth styles; this file runs its main loop
+root = display.root  # Main window
+display.on_close = root.destroy  # Closing the window ends mainloop(), as before
 
 # Optional: Bind 'q' key to quit for keyboard exit during development
 root.bind('<Key-q>', lambda e: root.quit())  # Press 'q' to quit
 
-screen_width = 800  # Screen width
-screen_height = 500  # Screen height
-root.geometry(f"{screen_width}x{screen_height}+0+0")  # Set geometry
-root.resizable(False, False)  # Disable resizing
-
-style = ttk.Style()  # Create style object
-style.configure("TLabel", background="#F4F7FA", foreground="#222", font=("Arial", 20))  # Configure labels
-style.configure("Title.TLabel", background="#F4F7FA", foreground="#0056b3", font=("Arial", 28, "bold"))  # Title style
-style.configure("Message.TLabel", background="#F4F7FA", foreground="#007700", font=("Arial", 22, "bold"))  # Message style
+display.message("starting")  # Shown while workers run
+root.update()  # Draw it now
+profiler.mark("window shown")  # Window visible
 
 last_voter_id = None  # Global variable for last voter ID
 last_voter_name = None  # Global variable for last voter name
+ballot_view = None  # BallotView while the ballot is shown
+
+# -----------------------------
+# Voter flow timing
+# -----------------------------
+DWELL_RECOGNIZED_MS = int(os.environ.get("EVM_DWELL_RECOGNIZED_MS", 2500))  # "Fingerprint recognized" screen
+DWELL_THANKS_MS = int(os.environ.get("EVM_DWELL_THANKS_MS", 3000))  # "Thank you for voting" screen
+DWELL_ALREADY_VOTED_MS = int(os.environ.get("EVM_DWELL_ALREADY_VOTED_MS", 3000))  # Repeat voter warning
+THROUGHPUT_MODE = os.environ.get("EVM_THROUGHPUT_MODE", "0") == "1"  # Arm the sensor during confirmation screens
+
+scanning = False  # A CHECK is outstanding and check_response() is polling
+just_voted = (None, 0.0)  # (voter ID, monotonic end of the thank-you or warning screen): that finger may still be on the sensor
+dwell_job = None  # Pending root.after() that leaves the current confirmation screen
+
+def show_after(ms, screen):  # Leave the current screen after ms, cancellable by a new finger
+    global dwell_job
+    dwell_job = root.after(ms, screen)
+
+def cancel_dwell():  # End the current confirmation screen early
+    global dwell_job
+    if dwell_job is not None:
+        root.after_cancel(dwell_job)
+        dwell_job = None
+
+# -----------------------------
+# Idle mode (screen off, no polling)
+# -----------------------------
+backlight = Backlight()  # sysfs backlight or X DPMS
+idle_job = None  # Pending root.after() that starts idle mode
+
+def arm_idle_timer():  # Restarted every time the fingerprint screen is shown
+    global idle_job
+    cancel_idle_timer()
+    idle_job = root.after(IDLE_AFTER_MS, go_idle)
+
+def cancel_idle_timer():
+    global idle_job
+    if idle_job is not None:
+        root.after_cancel(idle_job)
+        idle_job = None
+
+def go_idle():  # Nobody came: blank the screen and let every loop stop
+    global sleeping, idle_job
+    idle_job = None
+    sleeping = True  # check_response() sends SLEEP instead of the next CHECK and stops polling
+    backlight.off()
+    for w in root.winfo_children():  # Black screen in case the backlight cannot be switched
+        w.destroy()
+    blank = Frame(root, bg="black", cursor="none")
+    blank.pack(expand=True, fill=BOTH)
+    blank.bind("<Button-1>", lambda e: waker.set("screen"))  # Tap to wake
+    print("💤 Idle: display off, sensor asleep")
+
+def wake_up(reason, since):  # Called through the waker pipe, in the Tk thread
+    global sleeping
+    if not sleeping:
+        return
+    sleeping = False
+    backlight.on()
+    show_fingerprint_screen()  # Sends CHECK and restarts polling and the idle timer
+    print(f"⏰ Woke on {reason} in {(time.monotonic() - since) * 1000:.0f} ms")
+
+waker.attach(root, wake_up)  # Tk file handler: no timer runs while idle
+sensor.on_queued = lambda line: sleeping and line == "WAKE" and waker.set("sensor")  # Finger on the sleeping sensor
+if trace:
+    trace.tk(root, lambda: ballot_view)  # A replay taps candidates through the window
 
 # -----------------------------
 # Screens
 # -----------------------------
 def show_fingerprint_screen():  # Function to show fingerprint screen
-    for w in root.winfo_children():  # Clear previous widgets
-        w.destroy()
-    frame = Frame(root, bg="#F4F7FA")  # Create frame
-    frame.pack(expand=True, fill=BOTH)  # Pack frame
-    ttk.Label(frame, text="Place your finger on the sensor", style="Title.TLabel").pack(pady=60)  # Title label
-    ttk.Label(frame, text="Waiting for fingerprint...", style="TLabel").pack(pady=20)  # Subtitle
+    global dwell_job
+    dwell_job = None  # Reached through a finished dwell (or at startup)
+    display.message("idle")  # Place your finger on the sensor
     root.update()  # Update GUI
     wait_for_fingerprint()  # Call wait function
+    arm_idle_timer()  # Go idle if nobody comes
 
 def buzz_twice():  # Function to buzz twice for repeat voter
-    """Buzz the buzzer twice for repeat voter."""
-    buzzer.off()  # Ensure buzzer is off initially
-    for _ in range(2):  # Loop twice
-        buzzer.on()  # Turn buzzer on
-        time.sleep(1)  # Wait 1s
-        buzzer.off()  # Turn off
-        time.sleep(0.2)  # Wait 0.2s
+    """Buzz the buzzer twice for repeat voter, scheduled so the screen keeps running."""
+    buzz(False)  # Ensure buzzer is off initially
+    for i in range(2):  # Loop twice
+        root.after(i * 1200, buzz, True)  # Turn buzzer on
+        root.after(i * 1200 + 1000, buzz, False)  # Turn off after 1s, pause 0.2s
 
 def show_already_voted_screen():  # Function to show already voted screen
-    for w in root.winfo_children():  # Clear widgets
-        w.destroy()
-    frame = Frame(root, bg="#FFF8E1")  # Create frame with warning color
-    frame.pack(expand=True, fill=BOTH)  # Pack
-    ttk.Label(frame, text="⚠️ You have already voted!", style="Title.TLabel").pack(pady=50)  # Warning title
-    ttk.Label(frame, text="Multiple voting is not allowed.", style="Message.TLabel").pack(pady=20)  # Message
+    global just_voted
+    display.message("already_voted")  # Multiple voting is not allowed
 
     # 🔊 Buzz twice
     buzz_twice()  # Call buzz function
 
-    root.after(3000, show_fingerprint_screen)  # After 3s, go back to fingerprint screen
+    show_after(DWELL_ALREADY_VOTED_MS, show_fingerprint_screen)  # Go back to fingerprint screen
+    if THROUGHPUT_MODE:  # Next voter can scan while the warning is still shown
+        just_voted = (last_voter_id, time.monotonic() + DWELL_ALREADY_VOTED_MS / 1000)  # One warning and buzz per finger
+        wait_for_fingerprint()
 
 # -----------------------------
 # Fingerprint / voter check
 # -----------------------------
 def wait_for_fingerprint():  # Function to wait for fingerprint
-    global last_voter_id, last_voter_name  # Use global variables
-    ser.write(b'CHECK\n')  # Send CHECK command
-
-    def check_response():  # Inner function to check response periodically
-        if ser.in_waiting > 0:  # If data available
-            response = ser.readline().decode().strip()  # Read response
-            if response:  # If not empty
-                print(f"Arduino → {response}")  # Print response
-                if response.startswith("MATCH"):  # If match
-                    last_voter_id = response.split(":")[1]  # Extract ID
-                    last_voter_name = get_voter_name(last_voter_id)  # Get name
-                    print(f"Fingerprint matched: {last_voter_id} ({last_voter_name})")  # Log
-                    if has_already_voted(last_voter_id):  # Check if already voted
-                        print("❌ Already voted")  # Log
-                        show_already_voted_screen()  # Show warning
-                        return  # Exit
-                    show_recognized_screen(last_voter_name)  # Show recognized
-                    return  # Exit
-                elif response == "NO_MATCH":  # If no match
-                    print("Fingerprint not recognized. Try again.")  # Log
-                    ser.write(b'CHECK\n')  # Retry CHECK
-        root.after(100, check_response)  # Schedule next check in 100ms
-
+    global scanning
+    if scanning:  # Already armed during the previous confirmation screen
+        return
+    scanning = True  # One outstanding CHECK at a time
+    sensor.send('CHECK')  # Send CHECK command
     check_response()  # Start checking
 
+def check_response():  # Check the sensor response periodically
+    global last_voter_id, last_voter_name, scanning, sleeping  # Assigned below
+    if ballot_pool:  # Use idle time between voters for the expensive exponentiations
+        ballot_pool.refill(budget=0.02)  # At most 20 ms per poll so the screen stays responsive
+    response = sensor.poll()  # Line from the reader thread, never blocks
+    if response:  # If data available
+        print(f"Arduino → {response}")  # Print response
+        if response.startswith("MATCH"):  # If match
+            if response.split(":")[1] == just_voted[0] and time.monotonic() < just_voted[1]:  # Voter has not lifted the finger yet
+                sensor.send('CHECK')  # Same finger as the screen being shown: keep waiting for the next voter, no new warning or buzzer
+                root.after(100, check_response)
+                return
+            scanning = False  # CHECK answered
+            cancel_dwell()  # A new finger ends the thank-you/warning screen early
+            cancel_idle_timer()  # A voter is here
+            if sleeping:  # Finger arrived just as the booth went idle
+                sleeping = False
+                backlight.on()
+            last_voter_id = response.split(":")[1]  # Extract ID
+            last_voter_name = get_voter_name(last_voter_id)  # Get name
+            print(f"Fingerprint matched: {last_voter_id} ({last_voter_name})")  # Log
+            already = has_already_voted(last_voter_id)
+            events.log("finger_matched", voter_id=last_voter_id, already_voted=already)
+            if already:  # Check if already voted
+                print("❌ Already voted")  # Log
+                show_already_voted_screen()  # Show warning
+                return  # Exit
+            checkpoint.save("recognized", voter_id=last_voter_id, name=last_voter_name)  # Survives a reboot
+            show_recognized_screen(last_voter_name)  # Show recognized
+            return  # Exit
+        elif response == "NO_MATCH" and sleeping:  # Last CHECK before idle: sensor sleeps until touched
+            scanning = False
+            sensor.send('SLEEP')
+            return  # No more polling
+        elif response == "NO_MATCH":  # If no match
+            print("Fingerprint not recognized. Try again.")  # Log
+            events.log("no_match")
+            sensor.send('CHECK')  # Retry CHECK
+    root.after(100, check_response)  # Schedule next check in 100ms
+
 def show_recognized_screen(voter_name):  # Function to show recognized screen
     # Check again if voter already voted before showing candidate screen
     if has_already_voted(last_voter_id):
         print("❌ Already voted (double check in show_recognized_screen)")
+        events.log("already_voted", voter_id=last_voter_id, stage="before ballot")
         show_already_voted_screen()
         return
-    for w in root.winfo_children():  # Clear widgets
-        w.destroy()
-    frame = Frame(root, bg="#E8F5E9")  # Success color frame
-    frame.pack(expand=True, fill=BOTH)  # Pack
-    ttk.Label(frame, text="Fingerprint recognized!", style="Title.TLabel").pack(pady=50)  # Title
-    ttk.Label(frame, text=f"Mr. {voter_name}, you can now cast your vote.", style="Message.TLabel").pack(pady=20)  # Message
-    root.after(2500, show_candidates_screen)  # After 2.5s, show candidates
+    display.message("recognized", name=voter_name)  # Fingerprint recognized, you can now cast your vote
+    show_after(DWELL_RECOGNIZED_MS, show_candidates_screen)  # Then show candidates
 
 # -----------------------------
 # Candidate screen
 # -----------------------------
 def show_candidates_screen():  # Function to show candidates
-    for w in root.winfo_children():  # Clear widgets
-        w.destroy()
-    ttk.Label(root, text="Vote for Your Candidate", style="Title.TLabel").pack(pady=20)  # Title
-    frame = Frame(root, bg="#F4F7FA")  # Frame for candidates
-    frame.pack(pady=20)  # Pack
-    candidate_labels = {}  # Dict for labels
-
-    for i, c in enumerate(candidates):  # Loop through candidates
-        card = Frame(frame, bg="#FFFFFF", relief=RAISED, borderwidth=2)  # Card frame
-        card.grid(row=0, column=i, padx=30, ipadx=10, ipady=10)  # Grid layout
-        try:
-            img = Image.open(c["image"])  # Open image
-            img = img.resize((130, 130))  # Resize
-            photo = ImageTk.PhotoImage(img)  # Convert to Tk image
-            label_img = Label(card, image=photo, bg="#FFFFFF")  # Image label
-            label_img.photo = photo  # Keep reference
-            label_img.pack(pady=5)  # Pack
-        except Exception as e:  # Handle image error
-            print(f"Error loading {c['image']}: {e}")  # Log error
-        lbl_name = Label(card, text=c["name"], bg="#FFFFFF", fg="#000", font=("Arial", 18, "bold"))  # Name label
-        lbl_name.pack(pady=10)  # Pack
-        candidate_labels[c["name"]] = lbl_name  # Store in dict
-
-    def record_vote(candidate_name):  # Function to record vote
-        for name, lbl in candidate_labels.items():  # Reset colors
-            lbl.config(fg="#000")
-        candidate_labels[candidate_name].config(fg="#E53935")  # Highlight selected
-        print(f"Vote recorded for {candidate_name}")  # Log
+    global ballot_view
+    voted = False  # Set once a choice is recorded (button or touch)
+    by_button = False  # Set by check_buttons(); touch choices are traced as taps
+
+    def record_vote(candidate_name):  # Function to record vote (called by the view after highlighting)
+        global ballot_view, just_voted
+        nonlocal voted
+        if voted:  # Ignore a second press or tap
+            return
+        voted = True
+        ballot_view = None
+        if trace and not by_button:
+            trace.log("tap", candidate_name)
+        recorded = candidate_name  # Value stored in CSV, log and Firebase
+        ballot_line = None  # Encrypted ballot for ballot_crypto.py tally
+        if ballot_pool:  # Store only the encrypted ballot, without the voter ID
+            start = time.perf_counter()  # Measure vote-time encryption cost
+            ballot = encrypt_choice(ballot_pool, [c["name"] for c in candidates].index(candidate_name), len(candidates))
+            ballot_line = json.dumps({"ballot": ballot_to_json(ballot)}) + "\n"
+            recorded = "ENCRYPTED"  # Plaintext choice is not written anywhere
+            print(f"🔒 Ballot encrypted in {(time.perf_counter() - start) * 1000:.2f} ms "
+                  f"(pool {len(ballot_pool.pairs)} left, {ballot_pool.misses} misses, "
+                  f"refill {ballot_pool.refill_rate():.1f} pairs/s)")  # Latency report
+        print(f"Vote recorded for {recorded}")  # Log
+        events.log("vote_recorded", voter_id=last_voter_id, candidate=recorded)
+        timestamp = datetime.utcnow().isoformat()  # One timestamp for CSV and Firebase so they can be reconciled
+        # Saved before any write, with the file sizes, so a reboot can finish or undo this vote
+        checkpoint.save("recording", voter_id=last_voter_id, name=last_voter_name, candidate=recorded,
+                        timestamp=timestamp, chain_size=chain.size, csv_offset=file_offset("votes.csv"))
+        if ballot_line:
+            stage_ballot(ballot_line)  # On disk before the chain commits the vote
         with open("votes.csv", "a") as f:  # Append to CSV
-            f.write(f"{last_voter_id},{last_voter_name},{candidate_name},{datetime.utcnow().isoformat()}\n")
-        push_vote(candidate_name, last_voter_id)  # Push to Firebase
-        for w in root.winfo_children():  # Clear widgets
-            w.destroy()
-        ttk.Label(root, text="✅ Thank you for voting!", style="Title.TLabel").pack(expand=True)  # Thank you
-        root.after(3000, show_fingerprint_screen)  # After 3s, back to start
+            f.write(f"{last_voter_id},{last_voter_name},{recorded},{timestamp}\n")
+        chain.append(last_voter_id, last_voter_name, recorded, timestamp)  # Commit point: from here a reboot finishes the vote
+        if ballot_line:
+            commit_ballot()  # Random line of ballots.jsonl, so its position does not follow the voter
+        print(f"Vote log: {chain.size} votes, root {chain.root()[:16]}")  # Current Merkle root
+        push_vote(recorded, last_voter_id, timestamp)  # Push to Firebase
+        checkpoint.save("idle")  # Vote complete everywhere (failed pushes are left to reconcile_votes.py)
+        display.message("thanks")  # Thank you for voting
+        show_after(DWELL_THANKS_MS, show_fingerprint_screen)  # Then back to start
+        if THROUGHPUT_MODE:  # Arm the sensor for the next voter right away
+            just_voted = (last_voter_id, time.monotonic() + DWELL_THANKS_MS / 1000)  # Ignore this voter's own finger
+            wait_for_fingerprint()
+
+    view = display.ballot(candidates, thumbnails, BALLOT_ROWS, BALLOT_COLS, record_vote)  # Title and paged candidate grid
+    ballot_view = view
 
     def check_buttons():  # Function to check button presses
+        nonlocal by_button
+        if voted:  # Chosen by touch
+            return
         for name, btn in buttons.items():  # Loop through buttons
             if btn.is_pressed:  # If pressed
-                record_vote(name)  # Record vote
+                by_button = True
+                view.select(name)  # Highlight and record vote
                 return  # Exit
         root.after(100, check_buttons)  # Check again after 100ms
 
     check_buttons()  # Start checking
 
+# -----------------------------
+# Resume after a power cut
+# -----------------------------
+def resume_session():  # Finish or undo what a reboot interrupted, then show the step the booth was in
+    global last_voter_id, last_voter_name
+    start = time.perf_counter()
+    step, state = checkpoint.load()
+    if step == "recording":
+        last_voter_id, last_voter_name = state["voter_id"], state["name"]
+        if chain.size > state["chain_size"]:  # Committed: write whatever copies are missing
+            line = f"{last_voter_id},{last_voter_name},{state['candidate']},{state['timestamp']}\n"
+            if not has_line("votes.csv", line, state["csv_offset"]):
+                truncate_to("votes.csv", state["csv_offset"])  # Drop a half-written line so it is not merged with this one
+                with open("votes.csv", "a") as f:
+                    f.write(line)
+            commit_ballot()  # No-op when the ballot was already moved (or there is none)
+            if not has_already_voted(last_voter_id):
+                push_vote(state["candidate"], last_voter_id, state["timestamp"])
+            checkpoint.save("idle")
+            step = "idle"
+            print(f"♻️ Finished the interrupted vote of {last_voter_id}")
+            events.log("vote_resumed", voter_id=last_voter_id, committed=True)
+        else:  # Not committed: cut off partial writes, the voter gets the ballot again
+            truncate_to("votes.csv", state["csv_offset"])
+            discard_ballot()
+            checkpoint.save("recognized", voter_id=last_voter_id, name=last_voter_name)
+            step, state["t"] = "recognized", time.time()
+            print(f"↩️ Rolled back the interrupted vote of {last_voter_id}")
+            events.log("vote_resumed", voter_id=last_voter_id, committed=False)
+    if step == "recognized" and time.time() - state["t"] < SESSION_TIMEOUT_S:
+        last_voter_id, last_voter_name = state["voter_id"], state["name"]
+        show_candidates_screen()  # Straight back to the ballot
+        print(f"♻️ Resumed ballot of {last_voter_id} ({last_voter_name}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return
+    if step != "idle":  # Voter has long gone
+        checkpoint.save("idle")
+    show_fingerprint_screen()  # Show initial screen (sensor armed with CHECK)
+
 # -----------------------------
 # Start program
 # -----------------------------
-show_fingerprint_screen()  # Show initial screen
-root.mainloop()  # Start GUI loop
\ No newline at end of file
+def finish_startup():  # Wait for the startup workers without blocking Tk
+    if not all(f.done() for f in startup.values()):  # Still initialising
+        root.after(20, finish_startup)  # Check again in 20ms
+        return
+    for name, future in startup.items():  # Any worker failure is fatal, as before
+        if future.exception():
+            print(f"❌ Startup failed ({name}): {future.exception()}")  # Error
+            events.log("startup_failed", worker=name, error=str(future.exception()))
+            root.quit()  # Quit
+            return
+    startup_pool.shutdown(wait=False)  # Workers are done
+    resume_session()  # Interrupted voter, or the fingerprint screen
+    profiler.mark("first interactive screen")  # Voter can now use the booth
+    events.log("booth_ready", startup_s=round(profiler.now(), 3))
+    profiler.report()  # Print startup timeline
+
+finish_startup()  # Start waiting for the workers
+root.mainloop()  # Start GUI loop
+events.log("booth_stopped")
+events.close()  # Write the last events to disk
\ No newline at end of file
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3  # Shebang for running as executable
+"""
+Voting booth built around one asyncio event loop.
+The loop owns the sensor port (add_reader, see multi_sensor.py), GPIO button
+events (forwarded from gpiozero threads), Firebase requests (awaited, never on
+the UI thread) and every timer. The display has no mainloop of its own: a loop
+task pumps it every FRAME_MS and records how late each pump was, which is
+exactly how long the screen was frozen. The voter flow is an explicit state machine:
+
+    IDLE -> RECOGNIZED -> BALLOT -> RECORDING -> THANKS -> IDLE
+         -> ALREADY_VOTED -> IDLE
+
+Settings (environment): EVM_SENSOR_PORT (default /dev/ttyACM0, "sim" for the
+simulated Arduino; press 1-9 to place a finger), EVM_UI (tk, fb or sdl, see
+booth_display.py), EVM_DB_URL (Firebase base
+URL), EVM_DWELL_*_MS and EVM_THROUGHPUT_MODE as in voting6.py.
+"""
+from startup_profiler import StartupProfiler  # Import startup profiler first so imports are timed
+profiler = StartupProfiler()  # Timeline from process start to first interactive screen
+import asyncio  # Import asyncio for the booth event loop
+import json  # Import json for encrypted ballot lines
+import os  # Import os for environment variables
+import signal  # Import signal for signal handling
+import threading  # Import threading for per-thread HTTP sessions
+import time  # Import time for stall measurement and dwell deadlines
+from collections import deque  # Import deque for stall samples
+from concurrent.futures import ThreadPoolExecutor  # Import executor for blocking I/O
+from datetime import datetime  # Import datetime for timestamps
+from ballot_ui import ThumbnailCache, load_candidates  # Import ballot definition and thumbnails
+from booth_display import open_display  # Import display backend (Tk, framebuffer or SDL)
+from button_matrix import KEYPAD_FILE, load_keypad  # Import matrix-scanned button bank
+from multi_sensor import OFFLINE, SensorUnit  # Import event-loop serial unit
+from serial_session import SensorError  # Import sensor error
+from vote_chain import VoteChain  # Import hash-chained vote log
+from vote_store import vote_update, voted_path  # Import sharded Firebase vote layout
+from event_log import EventLog  # Import structured event log
+import live_profiler  # Import on-demand profiler (SIGUSR1 / SIGUSR2)
+from ballot_crypto import (PUBLIC_KEY_FILE, RandomnessPool, ballot_to_json,  # Import optional ballot encryption
+                           commit_ballot, discard_ballot, encrypt_choice, load_key, stage_ballot)
+
+events = EventLog("booth_events.jsonl")  # Structured copy of the console messages, query with event_log.py
+live_profiler.install("voting7")  # kill -USR1 / -USR2 <pid> to profile the live booth
+SENSOR_PORT = os.environ.get("EVM_SENSOR_PORT", "/dev/ttyACM0")  # Arduino port
+FRAME_MS = 10  # Display is pumped this often
+DWELL_RECOGNIZED_MS = int(os.environ.get("EVM_DWELL_RECOGNIZED_MS", 2500))  # "Fingerprint recognized" screen
+DWELL_THANKS_MS = int(os.environ.get("EVM_DWELL_THANKS_MS", 3000))  # "Thank you for voting" screen
+DWELL_ALREADY_VOTED_MS = int(os.environ.get("EVM_DWELL_ALREADY_VOTED_MS", 3000))  # Repeat voter warning
+THROUGHPUT_MODE = os.environ.get("EVM_THROUGHPUT_MODE", "0") == "1"  # Scan during confirmation screens
+
+# -----------------------------
+# Firebase (awaitable, requests runs in worker threads)
+# -----------------------------
+DB_URL = os.environ.get("EVM_DB_URL", "https://e-vm-f7bdf-default-rtdb.firebaseio.com")  # Firebase database URL
+
+class Firebase:
+    """Awaitable Firebase REST calls; each worker thread keeps a keep-alive session."""
+
+    def __init__(self, url, workers=2):
+        self.url = url
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")  # A slow push cannot block a lookup
+        self.local = threading.local()
+
+    def _request(self, method, path, **kw):  # Worker thread
+        if not hasattr(self.local, "session"):
+            import requests  # Import requests for Firebase API (lazily)
+            self.local.session = requests.Session()
+        res = self.local.session.request(method, f"{self.url}/{path}.json", timeout=5, **kw)
+        res.raise_for_status()
+        return res.json()
+
+    async def get(self, path, **params):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, lambda: self._request("GET", path, params=params or None))
+
+    async def patch(self, path, data):  # path "" is the database root (multi-path update)
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, lambda: self._request("PATCH", path, json=data))
+
+firebase = Firebase(DB_URL)
+roster = {}  # Voter ID -> name, preloaded at startup
+
+async def load_roster():  # Preload voter names
+    with profiler.phase("roster preload"):
+        try:
+            data = await firebase.get("voters")  # GET all voters once
+            if isinstance(data, list):  # Firebase returns a list for small numeric keys
+                data = {str(i): v for i, v in enumerate(data) if v}
+            for fid, voter in (data or {}).items():  # Keep only the names
+                roster[str(fid)] = voter.get("name", "Unknown Voter")
+            print(f"✅ Roster preloaded ({len(roster)} voters)")  # Confirmation
+            events.log("roster_loaded", voters=len(roster))
+        except Exception as e:  # Booth still works online-only
+            print(f"❌ Roster preload failed: {e}")  # Exception message
+            events.log("roster_failed", error=str(e))
+
+async def get_voter_name(voter_id):  # Roster first, then Firebase
+    if str(voter_id) in roster:
+        return roster[str(voter_id)]
+    try:
+        voter = await firebase.get(f"voters/{voter_id}")  # GET voter data
+        return (voter or {}).get("name", "Unknown Voter")  # Return name or default
+    except Exception as e:  # Handle exceptions
+        print(f"❌ Failed to fetch voter name: {e}")  # Exception message
+        events.log("lookup_failed", voter_id=voter_id, error=str(e))
+        return "Unknown Voter"  # Default
+
+async def has_already_voted(voter_id):  # Check if voter already voted
+    if voter_id in voted_here:  # Voted here; voted/<id> may not be uploaded yet
+        return True
+    try:
+        return await firebase.get(voted_path(voter_id)) is not None  # GET voted/<id>, not every vote
+    except Exception as e:  # Handle exceptions
+        print(f"❌ Error checking previous votes: {e}")  # Exception message
+        events.log("vote_check_failed", voter_id=voter_id, error=str(e))
+        return False  # Assume not voted
+
+async def push_vote(candidate_name, voter_id, timestamp):  # Push vote to Firebase
+    """Failed pushes are repaired by reconcile_votes.py."""
+    try:
+        await firebase.patch("", vote_update(candidate_name, voter_id, timestamp))  # Shard, index and voter marker
+        print(f"✅ Vote for {candidate_name} pushed to Firebase")  # Success message
+        events.log("vote_pushed", voter_id=voter_id, timestamp=timestamp)
+    except Exception as e:  # Handle exceptions
+        print(f"❌ Exception while pushing vote: {e}")  # Exception message
+        events.log("push_failed", voter_id=voter_id, timestamp=timestamp, error=str(e))
+
+# -----------------------------
+# Local records, ballot and hardware
+# -----------------------------
+chain = VoteChain("vote_chain.jsonl")  # Hash-chained copy of every vote, checked with vote_chain.py verify
+voted_here = set()  # Voter IDs recorded at this booth, checked before Firebase (an upload may still be in flight)
+if os.path.exists("votes.csv"):
+    with open("votes.csv") as f:
+        voted_here = {line.split(",", 1)[0] for line in f if line.strip()}
+disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk")  # fsync stays off the loop; one writer keeps order
+candidates = load_candidates("candidates.json")  # Name, image and optional button of every candidate
+
+ballot_pool = None  # Precomputed randomness, None when encryption is off
+if os.path.exists(PUBLIC_KEY_FILE):  # Key created offline with ballot_crypto.py keygen
+    ballot_key = load_key(PUBLIC_KEY_FILE)  # Load election public key
+    if ballot_key["candidates"] != [c["name"] for c in candidates]:  # Ballot order must match the key
+        print("❌ Candidates do not match ballot_key.pub.json")  # Error message
+        exit()  # Exit
+    ballot_pool = RandomnessPool(ballot_key, capacity=len(candidates) * 20)  # Pairs for 20 voters
+    print("🔒 Ballot encryption enabled")  # Confirmation
+    discard_ballot()  # Staged before a crash: without a checkpoint it cannot be told committed, so never count it
+
+buttons, buzzer = {}, None  # Created by setup_gpio() during startup
+
+def setup_gpio():  # Worker thread: import gpiozero and claim the pins
+    global buttons, buzzer
+    with profiler.phase("GPIO setup"):
+        try:
+            from gpiozero import Button, Buzzer  # Import gpiozero for GPIO control
+        except ImportError as e:
+            if SENSOR_PORT == "sim":  # Desktop and soak runs: touch only
+                print(f"GPIO unavailable in simulation: {e}")
+                return
+            raise
+        try:
+            buttons = {c["name"]: Button(c["gpio"], pull_up=True, bounce_time=0.2)  # Setup buttons
+                       for c in candidates if c.get("gpio") is not None}  # Others are chosen by touch
+            if os.path.exists(KEYPAD_FILE):  # Large ballots: key matrix or I2C expander
+                keypad = load_keypad(KEYPAD_FILE)
+                buttons.update({c["name"]: keypad.key(*c["key"]) for c in candidates if c.get("key") is not None})
+            buzzer = Buzzer(18, active_high=False, initial_value=False)  # Setup buzzer on GPIO 18, active low
+        except Exception as e:  # Handle GPIO errors
+            raise RuntimeError(f"GPIO setup failed. Run with sudo ({e})")
+
+thumbnails = ThumbnailCache()  # Decoded candidate images, filled in the background
+BALLOT_ROWS, BALLOT_COLS = 2, 4  # Cards per ballot page
+
+def prerender_assets():  # Worker thread: decode the first ballot page
+    with profiler.phase("pre-render images"):
+        first_page = [c.get("image") for c in candidates[:BALLOT_ROWS * BALLOT_COLS]]
+        thumbnails.prefetch(first_page)
+        for path in first_page:
+            future = thumbnails.pending.get(path)
+            if future is not None and future.exception():  # Missing images are not fatal
+                print(f"Error loading {path}: {future.exception()}")  # Log error
+
+sensor = None  # SensorUnit, attached to the loop by connect_sensor()
+
+async def connect_sensor():
+    global sensor
+    with profiler.phase("sensor handshake"):
+        if SENSOR_PORT == "sim":  # Desktop testing: number keys place fingers
+            from arduino_sim import SimulatedArduino
+            sensor = SensorUnit("sim", SimulatedArduino(enrolled=range(1, 10)))
+        else:
+            sensor = SensorUnit.open(SENSOR_PORT)  # Non-blocking port (imports pyserial)
+        sensor.attach(asyncio.get_running_loop())
+        await sensor.wait_ready()  # PING if READY was missed; raises SensorError
+        print("✅ Sensor ready!")  # Confirmation
+        events.log("sensor_ready", port=SENSOR_PORT)
+
+# -----------------------------
+# Display pumped from the loop
+# -----------------------------
+display = open_display(os.environ.get("EVM_UI", "tk"))  # Tk window by default, as before
+
+class DisplayPump:
+    """Runs the display from the event loop and measures UI stalls (late or slow pumps)."""
+
+    def __init__(self, display, frame_ms=FRAME_MS):
+        self.display = display
+        self.interval = frame_ms / 1000
+        self.stalls = deque(maxlen=100000)  # Seconds the screen went without an update, per pump
+        self.worst = 0.0
+
+    async def run(self, stop):
+        last = time.perf_counter()
+        while not stop.is_set():
+            if not self.display.pump():  # Draw and handle pending input; False once the window is closed
+                stop.set()
+                return
+            now = time.perf_counter()
+            stall = max(0.0, now - last - self.interval)  # Beyond the normal frame time
+            self.stalls.append(stall)
+            self.worst = max(self.worst, stall)
+            last = now
+            await asyncio.sleep(self.interval)
+
+    def report(self):
+        if not self.stalls:
+            return "no frames"
+        ordered = sorted(self.stalls)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (f"{len(ordered)} frames, UI stall p99 {p99 * 1000:.1f} ms, "
+                f"worst {self.worst * 1000:.1f} ms (frame {self.interval * 1000:.0f} ms)")
+
+pump = DisplayPump(display)
+
+# -----------------------------
+# Voter flow state machine
+# -----------------------------
+IDLE, RECOGNIZED, BALLOT, RECORDING, THANKS, ALREADY_VOTED = (
+    "idle", "recognized", "ballot", "recording", "thanks", "already_voted")
+
+voter = {}  # Current voter: id, name, choice
+scan_task = None  # Outstanding fingerprint scan, may start during a confirmation screen
+just_voted = (None, 0.0)  # (voter ID, monotonic end of its confirmation screen): that finger may still be on the sensor
+ballot_view = None  # Ballot view while the ballot is shown (for button presses)
+choice = None  # Future resolved with the chosen candidate
+
+async def scan_until_match():  # Repeat CHECK until a finger matches
+    while True:
+        reply = await sensor.request("CHECK")
+        if sensor.state == OFFLINE:
+            raise SensorError("Sensor offline")
+        if reply and reply.startswith("MATCH:"):
+            if reply[6:] == just_voted[0] and time.monotonic() < just_voted[1]:  # Voter has not lifted the finger yet
+                continue  # Not a new voter: no warning, no buzzer, no lookup
+            print(f"Arduino → {reply}")  # Print response
+            return reply[6:]
+        if reply == "NO_MATCH":
+            print("Fingerprint not recognized. Try again.")  # Log
+            events.log("no_match")
+
+def arm_scanner():  # Start scanning unless already armed
+    global scan_task
+    if scan_task is None:
+        scan_task = asyncio.ensure_future(scan_until_match())
+
+async def dwell(ms):  # Confirmation screen; in throughput mode a new finger ends it early
+    if THROUGHPUT_MODE:
+        arm_scanner()
+        await asyncio.wait({scan_task}, timeout=ms / 1000)
+    else:
+        await asyncio.sleep(ms / 1000)
+
+async def state_idle():
+    global scan_task
+    if not (scan_task and scan_task.done()):  # Not already answered during the last dwell
+        display.message("idle")  # Place your finger on the sensor
+    arm_scanner()
+    voter_id = await scan_task
+    scan_task = None
+    name, already = await asyncio.gather(get_voter_name(voter_id), has_already_voted(voter_id))  # Both requests at once
+    voter.clear()
+    voter.update(id=voter_id, name=name)
+    print(f"Fingerprint matched: {voter_id} ({name})")  # Log
+    events.log("finger_matched", voter_id=voter_id, already_voted=already)
+    return ALREADY_VOTED if already else RECOGNIZED
+
+async def state_recognized():
+    display.message("recognized", name=voter["name"])  # Fingerprint recognized, you can now cast your vote
+    await asyncio.sleep(DWELL_RECOGNIZED_MS / 1000)
+    if await has_already_voted(voter["id"]):  # Double check right before the ballot
+        print("❌ Already voted (double check before ballot)")
+        events.log("already_voted", voter_id=voter["id"], stage="before ballot")
+        return ALREADY_VOTED
+    return BALLOT
+
+async def state_ballot():
+    global ballot_view, choice
+    choice = asyncio.get_running_loop().create_future()
+    ballot_view = display.ballot(candidates, thumbnails, BALLOT_ROWS, BALLOT_COLS,
+                                 on_select=lambda name: choice.done() or choice.set_result(name))
+    try:
+        voter["choice"] = await choice  # Touch or button
+    finally:
+        ballot_view = None
+    return RECORDING
+
+def write_records(voter_id, name, recorded, timestamp, ballot_line=None):  # Disk thread: ballot, CSV and vote log
+    if ballot_line:
+        stage_ballot(ballot_line)  # On disk before the chain commits the vote
+    with open("votes.csv", "a") as f:  # Append to CSV
+        f.write(f"{voter_id},{name},{recorded},{timestamp}\n")
+    chain.append(voter_id, name, recorded, timestamp)  # Chain the vote to the previous one (fsync)
+    if ballot_line:
+        commit_ballot()  # Random line of ballots.jsonl, so its position does not follow the voter
+    print(f"Vote log: {chain.size} votes, root {chain.root()[:16]}")  # Current Merkle root
+
+async def state_recording():
+    recorded, line = voter["choice"], None
+    if ballot_pool:  # Store only the encrypted ballot, without the voter ID
+        ballot = encrypt_choice(ballot_pool, [c["name"] for c in candidates].index(recorded), len(candidates))
+        line = json.dumps({"ballot": ballot_to_json(ballot)}) + "\n"
+        recorded = "ENCRYPTED"  # Plaintext choice is not written anywhere
+    print(f"Vote recorded for {recorded}")  # Log
+    events.log("vote_recorded", voter_id=voter["id"], candidate=recorded)
+    timestamp = datetime.utcnow().isoformat()  # One timestamp for CSV and Firebase so they can be reconciled
+    voted_here.add(voter["id"])  # From now on this voter never gets a ballot here, whatever Firebase says
+    await asyncio.get_running_loop().run_in_executor(
+        disk, write_records, voter["id"], voter["name"], recorded, timestamp, line)  # Durable before thanking the voter
+    asyncio.ensure_future(push_vote(recorded, voter["id"], timestamp))  # Upload in the background
+    return THANKS
+
+async def state_thanks():
+    global just_voted
+    display.message("thanks")  # Thank you for voting
+    just_voted = (voter["id"], time.monotonic() + DWELL_THANKS_MS / 1000)  # Ignore this voter's own finger
+    await dwell(DWELL_THANKS_MS)
+    return IDLE
+
+async def buzz_twice():  # Repeat voter alarm
+    for _ in range(2):
+        buzzer.on()
+        await asyncio.sleep(1.0)
+        buzzer.off()
+        await asyncio.sleep(0.2)
+
+async def state_already_voted():
+    global just_voted
+    display.message("already_voted")  # Multiple voting is not allowed
+    just_voted = (voter["id"], time.monotonic() + DWELL_ALREADY_VOTED_MS / 1000)  # One warning per finger
+    if buzzer:
+        asyncio.ensure_future(buzz_twice())
+    await dwell(DWELL_ALREADY_VOTED_MS)
+    return IDLE
+
+STATES = {IDLE: state_idle, RECOGNIZED: state_recognized, BALLOT: state_ballot,
+          RECORDING: state_recording, THANKS: state_thanks, ALREADY_VOTED: state_already_voted}
+
+async def voter_flow():
+    state = IDLE
+    while True:
+        state = await STATES[state]()
+
+def press(name):  # Loop thread: a candidate button was pressed
+    if ballot_view is not None:
+        ballot_view.select(name)  # Highlight and resolve the choice
+
+async def refill_pool(stop):  # Idle-time randomness for ballot encryption, 10 ms slices
+    while not stop.is_set():
+        if len(ballot_pool.pairs) < ballot_pool.capacity:
+            ballot_pool.refill(budget=0.01)
+        await asyncio.sleep(0.05)
+
+# -----------------------------
+# Start program
+# -----------------------------
+def on_key(key, stop):  # Keyboard (Tk window, evdev or SDL)
+    if key == "q":
+        stop.set()
+    elif SENSOR_PORT == "sim" and sensor and key.isdigit():
+        sensor.ser.place_finger(int(key))
+
+async def main(stop=None):  # stop: set by a caller (soak_test.py) to end the booth
+    loop = asyncio.get_running_loop()
+    stop = stop or asyncio.Event()
+    loop.add_signal_handler(signal.SIGINT, stop.set)  # Ctrl+C
+    display.on_key = lambda key: on_key(key, stop)  # 'q' quits; 1-9 place a finger on the simulated sensor
+    display.on_close = stop.set
+    display.message("starting")  # Starting voting machine...
+    tk_task = asyncio.ensure_future(pump.run(stop))  # Window stays live during startup
+    profiler.mark("window shown")
+
+    try:
+        await asyncio.gather(connect_sensor(), load_roster(),
+                             loop.run_in_executor(None, setup_gpio),
+                             loop.run_in_executor(None, prerender_assets))
+    except Exception as e:  # Any startup failure is fatal, as before
+        print(f"❌ Startup failed: {e}")
+        events.log("startup_failed", error=str(e))
+        stop.set()
+    else:
+        for name, btn in buttons.items():  # gpiozero threads hand presses to the loop
+            btn.when_pressed = lambda n=name: loop.call_soon_threadsafe(press, n)
+        tasks = [asyncio.ensure_future(voter_flow())]
+        if ballot_pool:
+            tasks.append(asyncio.ensure_future(refill_pool(stop)))
+        profiler.mark("first interactive screen")
+        events.log("booth_ready", startup_s=round(profiler.now(), 3))
+        profiler.report()
+        done, _ = await asyncio.wait(tasks + [asyncio.ensure_future(stop.wait())], return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if task.done() and task.exception():
+                print(f"❌ {task.exception()}")
+                events.log("booth_error", error=str(task.exception()))
+            task.cancel()
+        if scan_task:
+            scan_task.cancel()
+    stop.set()
+    await tk_task
+    print("\nExiting program...")
+    print(f"⏱️ {pump.report()}")
+    events.log("booth_stopped", ui=pump.report())
+    if sensor:
+        sensor.detach(loop)
+        sensor.ser.close()
+    disk.shutdown()
+    chain.close()
+    display.close()
+    events.close()  # Final flush
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3  # Shebang for running as executable
+"""
+Voting booth split into processes.
+Tk, the Arduino/GPIO link and Firebase each run in their own process, pinned to
+their own core, so a garbage-collection pause, a slow Firebase answer or
+a TLS handshake can no longer freeze the screen.
+
+    supervisor (core 0)  voter session, votes.csv, vote log, restarts
+      ├── ui  (core 3)   Tk screens, touch choices
+      ├── hw  (core 2)   SerialSession, buttons, buzzer
+      └── net (core 1)   roster, voter lookups, vote uploads
+
+Every worker talks to the supervisor over its own pipe with one-line binary
+messages (a kind byte followed by \\x1f-separated fields). The supervisor owns
+the voter session. When a worker dies it is restarted with back-off, and the
+requests it had not answered are sent again, so the voter on screen carries on.
+Uploads write vote_shards/<hour>/<booth>/<timestamp>_<voter> (see vote_store.py),
+so a repeated upload cannot create a second vote. With ballot_key.pub.json
+present the supervisor encrypts every ballot (ballot_crypto.py) and records
+only "ENCRYPTED", refilling its randomness pool while the booth is idle.
+
+Run with: python3 voting8.py [--port /dev/ttyACM0 | --port sim]
+"""
+
+import argparse  # Import argparse for the command line
+import json  # Import json for encrypted ballot lines
+import multiprocessing as mp  # Import multiprocessing for worker processes
+import os  # Import os for core pinning
+import signal  # Import signal for signal handling
+import threading  # Import threading for the send lock
+import time  # Import time for timers
+from datetime import datetime  # Import datetime for timestamps
+from multiprocessing.connection import wait  # Import wait for pipes and process exits
+
+DB_URL = "https://e-vm-f7bdf-default-rtdb.firebaseio.com"  # Firebase database URL
+DWELL_RECOGNIZED_MS = int(os.environ.get("EVM_DWELL_RECOGNIZED_MS", 2500))  # "Fingerprint recognized" screen
+DWELL_THANKS_MS = int(os.environ.get("EVM_DWELL_THANKS_MS", 3000))  # "Thank you for voting" screen
+DWELL_ALREADY_VOTED_MS = int(os.environ.get("EVM_DWELL_ALREADY_VOTED_MS", 3000))  # Repeat voter warning
+CORES = {"supervisor": 0, "net": 1, "hw": 2, "ui": 3}  # Raspberry Pi 4: one core each
+RESTART_DELAY = 0.2  # First restart delay (s), doubled for every crash in the last minute
+RESTART_MAX = 5.0
+
+# -----------------------------
+# Messages
+# -----------------------------
+KINDS = ("READY", "STOP", "SHOW", "SCAN", "MATCH", "PRESS", "CHOSEN", "BUZZ", "LOOKUP", "VOTER", "PUSH", "PUSHED")
+CODES = {kind: i for i, kind in enumerate(KINDS)}
+SEP = "\x1f"  # ASCII unit separator, never typed in names
+
+def pack(kind, *fields):  # ("MATCH", 5) -> b"\x04" b"5"
+    return bytes([CODES[kind]]) + SEP.join(str(f) for f in fields).encode()
+
+def unpack(data):  # Inverse of pack
+    body = data[1:].decode()
+    return KINDS[data[0]], body.split(SEP) if body else []
+
+class Channel:
+    """One end of a worker pipe; send() may be called from several threads."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, kind, *fields):
+        with self.lock:
+            self.conn.send_bytes(pack(kind, *fields))
+
+    def recv(self, timeout=None):  # (kind, fields) or None after timeout
+        if self.conn.poll(timeout):
+            return unpack(self.conn.recv_bytes())
+        return None
+
+def pin_to_core(core):  # Keep this process on one CPU (Linux only)
+    try:
+        os.sched_setaffinity(0, {core % os.cpu_count()})
+    except (AttributeError, OSError):
+        pass
+
+def worker_setup(core):  # Common start of every worker
+    pin_to_core(core)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is handled by the supervisor
+
+# -----------------------------
+# Hardware worker: Arduino, buttons, buzzer
+# -----------------------------
+def hw_worker(conn, core, port):
+    worker_setup(core)
+    ch = Channel(conn)
+    from serial_session import SerialSession  # Import blocking serial session for Arduino
+    if port == "sim":  # Desktop testing: every scan sees an enrolled finger
+        import random
+        from arduino_sim import SimulatedArduino
+        sim = SimulatedArduino(enrolled=range(1, 10), scan_time=1.0)
+        sensor = SerialSession(ser=sim)
+    else:
+        sim = None
+        sensor = SerialSession(port).open()
+    sensor.wait_ready(on_line=None)  # Raises SensorError: the supervisor restarts us
+    sensor.start_reader()
+
+    buzzer = None
+    try:
+        from gpiozero import Button, Buzzer  # Import gpiozero for GPIO control
+        from ballot_ui import load_candidates
+        from button_matrix import KEYPAD_FILE, load_keypad
+        candidates = load_candidates("candidates.json")
+        buttons = {c["name"]: Button(c["gpio"], pull_up=True, bounce_time=0.2)
+                   for c in candidates if c.get("gpio") is not None}
+        if os.path.exists(KEYPAD_FILE):  # Large ballots: key matrix or I2C expander
+            keypad = load_keypad(KEYPAD_FILE)
+            buttons.update({c["name"]: keypad.key(*c["key"]) for c in candidates if c.get("key") is not None})
+        for name, btn in buttons.items():  # Presses go straight to the supervisor
+            btn.when_pressed = lambda n=name: ch.send("PRESS", n)
+        buzzer = Buzzer(18, active_high=False, initial_value=False)  # Buzzer on GPIO 18, active low
+    except Exception as e:  # Handle GPIO errors
+        if sim is None:
+            raise RuntimeError(f"GPIO setup failed. Run with sudo ({e})")
+        print(f"GPIO unavailable in simulation: {e}")
+
+    def buzz_twice():
+        for _ in range(2):
+            buzzer.on()
+            time.sleep(1.0)
+            buzzer.off()
+            time.sleep(0.2)
+
+    ch.send("READY")
+    scanning = False
+    while True:
+        msg = ch.recv(0.02)
+        if msg:
+            kind, fields = msg
+            if kind == "STOP":
+                break
+            if kind == "SCAN" and not scanning:  # One outstanding CHECK
+                scanning = True
+                if sim:
+                    sim.place_finger(random.randint(1, 9))
+                sensor.send("CHECK")
+            elif kind == "BUZZ" and buzzer:
+                threading.Thread(target=buzz_twice, daemon=True).start()
+        line = sensor.poll()
+        while line:
+            if line.startswith("SERIAL_ERROR"):
+                raise RuntimeError(line)  # Port lost: crash and get restarted
+            if line.startswith("MATCH:") and scanning:
+                scanning = False
+                ch.send("MATCH", line[6:])
+            elif line == "NO_MATCH" and scanning:
+                print("Fingerprint not recognized. Try again.")
+                if sim:
+                    sim.place_finger(random.randint(1, 9))
+                sensor.send("CHECK")  # Retry CHECK
+            line = sensor.poll()
+    sensor.close()
+
+# -----------------------------
+# Network worker: Firebase
+# -----------------------------
+def net_worker(conn, core):
+    worker_setup(core)
+    ch = Channel(conn)
+    import requests  # Import requests for Firebase API
+    from vote_store import VoteStore  # Import sharded Firebase vote storage
+    http = requests.Session()  # Keep-alive: one TLS handshake per worker
+    store = VoteStore(http, DB_URL)
+    roster = {}
+    try:
+        data = http.get(f"{DB_URL}/voters.json", timeout=5).json()  # GET all voters once
+        if isinstance(data, list):  # Firebase returns a list for small numeric keys
+            data = {str(i): v for i, v in enumerate(data) if v}
+        roster = {str(fid): v.get("name", "Unknown Voter") for fid, v in (data or {}).items()}
+        print(f"✅ Roster preloaded ({len(roster)} voters)")
+    except Exception as e:  # Lookups fall back to single requests
+        print(f"❌ Roster preload failed: {e}")
+    ch.send("READY")
+
+    while True:
+        kind, fields = ch.recv()
+        if kind == "STOP":
+            break
+        if kind == "LOOKUP":
+            voter_id = fields[0]
+            name = roster.get(voter_id)
+            try:
+                if name is None:
+                    voter = http.get(f"{DB_URL}/voters/{voter_id}.json", timeout=5).json()
+                    name = (voter or {}).get("name", "Unknown Voter")
+                already = store.has_voted(voter_id)  # GET voted/<id>, not every vote
+            except Exception as e:
+                print(f"❌ Error checking voter: {e}")
+                name, already = name or "Unknown Voter", False  # Assume not voted, as before
+            ch.send("VOTER", voter_id, name, int(already))
+        elif kind == "PUSH":
+            voter_id, candidate, timestamp = fields
+            try:
+                ok = store.push(candidate, voter_id, timestamp)  # Same vote, same key in the same shard
+            except Exception as e:
+                print(f"❌ Exception while pushing vote: {e}")
+                ok = False
+            ch.send("PUSHED", voter_id, timestamp, int(ok))
+
+# -----------------------------
+# UI worker: Tk screens
+# -----------------------------
+def ui_worker(conn, core):
+    worker_setup(core)
+    ch = Channel(conn)
+    os.environ['DISPLAY'] = ':0'  # Set display to :0
+    os.environ['XAUTHORITY'] = '/home/pi/.Xauthority'  # Set X authority file
+    from tkinter import Tk, Frame, BOTH, TclError  # Import Tkinter for GUI
+    from tkinter import ttk  # Import ttk for styled widgets
+    from ballot_ui import BallotView, ThumbnailCache, load_candidates  # Import paged ballot screen
+
+    candidates = load_candidates("candidates.json")
+    thumbnails = ThumbnailCache()
+    thumbnails.prefetch([c.get("image") for c in candidates[:8]])  # First ballot page
+    root = Tk()
+    root.title("Electronic Voting Machine")
+    root.configure(bg="#F4F7FA")
+    root.geometry("800x500+0+0")
+    root.resizable(False, False)
+    style = ttk.Style()
+    style.configure("TLabel", background="#F4F7FA", foreground="#222", font=("Arial", 20))
+    style.configure("Title.TLabel", background="#F4F7FA", foreground="#0056b3", font=("Arial", 28, "bold"))
+    style.configure("Message.TLabel", background="#F4F7FA", foreground="#007700", font=("Arial", 22, "bold"))
+
+    def screen(bg, title, message=None, message_style="Message.TLabel"):
+        for w in root.winfo_children():
+            w.destroy()
+        frame = Frame(root, bg=bg)
+        frame.pack(expand=True, fill=BOTH)
+        ttk.Label(frame, text=title, style="Title.TLabel").pack(pady=50)
+        if message:
+            ttk.Label(frame, text=message, style=message_style).pack(pady=20)
+
+    def show(name, *fields):
+        if name == "idle":
+            screen("#F4F7FA", "Place your finger on the sensor", "Waiting for fingerprint...", "TLabel")
+        elif name == "checking":
+            screen("#F4F7FA", "Place your finger on the sensor", "Checking...", "TLabel")
+        elif name == "recognized":
+            screen("#E8F5E9", "Fingerprint recognized!", f"Mr. {fields[0]}, you can now cast your vote.")
+        elif name == "already_voted":
+            screen("#FFF8E1", "⚠️ You have already voted!", "Multiple voting is not allowed.")
+        elif name == "thanks":
+            screen("#F4F7FA", "✅ Thank you for voting!")
+        elif name == "ballot":
+            for w in root.winfo_children():
+                w.destroy()
+            ttk.Label(root, text="Vote for Your Candidate", style="Title.TLabel").pack(pady=10)
+            BallotView(root, candidates, on_select=lambda n: ch.send("CHOSEN", n), cache=thumbnails).pack(pady=5)
+        else:
+            screen("#F4F7FA", "Starting voting machine...")
+
+    def poll():  # Messages from the supervisor
+        while True:
+            msg = ch.recv(0)
+            if msg is None:
+                break
+            kind, fields = msg
+            if kind == "STOP":
+                root.destroy()
+                return
+            if kind == "SHOW":
+                show(*fields)
+        root.after(20, poll)
+
+    show("starting")
+    ch.send("READY")
+    poll()
+    try:
+        root.mainloop()
+    except TclError:
+        pass
+
+# -----------------------------
+# Supervisor
+# -----------------------------
+IDLE, LOOKUP, RECOGNIZED, BALLOT, THANKS, ALREADY_VOTED = (
+    "idle", "lookup", "recognized", "ballot", "thanks", "already_voted")
+
+class Supervisor:
+    """Starts and restarts the workers and runs the voter session."""
+
+    def __init__(self, workers):
+        from ballot_crypto import PUBLIC_KEY_FILE, RandomnessPool, discard_ballot, load_key
+        from ballot_ui import load_candidates
+        from event_log import EventLog
+        from vote_chain import VoteChain
+        self.workers = workers  # name -> (target, extra args, core)
+        self.ctx = mp.get_context("spawn")  # Fresh interpreters: no inherited Tk, locks or threads
+        self.procs, self.chans = {}, {}
+        self.outstanding = {name: {} for name in workers}  # key -> (kind, fields), re-sent after a restart
+        self.crashes = {name: [] for name in workers}  # Crash times, for back-off
+        self.restart_at = {}  # name -> time of a scheduled restart
+        self.screen = ("starting",)  # Current UI screen, re-sent to a new UI
+        self.state, self.voter, self.deadline = None, {}, None
+        self.candidates = [c["name"] for c in load_candidates("candidates.json")]
+        self.chain = VoteChain("vote_chain.jsonl")
+        self.voted = set()  # Voter IDs recorded at this booth; their upload may still be queued in the net worker
+        if os.path.exists("votes.csv"):
+            with open("votes.csv") as f:
+                self.voted = {line.split(",", 1)[0] for line in f if line.strip()}
+        self.events = EventLog("booth_events.jsonl")  # Structured copy of the console messages, query with event_log.py
+        self.ballot_pool = None  # Precomputed randomness, None when encryption is off
+        if os.path.exists(PUBLIC_KEY_FILE):  # Key created offline with ballot_crypto.py keygen
+            ballot_key = load_key(PUBLIC_KEY_FILE)
+            if ballot_key["candidates"] != self.candidates:  # Ballot order must match the key
+                raise SystemExit("❌ Candidates do not match ballot_key.pub.json")
+            self.ballot_pool = RandomnessPool(ballot_key, capacity=len(self.candidates) * 20)  # Pairs for 20 voters
+            discard_ballot()  # Staged before a crash: it cannot be told committed, so never count it
+            print("🔒 Ballot encryption enabled")
+        self.stopping = False
+
+    # Workers
+    def start(self, name):
+        target, args, core = self.workers[name]
+        parent, child = self.ctx.Pipe()
+        proc = self.ctx.Process(target=target, args=(child, core) + args, name=f"evm-{name}", daemon=True)
+        proc.start()
+        child.close()
+        self.procs[name], self.chans[name] = proc, Channel(parent)
+        for kind, fields in self.outstanding[name].values():  # Unanswered before a crash
+            self.send(name, kind, *fields)
+        if name == "ui":
+            self.send("ui", "SHOW", *self.screen)
+
+    def crashed(self, name):
+        proc = self.procs.pop(name)
+        self.chans.pop(name).conn.close()
+        now = time.monotonic()
+        self.crashes[name] = [t for t in self.crashes[name] if now - t < 60] + [now]
+        delay = min(RESTART_MAX, RESTART_DELAY * 2 ** (len(self.crashes[name]) - 1))
+        print(f"❌ {name} worker exited ({proc.exitcode}), restarting in {delay:.1f}s")
+        self.events.log("worker_crashed", worker=name, exitcode=proc.exitcode, restart_s=delay)
+        self.restart_at[name] = now + delay
+
+    def send(self, name, kind, *fields):
+        if name in self.chans:
+            try:
+                self.chans[name].send(kind, *fields)
+            except OSError:  # Worker is dying; start() re-sends outstanding requests
+                pass
+
+    def request(self, name, key, kind, *fields):  # Send and remember until answered
+        self.outstanding[name][key] = (kind, fields)
+        self.send(name, kind, *fields)
+
+    def show(self, *fields):
+        self.screen = fields
+        self.send("ui", "SHOW", *fields)
+
+    # Voter session
+    def enter(self, state, dwell_ms=None):
+        self.state = state
+        self.deadline = time.monotonic() + dwell_ms / 1000 if dwell_ms else None
+        if state == IDLE:
+            self.voter = {}
+            self.show("idle")
+            self.request("hw", "scan", "SCAN")
+        elif state == RECOGNIZED:
+            self.show("recognized", self.voter["name"])
+        elif state == BALLOT:
+            self.show("ballot")
+        elif state == THANKS:
+            self.show("thanks")
+        elif state == ALREADY_VOTED:
+            self.show("already_voted")
+            self.send("hw", "BUZZ")
+
+    def timeout(self):  # Dwell finished
+        if self.state == RECOGNIZED:
+            self.enter(BALLOT)
+        elif self.state in (THANKS, ALREADY_VOTED):
+            self.enter(IDLE)
+
+    def record(self, candidate):  # Durable locally before the thank-you screen
+        from ballot_crypto import ballot_to_json, commit_ballot, encrypt_choice, stage_ballot
+        voter_id, name = self.voter["id"], self.voter["name"]
+        ballot_line = None
+        if self.ballot_pool:  # Store only the encrypted ballot, without the voter ID
+            ballot = encrypt_choice(self.ballot_pool, self.candidates.index(candidate), len(self.candidates))
+            ballot_line = json.dumps({"ballot": ballot_to_json(ballot)}) + "\n"
+            stage_ballot(ballot_line)  # On disk before the chain commits the vote
+            candidate = "ENCRYPTED"  # Plaintext choice is not written anywhere
+        timestamp = datetime.utcnow().isoformat()  # One timestamp for CSV and Firebase
+        self.voted.add(voter_id)
+        with open("votes.csv", "a") as f:  # Append to CSV
+            f.write(f"{voter_id},{name},{candidate},{timestamp}\n")
+        self.chain.append(voter_id, name, candidate, timestamp)  # Chain the vote to the previous one
+        if ballot_line:
+            commit_ballot()  # Random line of ballots.jsonl, so its position does not follow the voter
+        self.events.log("vote_recorded", voter_id=voter_id, candidate=candidate)
+        print(f"Vote recorded for {candidate} (log {self.chain.size} votes, root {self.chain.root()[:16]})")
+        self.request("net", f"push:{voter_id}:{timestamp}", "PUSH", voter_id, candidate, timestamp)
+        self.enter(THANKS, DWELL_THANKS_MS)
+
+    def handle(self, name, kind, fields):
+        if kind == "READY":
+            print(f"✅ {name} worker ready (pid {self.procs[name].pid})")
+        elif kind == "MATCH":
+            self.outstanding["hw"].pop("scan", None)
+            if self.state == IDLE:
+                print(f"Fingerprint matched: {fields[0]}")
+                self.voter = {"id": fields[0]}
+                self.state = LOOKUP
+                self.show("checking")
+                self.request("net", "lookup", "LOOKUP", fields[0])
+        elif kind == "VOTER":
+            self.outstanding["net"].pop("lookup", None)
+            voter_id, voter_name, already = fields
+            if voter_id in self.voted:  # Voted here: Firebase may not have voted/<id> yet
+                already = "1"
+            if self.state == LOOKUP and voter_id == self.voter.get("id"):
+                self.voter["name"] = voter_name
+                self.events.log("finger_matched", voter_id=voter_id, already_voted=already == "1")
+                if already == "1":
+                    print("❌ Already voted")
+                    self.enter(ALREADY_VOTED, DWELL_ALREADY_VOTED_MS)
+                else:
+                    self.enter(RECOGNIZED, DWELL_RECOGNIZED_MS)
+        elif kind in ("CHOSEN", "PRESS"):  # Touch or button
+            if self.state == BALLOT and fields[0] in self.candidates:
+                self.record(fields[0])
+        elif kind == "PUSHED":
+            voter_id, timestamp, ok = fields
+            self.outstanding["net"].pop(f"push:{voter_id}:{timestamp}", None)
+            print("✅ Vote pushed to Firebase" if ok == "1" else "❌ Failed to push vote (reconcile_votes.py repairs it)")
+            self.events.log("vote_pushed" if ok == "1" else "push_failed", voter_id=voter_id, timestamp=timestamp)
+
+    def run(self):
+        pin_to_core(CORES["supervisor"])
+        signal.signal(signal.SIGINT, lambda sig, frame: setattr(self, "stopping", True))
+        for name in self.workers:
+            self.start(name)
+        self.enter(IDLE)
+        while not self.stopping:
+            now = time.monotonic()
+            for name, at in list(self.restart_at.items()):
+                if now >= at:
+                    del self.restart_at[name]
+                    self.start(name)
+            timers = [t for t in [self.deadline, *self.restart_at.values()] if t]
+            timeout = max(0.0, min(timers) - now) if timers else 1.0
+            pool = self.ballot_pool
+            if pool and self.state == IDLE and len(pool.pairs) < pool.capacity:  # Idle time: precompute randomness
+                pool.refill(budget=0.02)  # 20 ms slices, then check the pipes again
+                timeout = 0.0
+            sentinels = {self.procs[n].sentinel: n for n in self.procs}
+            conns = {self.chans[n].conn: n for n in self.chans}
+            for ready in wait(list(sentinels) + list(conns), timeout):
+                if ready in conns:
+                    name = conns[ready]
+                    try:
+                        while name in self.chans and ready.poll():
+                            self.handle(name, *unpack(ready.recv_bytes()))
+                    except (EOFError, OSError):  # Pipe closed: the sentinel reports the exit
+                        pass
+                elif sentinels[ready] in self.procs:
+                    self.crashed(sentinels[ready])
+            if self.deadline and time.monotonic() >= self.deadline:
+                self.deadline = None
+                self.timeout()
+        self.shutdown()
+
+    def shutdown(self):
+        print("\nExiting program...")
+        for name in list(self.chans):
+            self.send(name, "STOP")
+        for proc in self.procs.values():
+            proc.join(timeout=3)
+            if proc.is_alive():
+                proc.terminate()
+        for name, times in self.crashes.items():
+            if times:
+                print(f"{name}: {len(times)} restarts in the last minute")
+        self.chain.close()
+        self.events.log("booth_stopped")
+        self.events.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Voting booth with UI, hardware and network in separate processes.")
+    parser.add_argument("--port", default="/dev/ttyACM0", help="Arduino port, or 'sim' for the simulated Arduino")
+    args = parser.parse_args()
+    Supervisor({
+        "ui": (ui_worker, (), CORES["ui"]),
+        "hw": (hw_worker, (args.port,), CORES["hw"]),
+        "net": (net_worker, (), CORES["net"]),
+    }).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 // Firebase Realtime Database service using REST API
 const FIREBASE_URL = 'https://e-vm-f7bdf-default-rtdb.firebaseio.com';
+const PAGE_SIZE = 500; // Votes per request; a response never holds more than this
 
 class FirebaseService {
   // Get all voters
@@ -39,24 +40,51 @@ class FirebaseService {
     }
   }
 
-  // Get all votes
+  // Fetch one page of a node in key order (orderBy="$key", startAt, limitToFirst)
+  async getPage(path, startAt, limit) {
+    const params = new URLSearchParams({ orderBy: '"$key"', limitToFirst: String(limit) });
+    if (startAt !== null) params.set('startAt', JSON.stringify(startAt));
+    const response = await fetch(`${FIREBASE_URL}/${path}.json?${params}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch ${path}`);
+    }
+    return (await response.json()) || {};
+  }
+
+  // Yield every [key, value] of a node, PAGE_SIZE per request
+  async *pages(path) {
+    let cursor = null;
+    while (true) {
+      // startAt is inclusive, so every page after the first asks for one extra row
+      const limit = PAGE_SIZE + (cursor === null ? 0 : 1);
+      const page = await this.getPage(path, cursor, limit);
+      const keys = Object.keys(page).sort();
+      for (const key of keys) {
+        if (key !== cursor) yield [key, page[key]];
+      }
+      if (keys.length < limit) return;
+      cursor = keys[keys.length - 1];
+    }
+  }
+
+  // Get all votes: the shard index (vote_index/<hour>/<booth>), then each shard page by page
   async getVotes() {
     try {
-      const response = await fetch(`${FIREBASE_URL}/votes.json`);
-      if (!response.ok) {
-        throw new Error('Failed to fetch votes');
+      const votes = [];
+      for await (const [hour, booths] of this.pages('vote_index')) {
+        for (const booth of Object.keys(booths || {}).sort()) {
+          for await (const [id, vote] of this.pages(`vote_shards/${hour}/${booth}`)) {
+            votes.push({
+              id,
+              candidate: vote.candidate,
+              timestamp: vote.timestamp,
+              voter_id: vote.voter_id,
+              booth: vote.booth
+            });
+          }
+        }
       }
-      const data = await response.json();
-      
-      if (!data) return [];
-      
-      // Convert Firebase object to array
-      return Object.entries(data).map(([id, vote]) => ({
-        id,
-        candidate: vote.candidate,
-        timestamp: vote.timestamp,
-        voter_id: vote.voter_id
-      }));
+      return votes;
     } catch (error) {
       console.error('Error fetching votes:', error);
       return [];